@@ -0,0 +1,407 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from topology import NEIGHBOR_INDEXES, make_neighbor_index
+
+TRANSMISSION_RANGE = 30
+BASE_NODES = 15
+BASE_AREA = 100.0
+
+
+def scaled_positions(num_nodes, rng):
+    # Grow the area with the node count so density (and the average number of
+    # neighbors) matches the default 15-node network on a 100x100 field.
+    side = BASE_AREA * math.sqrt(num_nodes / BASE_NODES)
+    return rng.uniform(0, side, size=(num_nodes, 2))
+
+
+def brute_force_pairs(positions, transmission_range):
+    # The original MANET.update_topology scan, kept as the reference.
+    pairs = set()
+    points = positions.tolist()
+    for i, (x1, y1) in enumerate(points):
+        for j, (x2, y2) in enumerate(points):
+            if i != j:
+                dx = x1 - x2
+                dy = y1 - y2
+                if math.sqrt(dx*dx + dy*dy) <= transmission_range:
+                    pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def time_call(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_neighbors(sizes, backends, brute_limit, repeats, seed):
+    # Link discovery alone per backend, then the same density through the
+    # whole simulator: MANET.update_topology after every node moved, and a
+    # full Simulator.step()
+    from mobility import RandomJitter
+
+    rng = np.random.default_rng(seed)
+    columns = ['brute'] + backends + ['topology', 'step']
+    print(f"{'nodes':>8} {'links':>10} " + " ".join(f"{name + ' ms':>12}" for name in columns))
+
+    for num_nodes in sizes:
+        positions = scaled_positions(num_nodes, rng)
+        reference = make_neighbor_index(backends[0]).pairs(positions, TRANSMISSION_RANGE)
+        row = [f"{num_nodes:>8}", f"{len(reference):>10}"]
+
+        if num_nodes <= brute_limit:
+            expected = brute_force_pairs(positions, TRANSMISSION_RANGE)
+            if expected != set(map(tuple, reference.tolist())):
+                raise AssertionError(f"{backends[0]} index disagrees with brute force at {num_nodes} nodes")
+            elapsed = time_call(lambda: brute_force_pairs(positions, TRANSMISSION_RANGE), 1)
+            row.append(f"{elapsed * 1000:>12.2f}")
+        else:
+            row.append(f"{'-':>12}")
+
+        for name in backends:
+            index = make_neighbor_index(name)
+            elapsed = time_call(lambda: index.pairs(positions, TRANSMISSION_RANGE), repeats)
+            row.append(f"{elapsed * 1000:>12.2f}")
+
+        simulator = build_fixture(num_nodes, seed)
+        manet = simulator.manet
+        jitter = RandomJitter(simulator.mobility_step)
+        move = lambda: jitter.move(manet.store, manet.store.active_rows(), rng, simulator.tick)
+        elapsed = measure(lambda _: manet.update_topology(), move, repeats, 0).min()
+        row.append(f"{elapsed * 1000:>12.2f}")
+        elapsed = time_call(simulator.step, repeats)
+        row.append(f"{elapsed * 1000:>12.2f}")
+
+        print(" ".join(row))
+
+
+# Seeded fixtures of the suite, at the default network's node density
+FIXTURES = {'15': 15, '1k': 1000, '10k': 10000, '100k': 100000}
+CASES = ('topology', 'find_path', 'tick', 'q_update', 'radio', 'render')
+# Suite results on the reference machine, written with --save-baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+RENDER_COLORS = {
+    'text': 'white',
+    'normal_node': '#4CAF50',
+    'malicious_node': '#F44336',
+    'selected_node': '#FFC107',
+    'connection': '#555555',
+    'active_route': '#2196F3',
+}
+
+
+class HeadlessCanvas:
+    # Stand-in for a Tk canvas that accepts every call the renderer makes
+    # without drawing, so rendering is timed without a display
+    def __init__(self, width=1000, height=900):
+        self.width = width
+        self.height = height
+        self.items = 0
+        self.calls = 0
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def _create(self, *args, **kwargs):
+        self.items += 1
+        return self.items
+
+    create_arc = create_line = create_oval = create_rectangle = create_text = _create
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+
+    coords = itemconfig = delete = tag_raise = _call
+
+
+def build_fixture(num_nodes, seed):
+    from manet import MANET
+    from simulator import Simulator
+
+    side = BASE_AREA * math.sqrt(num_nodes / BASE_NODES)
+    manet = MANET(num_nodes=num_nodes, seed=seed, transmission_range=TRANSMISSION_RANGE, area_size=side)
+    return Simulator(manet=manet)
+
+
+def measure(fn, setup, samples, max_seconds):
+    # Per-call latencies of fn(state) where state = setup(); setup is not
+    # timed. Stops after `samples` calls or `max_seconds`, with at least 3.
+    times = []
+    budget = time.perf_counter() + max_seconds
+    while len(times) < samples and (len(times) < 3 or time.perf_counter() < budget):
+        state = setup()
+        start = time.perf_counter()
+        fn(state)
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def peak_memory(fn, setup):
+    # Peak Python/numpy allocation of one call, measured on its own because
+    # tracing allocations slows everything down
+    state = setup()
+    tracemalloc.start()
+    try:
+        fn(state)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(times, peak, per_call=1):
+    ms = times * 1000
+    return {
+        'samples': len(times),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'per_second': float(per_call / np.median(times)) if np.median(times) > 0 else math.inf,
+        'peak_bytes': int(peak),
+    }
+
+
+def suite_cases(simulator, rng, q_batch):
+    # case name -> (fn, setup, operations per call)
+    from mobility import RandomJitter
+    from pipeline import CommandQueue, FrameQueue, SimulationThread
+    from radio import RadioModel
+    from renderer import NetworkRenderer
+
+    manet = simulator.manet
+    store = manet.store
+    jitter = RandomJitter(simulator.mobility_step)
+
+    def move():
+        jitter.move(store, store.active_rows(), rng, simulator.tick)
+
+    def pair():
+        rows = store.active_rows()
+        a, b = rng.choice(rows, size=2, replace=False)
+        return int(a), int(b)
+
+    def transitions():
+        # Random (node, dest, neighbor) transitions over the current links
+        links = store.links[rng.integers(0, len(store.links), size=q_batch)] if len(store.links) else np.zeros((0, 2), dtype=np.int64)
+        dests = rng.choice(store.active_rows(), size=len(links))
+        return links[:, 0], dests, links[:, 1], -np.ones(len(links)), dests == links[:, 1]
+
+    radio = RadioModel(store, TRANSMISSION_RANGE)
+
+    def hops():
+        # One hop over each of a batch of random links, all on air together
+        links = store.links[rng.integers(0, len(store.links), size=q_batch)] if len(store.links) else np.zeros((0, 2), dtype=np.int64)
+        return links[:, 0], links[:, 1]
+
+    renderer = NetworkRenderer(HeadlessCanvas(), RENDER_COLORS, node_radius=15)
+    # Frames come through the UI pipeline so they carry every link change
+    # since the last one, including those made by the other cases
+    frames = FrameQueue()
+    publisher = SimulationThread(simulator, frames, CommandQueue())
+
+    def frame():
+        simulator.step()
+        publisher.publish()
+        return frames.latest()[0]
+
+    def render(snapshot):
+        renderer.render_snapshot(snapshot)
+
+    # The first frame creates every canvas item; later frames are timed
+    renderer.render_snapshot(frame())
+    return {
+        'topology': (lambda _: manet.update_topology(), move, 1),
+        'find_path': (lambda p: manet.router.find_row_path(*p), pair, 1),
+        'tick': (lambda _: simulator.step(), lambda: None, 1),
+        'q_update': (lambda t: manet.q_router.update(*t), transitions, q_batch),
+        'radio': (lambda h: radio.link_probability(*h), hops, q_batch),
+        'render': (render, frame, 1),
+    }
+
+
+def run_suite(fixtures, cases, samples, max_seconds, seed, q_batch):
+    results = {}
+    for name in fixtures:
+        start = time.perf_counter()
+        simulator = build_fixture(FIXTURES[name], seed)
+        print(f"fixture {name}: {FIXTURES[name]} nodes, {len(simulator.manet.store.links)} links, "
+              f"built in {time.perf_counter() - start:.2f}s")
+        available = suite_cases(simulator, np.random.default_rng(seed), q_batch)
+        results[name] = {}
+        for case in cases:
+            fn, setup, per_call = available[case]
+            times = measure(fn, setup, samples, max_seconds)
+            results[name][case] = summarize(times, peak_memory(fn, setup), per_call)
+            report = results[name][case]
+            print(f"  {case:<10} p50 {report['p50_ms']:>10.3f} ms  p90 {report['p90_ms']:>10.3f} ms  "
+                  f"p99 {report['p99_ms']:>10.3f} ms  {report['per_second']:>12.1f}/s  "
+                  f"peak {report['peak_bytes'] / 2**20:>8.2f} MiB  n={report['samples']}")
+    return results
+
+
+def max_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_params(args):
+    # Settings that change what a case measures; runs are only comparable
+    # when these agree
+    return {
+        'seed': args.seed,
+        'q_batch': args.q_batch,
+        'transmission_range': TRANSMISSION_RANGE,
+        'fixtures': {name: FIXTURES[name] for name in args.fixtures},
+    }
+
+
+def mismatches(params, baseline):
+    # Settings in which this run differs from the baseline, for the
+    # fixtures both ran
+    before = baseline.get('meta', {}).get('params')
+    if before is None:
+        return ["the baseline does not record its run parameters"]
+    found = [f"{name} {params[name]} vs {before.get(name)}" for name in ('seed', 'q_batch', 'transmission_range')
+             if params[name] != before.get(name)]
+    for name, nodes in params['fixtures'].items():
+        other = before.get('fixtures', {}).get(name)
+        if other is not None and other != nodes:
+            found.append(f"fixture {name} has {nodes} nodes vs {other}")
+    return found
+
+
+def regressions(results, baseline, tolerance):
+    # Cases whose median latency grew by more than `tolerance` (a fraction)
+    # over the baseline run; cases missing from either side are ignored
+    found = []
+    for fixture, cases in results.items():
+        for case, report in cases.items():
+            before = baseline.get('results', {}).get(fixture, {}).get(case)
+            if before is None or before['p50_ms'] <= 0:
+                continue
+            ratio = report['p50_ms'] / before['p50_ms']
+            if ratio > 1 + tolerance:
+                found.append({'fixture': fixture, 'case': case, 'baseline_ms': before['p50_ms'],
+                              'p50_ms': report['p50_ms'], 'ratio': ratio})
+    return found
+
+
+def suite(args):
+    params = run_params(args)
+    baseline = None
+    if args.baseline and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Checked up front, so a mismatch does not cost a whole run
+        differences = mismatches(params, baseline)
+        if differences:
+            print(f"Cannot compare with {args.baseline}: " + "; ".join(differences), file=sys.stderr)
+            return 2
+
+    results = run_suite(args.fixtures, args.cases, args.samples, args.max_seconds, args.seed, args.q_batch)
+    report = {
+        'meta': {
+            'seed': args.seed,
+            'params': params,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'max_rss_bytes': max_rss_bytes(),
+        },
+        'results': results,
+    }
+    if args.save_baseline:
+        path = args.baseline or BASELINE
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {path}")
+    elif baseline is not None:
+        if baseline['meta'].get('platform') != report['meta']['platform']:
+            print(f"note: baseline was taken on {baseline['meta'].get('platform')}", file=sys.stderr)
+        report['regressions'] = regressions(results, baseline, args.tolerance)
+        for found in report['regressions']:
+            print(f"REGRESSION {found['fixture']}/{found['case']}: p50 {found['p50_ms']:.3f} ms vs "
+                  f"{found['baseline_ms']:.3f} ms baseline ({found['ratio']:.2f}x)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report.get('regressions') else 0
+
+
+def neighbors(args):
+    backends = args.backends
+    if backends is None:
+        backends = []
+        for name in NEIGHBOR_INDEXES:
+            try:
+                make_neighbor_index(name)
+            except ImportError:
+                continue
+            backends.append(name)
+
+    run_neighbors(args.sizes, backends, args.brute_limit, args.repeats, args.seed)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MANET benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scaling = commands.add_parser('neighbors', help="Neighbor discovery, topology update and tick scaling")
+    scaling.add_argument('--sizes', type=int, nargs='+', default=[15, 100, 500, 1000, 2000, 5000, 10000, 20000, 50000])
+    scaling.add_argument('--backends', nargs='+', default=None)
+    scaling.add_argument('--brute-limit', type=int, default=2000)
+    scaling.add_argument('--repeats', type=int, default=3)
+    scaling.add_argument('--seed', type=int, default=0)
+    scaling.set_defaults(func=neighbors)
+
+    hot_paths = commands.add_parser('suite', help="Latency and memory of the simulation hot paths")
+    hot_paths.add_argument('--fixtures', nargs='+', choices=list(FIXTURES), default=list(FIXTURES))
+    hot_paths.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    hot_paths.add_argument('--samples', type=int, default=50, help="timed calls per case")
+    hot_paths.add_argument('--max-seconds', type=float, default=10.0, help="time budget per case")
+    hot_paths.add_argument('--q-batch', type=int, default=10000, help="transitions per Q update")
+    hot_paths.add_argument('--seed', type=int, default=0)
+    hot_paths.add_argument('--output', help="write the results as JSON")
+    hot_paths.add_argument('--baseline', nargs='?', const=BASELINE,
+                           help="JSON results of an earlier run to compare against; without a path the "
+                                "stored benchmarks/baseline.json")
+    hot_paths.add_argument('--save-baseline', action='store_true',
+                           help="write the results to the --baseline path (default benchmarks/baseline.json) "
+                                "instead of comparing")
+    hot_paths.add_argument('--tolerance', type=float, default=0.25,
+                           help="median slowdown over the baseline that counts as a regression")
+    hot_paths.set_defaults(func=suite)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
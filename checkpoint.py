@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from manet import MANET
+from node_store import Node
+from topology import NEIGHBOR_INDEXES
+
+# A checkpoint is a directory of .npy files plus manifest.json. Full
+# checkpoints hold every array; delta checkpoints name a full checkpoint as
+# their base and only hold the elements that changed since it.
+VERSION = 1
+MANIFEST = 'manifest.json'
+
+QROUTER_PARAMS = ('alpha', 'gamma', 'epsilon', 'reputation_weight', 'energy_weight', 'hop_cost',
+                  'delivery_reward', 'drop_penalty', 'drop_probability', 'updates')
+REPUTATION_PARAMS = ('decay', 'prior_alpha', 'prior_beta', 'trust_threshold')
+ENERGY_PARAMS = ('transmission_range', 'electronics', 'amplifier', 'packet_size', 'drained', 'deaths', 'first_death', 'half_dead')
+ROUTER_PARAMS = ('algorithm', 'energy_weight', 'reputation_weight', 'link_weight')
+RADIO_PARAMS = ('exponent', 'reference_loss', 'noise', 'threshold', 'width', 'edge_margin', 'activity', 'floor',
+                'memory')
+
+
+def _rng_state(rng):
+    return rng.bit_generator.state
+
+
+def _make_rng(state):
+    rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+    rng.bit_generator.state = state
+    return rng
+
+
+def network_state(manet):
+    # (arrays, meta) describing everything needed to rebuild `manet`. Arrays
+    # are the live ones, not copies, so they must be written out right away.
+    store = manet.store
+    q = manet.q_router
+    reputation = manet.reputation
+    energy = manet.energy
+    arrays = {
+        'xy': store.xy,
+        'energy': store.energy,
+        'reputation': store.reputation,
+        'malicious': store.malicious,
+        'alive': store.alive,
+        'ids': store.ids,
+        'links': store.links,
+        'free_rows': np.asarray(store.free_rows, dtype=np.int64),
+        'node_order': np.array([node.row for node in manet.nodes.values()], dtype=np.int64),
+        'q_keys': q.table.keys,
+        'q_values': q.table.values,
+        'trust_alpha': reputation.alpha,
+        'trust_beta': reputation.beta,
+        'trust_forwarded': reputation.pending_forwarded,
+        'trust_dropped': reputation.pending_dropped,
+        'energy_pending': energy.pending,
+    }
+    if manet.radio is not None:
+        arrays['radio_interference'] = manet.radio.interference
+    index = next((name for name, kind in NEIGHBOR_INDEXES.items() if type(manet.neighbor_index) is kind), 'grid')
+    meta = {
+        'network': {
+            'transmission_range': manet.transmission_range,
+            'area_size': store.area_size,
+            'neighbor_index': index,
+            'incremental': manet.topology.incremental,
+            'size': store.size,
+            'capacity': store.capacity,
+            'next_id': manet.nodes.next_id,
+        },
+        'q_router': {name: getattr(q, name) for name in QROUTER_PARAMS},
+        'q_table': {'count': q.table.count, 'max_load': q.table.max_load},
+        'reputation': {name: getattr(reputation, name) for name in REPUTATION_PARAMS},
+        'energy': dict({name: getattr(energy, name) for name in ENERGY_PARAMS}, spent=dict(energy.spent)),
+        'router': dict({name: getattr(manet.router, name) for name in ROUTER_PARAMS},
+                       max_age=manet.router.cache.max_age if manet.router.cache is not None else None),
+        'radio': None if manet.radio is None else {name: getattr(manet.radio, name) for name in RADIO_PARAMS},
+        'rng': _rng_state(store.rng),
+        # The Q router normally shares the store's generator
+        'q_rng': None if q.rng is store.rng else _rng_state(q.rng),
+    }
+    return arrays, meta
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def save_checkpoint(manet, path, base=None, tick=None):
+    # Write a checkpoint of `manet` to the directory `path`. With `base`, the
+    # path of a full checkpoint, only the elements that differ from it are
+    # written. The directory is written under a temporary name and renamed
+    # when complete, so an interrupted save never leaves a partial checkpoint.
+    arrays, meta = network_state(manet)
+    if base is not None and read_manifest(base)['kind'] != 'full':
+        raise ValueError(f"Delta checkpoints must be based on a full checkpoint, '{base}' is a delta")
+
+    staging = path.rstrip(os.sep) + '.partial'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    stored = {}
+    for name, array in arrays.items():
+        stored[name] = _write_array(staging, name, array, base)
+
+    manifest = {
+        'version': VERSION,
+        'kind': 'full' if base is None else 'delta',
+        'base': None if base is None else os.path.relpath(os.path.abspath(base), os.path.abspath(path)),
+        'tick': tick,
+        'arrays': stored,
+        'meta': meta,
+    }
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    return path
+
+
+def _write_array(directory, name, array, base):
+    # Full arrays are stored as they are; in a delta an array is either
+    # unchanged, a list of changed flat indices and values, or stored whole
+    # when most of it changed or its shape did
+    array = np.ascontiguousarray(array)
+    if base is not None:
+        previous = os.path.join(base, name + '.npy')
+        if os.path.exists(previous):
+            old = np.load(previous, mmap_mode='r')
+            if old.shape == array.shape and old.dtype == array.dtype:
+                changed = np.flatnonzero(old.reshape(-1) != array.reshape(-1))
+                if not len(changed):
+                    return 'base'
+                if len(changed) * (8 + array.itemsize) < array.nbytes:
+                    np.save(os.path.join(directory, name + '.index.npy'), changed)
+                    np.save(os.path.join(directory, name + '.delta.npy'), array.reshape(-1)[changed])
+                    return 'delta'
+    np.save(os.path.join(directory, name + '.npy'), array)
+    return 'full'
+
+
+def _read_arrays(path, manifest, mmap):
+    # Arrays are opened copy-on-write, so restoring only reads the pages
+    # that are touched and the checkpoint files are never modified
+    mode = 'c' if mmap else None
+    if manifest['kind'] == 'full':
+        return {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mode) for name in manifest['arrays']}
+
+    base = os.path.normpath(os.path.join(path, manifest['base']))
+    arrays = {}
+    for name, how in manifest['arrays'].items():
+        if how == 'full':
+            arrays[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode=mode)
+            continue
+        array = np.load(os.path.join(base, name + '.npy'), mmap_mode=mode)
+        if how == 'delta':
+            if not mmap:
+                array = np.array(array)
+            index = np.load(os.path.join(path, name + '.index.npy'))
+            array.reshape(-1)[index] = np.load(os.path.join(path, name + '.delta.npy'))
+        arrays[name] = array
+    return arrays
+
+
+def load_checkpoint(path, mmap=True):
+    # Rebuild the MANET saved at `path`. Derived state - the route cache and
+    # the incremental topology's bookkeeping - is rebuilt rather than stored.
+    manifest = read_manifest(path)
+    if manifest['version'] != VERSION:
+        raise ValueError(f"Unsupported checkpoint version {manifest['version']}, expected {VERSION}")
+    arrays = _read_arrays(path, manifest, mmap)
+    meta = manifest['meta']
+    network = meta['network']
+    router = meta['router']
+
+    manet = MANET(num_nodes=0, neighbor_index=network['neighbor_index'], incremental=network['incremental'],
+                  transmission_range=network['transmission_range'], area_size=network['area_size'],
+                  radio=meta.get('radio'))
+    store = manet.store
+    store.rng = _make_rng(meta['rng'])
+    store.capacity = network['capacity']
+    store.size = network['size']
+    store.xy = arrays['xy']
+    store.energy = arrays['energy']
+    store.reputation = arrays['reputation']
+    store.malicious = arrays['malicious']
+    store.alive = arrays['alive']
+    store.ids = arrays['ids']
+    store.free_rows = arrays['free_rows'].tolist()
+    store._active = None
+    store.set_links(arrays['links'])
+    manet.nodes._nodes = {int(store.ids[row]): Node(int(store.ids[row]), store=store, row=row)
+                          for row in arrays['node_order'].tolist()}
+    manet.nodes.next_id = network['next_id']
+
+    q = manet.q_router
+    for name, value in meta['q_router'].items():
+        setattr(q, name, value)
+    q.rng = store.rng if meta['q_rng'] is None else _make_rng(meta['q_rng'])
+    table = q.table
+    table.keys = arrays['q_keys']
+    table.values = arrays['q_values']
+    table.mask = len(table.keys) - 1
+    table.shift = np.uint64(64 - int(np.log2(len(table.keys))))
+    table.count = meta['q_table']['count']
+    table.max_load = meta['q_table']['max_load']
+
+    reputation = manet.reputation
+    for name, value in meta['reputation'].items():
+        setattr(reputation, name, value)
+    reputation.alpha = arrays['trust_alpha']
+    reputation.beta = arrays['trust_beta']
+    reputation.pending_forwarded = arrays['trust_forwarded']
+    reputation.pending_dropped = arrays['trust_dropped']
+
+    energy = manet.energy
+    for name, value in meta['energy'].items():
+        setattr(energy, name, value)
+    energy.pending = arrays['energy_pending']
+
+    manet.router.algorithm = router['algorithm']
+    manet.router.energy_weight = router['energy_weight']
+    manet.router.reputation_weight = router['reputation_weight']
+    manet.router.link_weight = router.get('link_weight', manet.router.link_weight)
+    if manet.radio is not None:
+        manet.radio.interference = arrays['radio_interference']
+    if router['max_age'] is None:
+        manet.router.cache = None
+    else:
+        manet.router.cache.max_age = router['max_age']
+
+    # Rebuild the incremental topology; it finds the links that were saved
+    manet.topology.reset()
+    manet.update_topology()
+    return manet
+
+
+class Checkpointer:
+    # Numbered checkpoints of one network under `directory`. Every
+    # `full_every`-th save is a full checkpoint and the saves in between are
+    # deltas against it, so restoring never reads more than two checkpoints.
+    # Added as a simulator observer it saves every `interval` ticks.
+    def __init__(self, manet, directory, full_every=10, interval=100):
+        self.manet = manet
+        self.directory = directory
+        self.full_every = full_every
+        self.interval = interval
+        os.makedirs(directory, exist_ok=True)
+        self.saved = self.list()
+        self.base = None
+
+    def list(self):
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.startswith('checkpoint-') and os.path.exists(os.path.join(self.directory, name, MANIFEST)))
+
+    def latest(self):
+        saved = self.list()
+        return saved[-1] if saved else None
+
+    def save(self, tick=None):
+        path = os.path.join(self.directory, f'checkpoint-{len(self.saved):06d}')
+        full = self.base is None or len(self.saved) % self.full_every == 0
+        save_checkpoint(self.manet, path, base=None if full else self.base, tick=tick)
+        if full:
+            self.base = path
+        self.saved.append(path)
+        return path
+
+    def __call__(self, simulator):
+        if simulator.tick % self.interval == 0:
+            self.save(simulator.tick)
@@ -0,0 +1,666 @@
+import ipaddress
+import os
+import sys
+import time
+
+import numpy as np
+
+from forwarding import PathForwarder
+from manet import MANET
+from metrics import QuantileSketch
+from mobility import RandomJitter
+from node_store import AREA_SIZE
+from traffic import DELIVERED, ConstantBitrateTraffic, distinct_pairs
+
+# Columns of the records exchanged between processes. A node record's
+# region is its new owner in a handoff and its owner in a halo, and its
+# trust evidence (alpha, beta) travels with it; a packet's current node is
+# the one holding it, always owned by the region it is sent to. Feedback is
+# what a region learnt about nodes it does not own: watchdog counts and
+# unsettled energy charges, delivered to the owner by node id.
+NODE_FIELDS = {'id': np.int64, 'x': float, 'y': float, 'energy': float, 'reputation': float, 'malicious': bool,
+               'alpha': float, 'beta': float, 'region': np.int64}
+PACKET_FIELDS = {'id': np.int64, 'source': np.int64, 'dest': np.int64, 'dest_region': np.int64,
+                 'current': np.int64, 'hops': np.int64, 'born': np.int64, 'regions': np.int64}
+FEEDBACK_FIELDS = {'id': np.int64, 'forwarded': float, 'dropped': float, 'energy': float}
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _records(fields, count=0):
+    return {name: np.zeros(count, dtype=dtype) for name, dtype in fields.items()}
+
+
+def _take(records, index):
+    return {name: column[index] for name, column in records.items()}
+
+
+def _join(parts, fields):
+    parts = [part for part in parts if len(part['id'])]
+    if not parts:
+        return _records(fields)
+    return {name: np.concatenate([part[name] for part in parts]) for name in fields}
+
+
+def _split(records, regions, count):
+    # Records grouped by region, one (possibly empty) dict per region
+    order = np.argsort(regions, kind='stable')
+    bounds = np.searchsorted(regions[order], np.arange(count + 1))
+    return [_take(records, order[bounds[i]:bounds[i + 1]]) for i in range(count)]
+
+
+class Regions:
+    # The area cut into a cols x rows grid of equal regions, numbered row by
+    # row from the origin
+    def __init__(self, area_size, cols, rows, transmission_range):
+        if cols < 1 or rows < 1:
+            raise ValueError(f"Region grid must be at least 1x1, got {cols}x{rows}")
+        self.area_size = area_size
+        self.cols = cols
+        self.rows = rows
+        self.transmission_range = transmission_range
+        self.width = area_size / cols
+        self.height = area_size / rows
+
+    def __len__(self):
+        return self.cols * self.rows
+
+    def locate(self, x, y):
+        ix = np.clip((np.asarray(x) // self.width).astype(np.int64), 0, self.cols - 1)
+        iy = np.clip((np.asarray(y) // self.height).astype(np.int64), 0, self.rows - 1)
+        return iy * self.cols + ix
+
+    def bounds(self, region):
+        iy, ix = divmod(region, self.cols)
+        return ix * self.width, iy * self.height, (ix + 1) * self.width, (iy + 1) * self.height
+
+    def neighbors(self, region):
+        iy, ix = divmod(region, self.cols)
+        return [(iy + dy) * self.cols + ix + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                if (dx or dy) and 0 <= ix + dx < self.cols and 0 <= iy + dy < self.rows]
+
+    def near(self, region, x, y):
+        # Mask of the points within transmission_range of `region`
+        x0, y0, x1, y1 = self.bounds(region)
+        dx = np.maximum(np.maximum(x0 - x, x - x1), 0)
+        dy = np.maximum(np.maximum(y0 - y, y - y1), 0)
+        return dx * dx + dy * dy <= self.transmission_range ** 2
+
+    def toward(self, here, there):
+        # Next region from `here` towards each of `there`, best first: the
+        # diagonal step, then the two straight ones. A step that goes nowhere
+        # along an axis yields `here` itself.
+        hy, hx = divmod(here, self.cols)
+        ty, tx = np.divmod(np.asarray(there, dtype=np.int64), self.cols)
+        sx = np.sign(tx - hx)
+        sy = np.sign(ty - hy)
+        return np.stack([(hy + sy) * self.cols + hx + sx, hy * self.cols + hx + sx, (hy + sy) * self.cols + hx], axis=1)
+
+
+class RegionWorker:
+    # One region of a distributed run: a MANET holding the nodes the region
+    # owns plus ghost copies of the nodes of neighbouring regions within
+    # transmission_range of its edges. Ghosts are refreshed every tick from
+    # the neighbours' halos, one tick old; they take part in the topology so
+    # routes can reach over the border, but never move or originate packets.
+    # Nothing about a ghost is settled here: what its relaying and receiving
+    # cost or revealed goes back to its owner as feedback, applied there the
+    # next tick, and its energy and trust only ever come from the halo.
+    #
+    # A packet for another region is routed to the ghost nearest its holder
+    # in the next region towards its destination (or to the destination
+    # itself when that is a ghost here) and handed to that ghost's owner, so
+    # it advances one region per tick.
+    def __init__(self, config, region, nodes):
+        self.config = config
+        self.region = region
+        self.regions = Regions(config['area_size'], config['cols'], config['rows'], config['transmission_range'])
+        self.manet = MANET(num_nodes=0, seed=config['seeds'][region], transmission_range=config['transmission_range'],
+                           area_size=config['area_size'])
+        self.mobility = config['mobility']
+        self.forwarder = PathForwarder(self.manet, max_paths=0)
+        self.ghost = np.zeros(0, dtype=bool)
+        self.ghost_region = np.zeros(0, dtype=np.int64)
+        self.ghost_ids = []
+        self.manet.store.release_hooks.append(self._forget)
+        self._arrive(nodes)
+        self.manet.update_topology()
+
+    def _fit(self):
+        capacity = self.manet.store.capacity
+        if len(self.ghost) < capacity:
+            extra = capacity - len(self.ghost)
+            self.ghost = np.concatenate([self.ghost, np.zeros(extra, dtype=bool)])
+            self.ghost_region = np.concatenate([self.ghost_region, np.full(extra, -1, dtype=np.int64)])
+
+    def _forget(self, rows):
+        self._fit()
+        self.ghost[rows] = False
+
+    def _add(self, records):
+        if not len(records['id']):
+            return np.zeros(0, dtype=np.int64)
+        nodes = self.manet.nodes.add_many(records['id'].tolist(), np.stack([records['x'], records['y']], axis=1),
+                                          energy=records['energy'], reputation=records['reputation'],
+                                          is_malicious=records['malicious'])
+        self._fit()
+        return np.array([node.row for node in nodes], dtype=np.int64)
+
+    def _arrive(self, records):
+        # Nodes handed over to this region keep the trust they had built up
+        rows = self._add(records)
+        self.manet.reputation.set_evidence(rows, records['alpha'], records['beta'])
+        return rows
+
+    def _node_records(self, rows, regions):
+        store = self.manet.store
+        alpha, beta = self.manet.reputation.evidence(rows)
+        return {
+            'id': store.ids[rows],
+            'x': store.x[rows],
+            'y': store.y[rows],
+            'energy': store.energy[rows],
+            'reputation': store.reputation[rows],
+            'malicious': store.malicious[rows],
+            'alpha': alpha,
+            'beta': beta,
+            'region': np.broadcast_to(np.asarray(regions, dtype=np.int64), len(rows)).copy(),
+        }
+
+    def owned_rows(self):
+        rows = self.manet.store.active_rows()
+        return rows[~self.ghost[rows]]
+
+    def ghost_rows(self):
+        rows = self.manet.store.active_rows()
+        return rows[self.ghost[rows]]
+
+    def _refresh_ghosts(self, halo):
+        # Ghosts still in the halo are updated in place, so the topology sees
+        # them move like any other node instead of leaving and rejoining.
+        # Ghosts that dropped out of it, or died here, are removed.
+        nodes = self.manet.nodes
+        store = self.manet.store
+        old = np.array(self.ghost_ids, dtype=np.int64)
+        rows = np.array([nodes[node_id].row for node_id in self.ghost_ids], dtype=np.int64)
+        kept = np.isin(old, halo['id']) & store.alive[rows]
+        nodes.remove_many(old[~kept].tolist())
+
+        order = np.argsort(old[kept])
+        rows, kept_ids = rows[kept][order], old[kept][order]
+        index = np.searchsorted(kept_ids, halo['id'])
+        found = index < len(kept_ids)
+        found[found] = kept_ids[index[found]] == halo['id'][found]
+        updated = rows[index[found]]
+        store.xy[0, updated] = halo['x'][found]
+        store.xy[1, updated] = halo['y'][found]
+        store.energy[updated] = halo['energy'][found]
+        store.reputation[updated] = halo['reputation'][found]
+        self.ghost_region[updated] = halo['region'][found]
+
+        added = self._add(_take(halo, ~found))
+        self.ghost[added] = True
+        self.ghost_region[added] = halo['region'][~found]
+        self.ghost_ids = halo['id'].tolist()
+
+    def _feedback(self, rows):
+        # Evidence and charges gathered here about nodes settled elsewhere,
+        # taken out of this region's engines
+        forwarded, dropped = self.manet.reputation.take_pending(rows)
+        charges = self.manet.energy.take_pending(rows)
+        sent = (forwarded > 0) | (dropped > 0) | (charges > 0)
+        return {'id': self.manet.store.ids[rows[sent]], 'forwarded': forwarded[sent], 'dropped': dropped[sent],
+                'energy': charges[sent]}
+
+    def _apply(self, feedback):
+        # Feedback from other regions about the nodes owned here, settled
+        # with this tick's own evidence and charges
+        nodes = self.manet.nodes
+        rows = np.array([nodes[node_id].row if node_id in nodes else -1
+                         for node_id in feedback['id'].tolist()], dtype=np.int64)
+        owned = rows >= 0
+        owned[owned] = ~self.ghost[rows[owned]]
+        rows = rows[owned]
+        self.manet.reputation.add_pending(rows, feedback['forwarded'][owned], feedback['dropped'][owned])
+        self.manet.energy.add_pending(rows, feedback['energy'][owned])
+
+    def exchange(self):
+        # Hand off the owned nodes that left the region, then collect the
+        # halo each neighbour needs from what is left. The feedback covers
+        # the ghosts and the nodes handed off, whose charges are settled by
+        # their new owner.
+        store = self.manet.store
+        owned = self.owned_rows()
+        homes = self.regions.locate(store.x[owned], store.y[owned])
+        leaving = homes != self.region
+        handoffs = self._node_records(owned[leaving], homes[leaving])
+        feedback = self._feedback(np.concatenate([self.ghost_rows(), owned[leaving]]))
+        self.manet.nodes.remove_many(handoffs['id'].tolist())
+
+        # Only nodes near the region's own edges can be near a neighbour
+        owned = owned[~leaving]
+        x, y = store.x[owned], store.y[owned]
+        x0, y0, x1, y1 = self.regions.bounds(self.region)
+        reach = self.regions.transmission_range
+        edge = owned[(x - x0 <= reach) | (x1 - x <= reach) | (y - y0 <= reach) | (y1 - y <= reach)]
+        halo = {}
+        for neighbor in self.regions.neighbors(self.region):
+            near = edge[self.regions.near(neighbor, store.x[edge], store.y[edge])]
+            halo[neighbor] = self._node_records(near, self.region)
+        return {'handoffs': handoffs, 'halo': halo, 'feedback': feedback}
+
+    def step(self, message):
+        start = time.perf_counter()
+        manet = self.manet
+        store = manet.store
+        tick = message['tick']
+        # Ghosts first: a node handed over may have been one of them
+        self._refresh_ghosts(message['halo'])
+        self._arrive(message['arrivals'])
+        self._apply(message['feedback'])
+
+        owned = self.owned_rows()
+        displacement = self.mobility.move(store, owned, store.rng, tick)
+        died = store.ids[manet.energy.update(tick, idle=self.config['energy_drain'], rows=owned)]
+        manet.update_topology(displacement)
+
+        packets = message['packets']
+        delivered, outgoing, hops, latency = self._route(packets, tick)
+        manet.reputation.update(self.owned_rows())
+
+        outbox = self.exchange()
+        outbox['packets'] = outgoing
+        outbox['stats'] = {
+            'delivered': int(delivered.sum()),
+            'dropped': len(packets['id']) - int(delivered.sum()) - len(outgoing['id']),
+            'hops': hops,
+            'latency': latency,
+            'died': died,
+            'alive': len(self.owned_rows()),
+            'ghosts': len(self.ghost_ids),
+            'handoffs': len(outbox['handoffs']['id']),
+            'exported': len(outgoing['id']),
+            'seconds': time.perf_counter() - start,
+        }
+        return outbox
+
+    def _route(self, packets, tick):
+        # Route this region's packets one leg: to their destination when it
+        # is owned here, else to the border. Returns the delivered mask, the
+        # packets handed on, and the hops and latency of the delivered ones.
+        manet = self.manet
+        nodes = manet.nodes
+        count = len(packets['id'])
+        if not count:
+            return np.zeros(0, dtype=bool), _records(PACKET_FIELDS), np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        current = np.array([nodes[node_id].row if node_id in nodes else -1
+                            for node_id in packets['current'].tolist()], dtype=np.int64)
+        dest_rows = np.array([nodes[node_id].row if node_id in nodes else -1
+                              for node_id in packets['dest'].tolist()], dtype=np.int64)
+        local = packets['dest_region'] == self.region
+        targets = np.where(local, dest_rows, -1)
+        # A destination that is a ghost here is reached directly
+        leaving = ~local & (dest_rows >= 0)
+        leaving[leaving] = self.ghost[dest_rows[leaving]]
+        targets[leaving] = dest_rows[leaving]
+        exits = ~local & ~leaving & (current >= 0)
+        targets[exits] = self._exits(current[exits], packets['dest_region'][exits])
+
+        routable = (current >= 0) & (targets >= 0) & (packets['regions'] <= self.config['max_regions'])
+        reached = np.zeros(count, dtype=bool)
+        hops = packets['hops'].copy()
+        if routable.any():
+            batch = self.forwarder.forward(current[routable], targets[routable])
+            # What lands on ghosts is sent to their owners by exchange()
+            manet.energy.charge(batch.senders, batch.receivers)
+            manet.reputation.observe(batch.observed, batch.forwarded)
+            reached[routable] = batch.status == DELIVERED
+            hops[routable] += batch.hops
+
+        delivered = reached & local
+        handed = reached & ~local
+        outgoing = _take(packets, handed)
+        outgoing['current'] = manet.store.ids[targets[handed]]
+        outgoing['hops'] = hops[handed]
+        outgoing['regions'] = outgoing['regions'] + 1
+        return delivered, outgoing, hops[delivered], (tick - packets['born'][delivered]).astype(float)
+
+    def _exits(self, rows, dest_regions):
+        # Ghost row to carry each packet at `rows` over the border towards
+        # its destination region, -1 where no region on the way has ghosts
+        store = self.manet.store
+        targets = np.full(len(rows), -1, dtype=np.int64)
+        ghosts = self.ghost_rows()
+        if not len(ghosts) or not len(rows):
+            return targets
+        options = self.regions.toward(self.region, dest_regions)
+        for column in range(options.shape[1]):
+            waiting = targets < 0
+            for region in np.unique(options[waiting, column]).tolist():
+                if region == self.region:
+                    continue
+                candidates = ghosts[self.ghost_region[ghosts] == region]
+                if not len(candidates):
+                    continue
+                chosen = np.flatnonzero(waiting & (options[:, column] == region))
+                targets[chosen] = candidates[self._nearest(rows[chosen], candidates)]
+        return targets
+
+    def _nearest(self, rows, candidates):
+        # Index into candidates of the nearest one to each row, in chunks
+        # that keep the distance matrix around a million entries
+        xy = self.manet.store.xy
+        nearest = np.empty(len(rows), dtype=np.int64)
+        chunk = max(1, (1 << 20) // len(candidates))
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            dx = xy[0, part][:, None] - xy[0, candidates][None, :]
+            dy = xy[1, part][:, None] - xy[1, candidates][None, :]
+            nearest[start:start + chunk] = np.argmin(dx * dx + dy * dy, axis=1)
+        return nearest
+
+
+def run_worker(address, authkey):
+    # Body of a worker process, local or on another machine: connect to the
+    # coordinator, take the region it assigns and step it until told to stop
+    from multiprocessing.connection import Client
+
+    connection = Client(address, authkey=authkey)
+    try:
+        message = connection.recv()
+        worker = RegionWorker(message['config'], message['region'], message['nodes'])
+        connection.send(worker.exchange())
+        while True:
+            message = connection.recv()
+            if message['kind'] == 'stop':
+                break
+            connection.send(worker.step(message))
+    finally:
+        connection.close()
+
+
+class DistributedSimulation:
+    # Coordinator of a simulation split over worker processes, one per region
+    # of a cols x rows grid. Workers connect over multiprocessing
+    # connections (authenticated, pickled messages) on a TCP address, so
+    # they can run on this machine (start_workers) or on others
+    # (`python distributed.py worker --connect HOST:PORT --authkey KEY`).
+    # Messages are unpickled, so the key is all that keeps a stranger from
+    # running code in these processes: without one a random key is made,
+    # which is only allowed on a loopback address.
+    #
+    # Every tick runs in lockstep: each worker gets the nodes handed to it,
+    # its neighbours' halos, feedback about its nodes and the packets its
+    # nodes hold, steps its region, and replies with its own handoffs, halos,
+    # feedback, packets and stats. Workers never talk to each other: the
+    # coordinator relays everything between them (a star, so it is also
+    # the bottleneck), keeps the directory of which region owns each node,
+    # and generates traffic over all alive nodes. As a packet crosses at
+    # most one border per tick, routes spanning k regions take k ticks.
+    def __init__(self, num_nodes=15, grid=(2, 2), area_size=AREA_SIZE, transmission_range=30, malicious_ratio=0.1,
+                 seed=None, mobility_step=2.0, energy_drain=0.01, traffic=None, max_regions=None,
+                 address=('127.0.0.1', 0), authkey=None, mobility=None):
+        from multiprocessing.connection import Listener
+
+        if authkey is None:
+            if not is_loopback(address[0]):
+                raise ValueError(f"An explicit authkey is required to listen on non-loopback address '{address[0]}'")
+            authkey = os.urandom(32)
+        cols, rows = grid
+        self.regions = Regions(area_size, cols, rows, transmission_range)
+        seeds = np.random.SeedSequence(seed).spawn(len(self.regions) + 1)
+        self.rng = np.random.default_rng(seeds[-1])
+        self.traffic = traffic if traffic is not None else ConstantBitrateTraffic(1)
+        self.config = {
+            'area_size': area_size,
+            'cols': cols,
+            'rows': rows,
+            'transmission_range': transmission_range,
+            'mobility': mobility if mobility is not None else RandomJitter(mobility_step),
+            'energy_drain': energy_drain,
+            'max_regions': max_regions if max_regions is not None else 2 * (cols + rows),
+            'seeds': seeds[:-1],
+        }
+        positions = self.rng.uniform(0, area_size, size=(num_nodes, 2))
+        self.directory = self.regions.locate(positions[:, 0], positions[:, 1])
+        self.alive = np.ones(num_nodes, dtype=bool)
+        self._initial = {
+            'id': np.arange(num_nodes, dtype=np.int64),
+            'x': positions[:, 0],
+            'y': positions[:, 1],
+            'energy': np.full(num_nodes, 100.0),
+            'reputation': np.ones(num_nodes),
+            'alpha': np.zeros(num_nodes),
+            'beta': np.zeros(num_nodes),
+            'malicious': np.arange(num_nodes) < int(num_nodes * malicious_ratio),
+            'region': self.directory.copy(),
+        }
+
+        self.authkey = authkey
+        # Every worker may connect at once
+        self.listener = Listener(address, backlog=len(self.regions), authkey=authkey)
+        self.address = self.listener.address
+        self.connections = []
+        self.processes = []
+        self.tick = 0
+        self.next_packet = 0
+        self.inboxes = None
+        self.generated = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.deaths = 0
+        self.hops = QuantileSketch()
+        self.latency = QuantileSketch()
+        self.last = {}
+
+    def start_workers(self):
+        # One local process per region
+        import multiprocessing
+
+        for _ in range(len(self.regions)):
+            process = multiprocessing.Process(target=run_worker, args=(self.address, self.authkey), daemon=True)
+            process.start()
+            self.processes.append(process)
+        self.accept()
+        return self
+
+    def accept(self):
+        # Wait for a worker per region, assigned in the order they connect
+        count = len(self.regions)
+        nodes = _split(self._initial, self._initial['region'], count)
+        while len(self.connections) < count:
+            region = len(self.connections)
+            connection = self.listener.accept()
+            connection.send({'kind': 'init', 'region': region, 'config': self.config, 'nodes': nodes[region]})
+            self.connections.append(connection)
+        self._initial = None
+        self._relay([connection.recv() for connection in self.connections], _records(PACKET_FIELDS))
+        return self
+
+    def _relay(self, outboxes, packets):
+        # Turn the workers' outboxes into next tick's inboxes
+        count = len(self.regions)
+        handoffs = _join([outbox['handoffs'] for outbox in outboxes], NODE_FIELDS)
+        self.directory[handoffs['id']] = handoffs['region']
+        arrivals = _split(handoffs, handoffs['region'], count)
+        halos = [_join([outbox['halo'][region] for outbox in outboxes if region in outbox['halo']], NODE_FIELDS)
+                 for region in range(count)]
+        # Feedback follows its node to the region owning it after the handoffs
+        feedback = _join([outbox['feedback'] for outbox in outboxes], FEEDBACK_FIELDS)
+        feedback = _split(feedback, self.directory[feedback['id']], count)
+        # Routed by where their holder and destination live now
+        packets['dest_region'] = self.directory[packets['dest']]
+        held = _split(packets, self.directory[packets['current']], count)
+        self.inboxes = [{'arrivals': arrivals[region], 'halo': halos[region], 'packets': held[region],
+                         'feedback': feedback[region]} for region in range(count)]
+
+    def _generate(self):
+        alive = np.flatnonzero(self.alive)
+        sources, dests = distinct_pairs(alive, self.traffic.packet_count(self.tick, self.rng), self.rng)
+        count = len(sources)
+        packets = _records(PACKET_FIELDS, count)
+        packets['id'] = np.arange(self.next_packet, self.next_packet + count)
+        packets['source'] = sources
+        packets['dest'] = dests
+        packets['dest_region'] = self.directory[dests]
+        packets['current'] = sources
+        packets['born'][:] = self.tick
+        self.next_packet += count
+        self.generated += count
+        return packets
+
+    def step(self):
+        if self.inboxes is None:
+            raise ValueError("No workers connected; call start_workers() or accept() first")
+        start = time.perf_counter()
+        count = len(self.regions)
+        packets = self._generate()
+        fresh = _split(packets, self.directory[packets['current']], count)
+        for region, connection in enumerate(self.connections):
+            inbox = self.inboxes[region]
+            inbox['packets'] = _join([inbox['packets'], fresh[region]], PACKET_FIELDS)
+            connection.send(dict(inbox, kind='step', tick=self.tick))
+        outboxes = [connection.recv() for connection in self.connections]
+
+        stats = [outbox['stats'] for outbox in outboxes]
+        delivered = sum(s['delivered'] for s in stats)
+        dropped = sum(s['dropped'] for s in stats)
+        self.delivered += delivered
+        self.dropped += dropped
+        for s in stats:
+            self.hops.add(s['hops'])
+            self.latency.add(s['latency'])
+            self.alive[s['died']] = False
+            self.deaths += len(s['died'])
+        self._relay(outboxes, _join([outbox['packets'] for outbox in outboxes], PACKET_FIELDS))
+        seconds = [s['seconds'] for s in stats]
+        self.last = {
+            'tick': self.tick,
+            'generated': len(packets['id']),
+            'delivered': delivered,
+            'dropped': dropped,
+            'in_flight': sum(s['exported'] for s in stats),
+            'handoffs': sum(s['handoffs'] for s in stats),
+            'ghosts': sum(s['ghosts'] for s in stats),
+            'alive': [s['alive'] for s in stats],
+            # The slowest worker bounds the tick; the rest is relaying
+            'worker_seconds': max(seconds),
+            'seconds': time.perf_counter() - start,
+        }
+        self.tick += 1
+        return self.last
+
+    def run(self, n_ticks):
+        for _ in range(n_ticks):
+            self.step()
+        return self
+
+    def summary(self):
+        return {
+            'tick': self.tick,
+            'alive': int(self.alive.sum()),
+            'dead': self.deaths,
+            'generated': self.generated,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'success_rate': self.delivered / self.generated * 100 if self.generated else 0.0,
+            'hops': self.hops.summary(),
+            'latency': self.latency.summary(),
+            'last_tick': self.last,
+        }
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send({'kind': 'stop'})
+                connection.close()
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        self.listener.close()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Simulation split into regions over worker processes")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Coordinate a run, with local workers unless --remote")
+    run.add_argument('--num-nodes', type=int, default=10000)
+    run.add_argument('--grid', type=int, nargs=2, default=(2, 2), metavar=('COLS', 'ROWS'))
+    run.add_argument('--area-size', type=float, default=AREA_SIZE)
+    run.add_argument('--transmission-range', type=float, default=30)
+    run.add_argument('--malicious-ratio', type=float, default=0.1)
+    run.add_argument('--packets-per-tick', type=int, default=1)
+    run.add_argument('--ticks', type=int, default=100)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--listen', default='127.0.0.1:0', help="HOST:PORT workers connect to")
+    run.add_argument('--remote', action='store_true', help="wait for workers started on other machines")
+    run.add_argument('--authkey', default=None,
+                     help="shared secret of the workers; required unless listening on loopback")
+    run.add_argument('--report-every', type=int, default=10)
+
+    worker = commands.add_parser('worker', help="Serve one region of a coordinator's run")
+    worker.add_argument('--connect', required=True, help="HOST:PORT of the coordinator")
+    worker.add_argument('--authkey', required=True, help="the coordinator's shared secret")
+
+    args = parser.parse_args()
+    if args.command == 'worker':
+        run_worker(_address(args.connect), args.authkey.encode())
+        return
+
+    host, _ = _address(args.listen)
+    authkey = args.authkey
+    if authkey is None:
+        if not is_loopback(host):
+            parser.error(f"--authkey is required to listen on non-loopback address '{host}'")
+        # Remote workers on this machine need the key to connect
+        authkey = os.urandom(32).hex() if args.remote else None
+    simulation = DistributedSimulation(
+        num_nodes=args.num_nodes, grid=tuple(args.grid), area_size=args.area_size,
+        transmission_range=args.transmission_range, malicious_ratio=args.malicious_ratio, seed=args.seed,
+        traffic=ConstantBitrateTraffic(args.packets_per_tick), address=_address(args.listen),
+        authkey=authkey.encode() if authkey is not None else None)
+    with simulation:
+        if args.remote:
+            host, port = simulation.address
+            print(f"Waiting for {len(simulation.regions)} workers on {host}:{port}", file=sys.stderr)
+            if args.authkey is None:
+                print(f"Workers connect with --authkey {authkey}", file=sys.stderr)
+            simulation.accept()
+        else:
+            simulation.start_workers()
+        for _ in range(args.ticks):
+            last = simulation.step()
+            if args.report_every and simulation.tick % args.report_every == 0:
+                print(f"tick {last['tick']}: {int(simulation.alive.sum())} alive, {last['handoffs']} handoffs, "
+                      f"{last['ghosts']} ghosts, {last['seconds'] * 1000:.1f} ms", file=sys.stderr)
+        print(json.dumps(simulation.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
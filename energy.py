@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class EnergyModel:
+    # First-order radio energy model, in the same units as Node.energy:
+    #
+    #   transmit = size * (electronics + amplifier * distance^2)
+    #   receive  = size * electronics
+    #
+    # Transmissions are charged per tick in one batch and applied together
+    # with the idle drain by update(). Nodes that run out of energy are taken
+    # out of the topology but keep their id, so they stay inspectable.
+    def __init__(self, store, transmission_range=30, electronics=0.05, amplifier=1e-4, packet_size=1.0):
+        self.store = store
+        self.transmission_range = transmission_range
+        self.electronics = electronics
+        self.amplifier = amplifier
+        self.packet_size = packet_size
+        self.pending = np.zeros(0)
+        self.spent = {'transmit': 0.0, 'receive': 0.0, 'idle': 0.0}
+        self.drained = 0.0
+        self.deaths = 0
+        self.first_death = None
+        self.half_dead = None
+        self._fit()
+
+    def _fit(self):
+        if len(self.pending) < self.store.capacity:
+            self.pending = np.concatenate([self.pending, np.zeros(self.store.capacity - len(self.pending))])
+
+    def transmit_cost(self, distances, sizes=None):
+        sizes = self.packet_size if sizes is None else np.asarray(sizes, dtype=float)
+        distances = np.asarray(distances, dtype=float)
+        return sizes * (self.electronics + self.amplifier * distances * distances)
+
+    def receive_cost(self, sizes=None):
+        sizes = self.packet_size if sizes is None else np.asarray(sizes, dtype=float)
+        return sizes * self.electronics
+
+    def charge(self, senders, receivers, sizes=None):
+        # One entry per transmission; a receiver of -1 is a transmission nobody
+        # received, which is sent at full range. Returns the transmit costs.
+        senders = np.asarray(senders, dtype=np.int64)
+        receivers = np.asarray(receivers, dtype=np.int64)
+        if not len(senders):
+            return np.zeros(0)
+        self._fit()
+        heard = receivers >= 0
+        distances = np.full(len(senders), float(self.transmission_range))
+        distances[heard] = np.sqrt(self.store.squared_distances(senders[heard], receivers[heard]))
+
+        transmit = np.broadcast_to(self.transmit_cost(distances, sizes), senders.shape)
+        receive = np.broadcast_to(self.receive_cost(sizes), senders.shape)[heard]
+        capacity = len(self.pending)
+        self.pending += np.bincount(senders, weights=transmit, minlength=capacity)
+        self.pending += np.bincount(receivers[heard], weights=receive, minlength=capacity)
+        self.spent['transmit'] += float(transmit.sum())
+        self.spent['receive'] += float(receive.sum())
+        return transmit
+
+    def update(self, tick, idle=0.0, rows=None):
+        # Apply this tick's charges plus the idle drain; returns the rows of
+        # nodes that died. With `rows` only those are settled, the others
+        # keep their energy and pending charges.
+        self._fit()
+        store = self.store
+        if rows is None:
+            rows = store.active_rows()
+            settled = slice(None)
+        else:
+            settled = np.asarray(rows, dtype=np.int64)
+            rows = settled[store.alive[settled]]
+        before = store.energy[rows]
+        after = np.maximum(before - idle - self.pending[rows], 0)
+        store.energy[rows] = after
+        # Charges on nodes that were already dead are dropped
+        self.pending[settled] = 0
+        self.drained += float((before - after).sum())
+        self.spent['idle'] += float(np.minimum(before, idle).sum())
+
+        dead = rows[store.energy[rows] <= 0]
+        if len(dead):
+            store.kill(dead)
+            self.deaths += len(dead)
+            if self.first_death is None:
+                self.first_death = tick
+            if self.half_dead is None and self.deaths >= 0.5 * (self.deaths + len(store.active_rows())):
+                self.half_dead = tick
+        return dead
+
+    def take_pending(self, rows):
+        # Unsettled charges of rows, cleared here, so they can be settled
+        # wherever those nodes are updated
+        self._fit()
+        charges = self.pending[rows]
+        self.pending[rows] = 0
+        return charges
+
+    def add_pending(self, rows, charges):
+        self._fit()
+        np.add.at(self.pending, rows, charges)
+
+    def forget(self, rows):
+        # Charges of a released row must not follow it to its next node
+        self._fit()
+        self.pending[rows] = 0
+
+    def lifetime(self):
+        alive = len(self.store.active_rows())
+        return {
+            'alive': alive,
+            'dead': self.deaths,
+            'first_death': self.first_death,
+            'half_dead': self.half_dead,
+            'spent': dict(self.spent),
+        }
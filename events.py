@@ -0,0 +1,70 @@
+import heapq
+
+
+class Event:
+    __slots__ = ('time', 'seq', 'kind', 'callback', 'args', 'active')
+
+    def __init__(self, time, seq, kind, callback, args):
+        self.time = time
+        self.seq = seq
+        self.kind = kind
+        self.callback = callback
+        self.args = args
+        self.active = True
+
+    def __lt__(self, other):
+        return (self.time, self.seq) < (other.time, other.seq)
+
+
+class EventScheduler:
+    # Discrete-event kernel: a heap of timestamped events run in time order.
+    # Ties are broken by scheduling order, so a run is fully determined by
+    # the seed of whatever generates the events. Cancelled events stay in
+    # the heap and are skipped when they come up.
+    def __init__(self):
+        self.now = 0.0
+        self.queue = []
+        self.seq = 0
+        self.processed = {}
+
+    def __len__(self):
+        return len(self.queue)
+
+    def schedule(self, delay, kind, callback, *args):
+        return self.schedule_at(self.now + delay, kind, callback, *args)
+
+    def schedule_at(self, when, kind, callback, *args):
+        if when < self.now:
+            raise ValueError(f"Cannot schedule '{kind}' at {when}, before the current time {self.now}")
+        event = Event(when, self.seq, kind, callback, args)
+        self.seq += 1
+        heapq.heappush(self.queue, event)
+        return event
+
+    def cancel(self, event):
+        if event is not None:
+            event.active = False
+
+    def next_time(self):
+        while self.queue and not self.queue[0].active:
+            heapq.heappop(self.queue)
+        return self.queue[0].time if self.queue else None
+
+    def run(self, until=None, max_events=None):
+        # Process events scheduled before time `until` and advance the clock
+        # to it; returns the number of events run
+        count = 0
+        queue = self.queue
+        while queue and (until is None or queue[0].time < until):
+            if max_events is not None and count >= max_events:
+                return count
+            event = heapq.heappop(queue)
+            if not event.active:
+                continue
+            self.now = event.time
+            event.callback(*event.args)
+            self.processed[event.kind] = self.processed.get(event.kind, 0) + 1
+            count += 1
+        if until is not None:
+            self.now = max(self.now, until)
+        return count
@@ -0,0 +1,188 @@
+import itertools
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+SWEEP_AXES = ('num_nodes', 'malicious_ratio', 'transmission_range', 'mobility_step')
+DEFAULT_SCENARIO = {
+    'num_nodes': 15,
+    'malicious_ratio': 0.1,
+    'transmission_range': 30,
+    'mobility_step': 2.0,
+}
+METRICS = ('success_rate', 'recent_success_rate', 'path_length', 'p90_hops', 'mean_energy', 'min_energy', 'first_death', 'alive_fraction')
+
+# Two-sided 95% Student t quantiles by degrees of freedom
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042, 60: 2.000, 120: 1.980,
+}
+
+
+def t_quantile(df):
+    # Between table entries the next lower df is used, whose quantile is
+    # larger, so intervals err on the wide side
+    if df <= 0:
+        return math.nan
+    return T_95[max(bound for bound in T_95 if bound <= df)]
+
+
+def build_tasks(grid, replicates, n_ticks, base_seed):
+    # One task per (scenario, replicate). Seeds are spawned from one
+    # SeedSequence in task order, so a task's seed does not depend on which
+    # worker runs it or when.
+    axes = {name: grid.get(name, [DEFAULT_SCENARIO[name]]) for name in SWEEP_AXES}
+    scenarios = [dict(zip(SWEEP_AXES, values)) for values in itertools.product(*axes.values())]
+    tasks = []
+    for scenario in scenarios:
+        for replicate in range(replicates):
+            tasks.append({'scenario': scenario, 'replicate': replicate, 'n_ticks': n_ticks})
+    for task, seed in zip(tasks, np.random.SeedSequence(base_seed).spawn(len(tasks))):
+        task['seed'] = seed
+    return tasks
+
+
+def run_task(task):
+    from manet import MANET
+    from simulator import Simulator
+
+    scenario = task['scenario']
+    start = time.perf_counter()
+    manet = MANET(
+        num_nodes=scenario['num_nodes'],
+        malicious_ratio=scenario['malicious_ratio'],
+        transmission_range=scenario['transmission_range'],
+        seed=task['seed']
+    )
+    simulator = Simulator(manet, mobility_step=scenario['mobility_step'])
+    simulator.run(task['n_ticks'])
+
+    energy = manet.store.energy[manet.store.active_rows()]
+    lifetime = simulator.lifetime
+    streaming = simulator.streaming
+    hops = streaming.hops
+    return {
+        'scenario': scenario,
+        'replicate': task['replicate'],
+        'seed_entropy': str(task['seed'].entropy),
+        'spawn_key': list(task['seed'].spawn_key),
+        'success_rate': simulator.success_rate,
+        # Over the last StreamingMetrics window, i.e. the end of the run
+        'recent_success_rate': streaming.rates()['delivery_ratio'] * 100,
+        'path_length': simulator.average_path_length,
+        'p90_hops': hops.quantile(0.9) if hops.count else 0.0,
+        'mean_energy': streaming.aggregates()['avg_energy'],
+        'min_energy': float(energy.min()) if len(energy) else 0.0,
+        # Runs without a death are censored at their length
+        'first_death': lifetime['first_death'] if lifetime['first_death'] is not None else task['n_ticks'],
+        'alive_fraction': lifetime['alive'] / max(lifetime['alive'] + lifetime['dead'], 1),
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+class Aggregator:
+    # Running per-scenario statistics (Welford) so partial sweeps can be
+    # summarised at any point
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, result):
+        key = tuple(result['scenario'][name] for name in SWEEP_AXES)
+        group = self.groups.setdefault(key, {metric: [0, 0.0, 0.0] for metric in METRICS})
+        for metric in METRICS:
+            stats = group[metric]
+            stats[0] += 1
+            delta = result[metric] - stats[1]
+            stats[1] += delta / stats[0]
+            stats[2] += delta * (result[metric] - stats[1])
+
+    def summary(self):
+        rows = []
+        for key, group in sorted(self.groups.items()):
+            row = dict(zip(SWEEP_AXES, key))
+            for metric, (count, mean, m2) in group.items():
+                std = math.sqrt(m2 / (count - 1)) if count > 1 else math.nan
+                half_width = t_quantile(count - 1) * std / math.sqrt(count) if count > 1 else math.nan
+                row[metric] = {'n': count, 'mean': mean, 'std': std, 'ci95': (mean - half_width, mean + half_width)}
+            rows.append(row)
+        return rows
+
+
+def sweep(grid, replicates=10, n_ticks=200, base_seed=0, workers=None):
+    # Yields results as workers finish them, in completion order
+    tasks = build_tasks(grid, replicates, n_ticks, base_seed)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for task in tasks:
+            yield run_task(task)
+        return
+    # Imported here so workers, which import this module for run_task, skip it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(run_task, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # A sweep closed early or failing drops the tasks not yet started
+        # rather than waiting for all of them
+        pool.shutdown(cancel_futures=True)
+
+
+def print_summary(rows, stream=sys.stdout):
+    header = " ".join(f"{name:>18}" for name in SWEEP_AXES) + " " + " ".join(f"{metric:>24}" for metric in METRICS)
+    print(header, file=stream)
+    for row in rows:
+        cells = [f"{row[name]:>18}" for name in SWEEP_AXES]
+        for metric in METRICS:
+            stats = row[metric]
+            cells.append(f"{stats['mean']:>12.3f} ± {(stats['ci95'][1] - stats['mean']):<9.3f}")
+        print(" ".join(cells), file=stream)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel Monte Carlo parameter sweep")
+    parser.add_argument('--num-nodes', type=int, nargs='+', default=[DEFAULT_SCENARIO['num_nodes']])
+    parser.add_argument('--malicious-ratio', type=float, nargs='+', default=[DEFAULT_SCENARIO['malicious_ratio']])
+    parser.add_argument('--transmission-range', type=float, nargs='+', default=[DEFAULT_SCENARIO['transmission_range']])
+    parser.add_argument('--mobility-step', type=float, nargs='+', default=[DEFAULT_SCENARIO['mobility_step']])
+    parser.add_argument('--replicates', type=int, default=10)
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help="stream every finished run to this JSONL file")
+    parser.add_argument('--summary-every', type=int, default=50)
+    args = parser.parse_args()
+
+    grid = {
+        'num_nodes': args.num_nodes,
+        'malicious_ratio': args.malicious_ratio,
+        'transmission_range': args.transmission_range,
+        'mobility_step': args.mobility_step,
+    }
+    aggregator = Aggregator()
+    output = open(args.output, 'a') if args.output else None
+    try:
+        for done, result in enumerate(sweep(grid, args.replicates, args.ticks, args.seed, args.workers), 1):
+            aggregator.add(result)
+            if output:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+            if done % args.summary_every == 0:
+                print(f"-- {done} runs finished", file=sys.stderr)
+                print_summary(aggregator.summary(), sys.stderr)
+    finally:
+        if output:
+            output.close()
+    print_summary(aggregator.summary())
+
+
+if __name__ == '__main__':
+    main()
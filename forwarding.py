@@ -0,0 +1,474 @@
+import numpy as np
+
+from qlearning import segments
+from traffic import DELIVERED, DROPPED, PacketBatch
+
+
+def radio_outcome(manet, senders, receivers, rng, slots=None):
+    # Which transmissions the radio model delivers, all True without one,
+    # and their delivery probabilities (None without a radio model). Hops
+    # are sent in slots, the k-th hop of every packet in slot k, so a
+    # packet's own hops never interfere with each other; by default all
+    # transmissions share one slot.
+    radio = manet.radio
+    if radio is None:
+        return np.ones(len(senders), dtype=bool), None
+    senders = np.asarray(senders, dtype=np.int64)
+    receivers = np.asarray(receivers, dtype=np.int64)
+    if slots is None:
+        probabilities = radio.link_probability(senders, receivers)
+    else:
+        slots = np.asarray(slots, dtype=np.int64)
+        probabilities = np.zeros(len(senders))
+        for slot in np.unique(slots).tolist():
+            sent = slots == slot
+            probabilities[sent] = radio.link_probability(senders[sent], receivers[sent])
+    return rng.random(len(probabilities)) < probabilities, probabilities
+
+
+def relay_outcome(store, relays, drop_probability, rng):
+    # Whether each relay passes its packet on; malicious relays are black
+    # holes that drop with drop_probability
+    relays = np.asarray(relays, dtype=np.int64)
+    return ~(store.malicious[relays] & (rng.random(len(relays)) < drop_probability))
+
+
+class PathForwarder:
+    # Routes every packet on its own through the network's Router (and its
+    # route cache); suited to light traffic and gives cost-based paths. With
+    # a radio model the k-th hops of all packets are on air together, and a
+    # packet is lost at the first hop the radio does not deliver.
+    def __init__(self, manet, max_paths=5, drop_probability=1.0):
+        self.manet = manet
+        self.max_paths = max_paths
+        self.drop_probability = drop_probability
+
+    def forward(self, sources, dests):
+        store = self.manet.store
+        router = self.manet.router
+        status = np.full(len(sources), DROPPED, dtype=np.int8)
+        hops = np.zeros(len(sources), dtype=np.int64)
+        paths = []
+        observed = []
+        forwarded = []
+        senders = []
+        receivers = []
+        walks = []
+        for i, (source, dest) in enumerate(zip(store.ids[sources].tolist(), store.ids[dests].tolist())):
+            path = router.find_path(source, dest)
+            if not path:
+                continue
+            rows = [self.manet.nodes[n].row for n in path]
+            passed = relay_outcome(store, rows[1:-1], self.drop_probability, store.rng).tolist()
+            # The packet travels until the first relay that drops it
+            walked = passed.index(False) + 1 if False in passed else len(path) - 1
+            walks.append((i, path, rows, passed, walked))
+
+        hop_senders = [rows[k] for _, _, rows, _, walked in walks for k in range(walked)]
+        hop_receivers = [rows[k + 1] for _, _, rows, _, walked in walks for k in range(walked)]
+        hop_slots = [k for _, _, _, _, walked in walks for k in range(walked)]
+        heard = radio_outcome(self.manet, hop_senders, hop_receivers, store.rng, hop_slots)[0].tolist()
+        start = 0
+        for i, path, rows, passed, walked in walks:
+            hops_heard = heard[start:start + walked]
+            start += walked
+            # ...or until a hop is lost, which its receiver never notices
+            lost = hops_heard.index(False) if False in hops_heard else walked
+            observed.extend(rows[1:lost + 1][:len(passed)])
+            forwarded.extend(passed[:lost])
+            senders.extend(rows[:min(lost + 1, walked)])
+            receivers.extend(rows[1:lost + 1])
+            if lost < walked:
+                receivers.append(-1)
+            hops[i] = min(lost + 1, walked)
+            if lost < walked or not all(passed):
+                continue
+            status[i] = DELIVERED
+            if len(paths) < self.max_paths:
+                paths.append(path)
+        return PacketBatch(sources, dests, status, hops, paths,
+                           np.array(observed, dtype=np.int64), np.array(forwarded, dtype=bool),
+                           np.array(senders, dtype=np.int64), np.array(receivers, dtype=np.int64))
+
+
+class BatchForwarder:
+    # Routes a whole batch along hop-count shortest paths in one pass: one
+    # level-synchronous BFS per group of destinations, vectorised over the
+    # CSR adjacency, then all packets walk down the distance table together.
+    def __init__(self, manet, ttl=64, group_size=256, max_paths=5, drop_probability=1.0):
+        self.manet = manet
+        self.ttl = ttl
+        self.group_size = group_size
+        self.max_paths = max_paths
+        self.drop_probability = drop_probability
+
+    def relay_mask(self):
+        # Only nodes the reputation engine trusts relay packets
+        return self.manet.reputation.trusted()
+
+    def hop_distances(self, targets, relays):
+        # (len(targets), capacity) hop distances towards each target, -1 if
+        # unreachable. Untrusted nodes can be reached as endpoints but never
+        # relay, exactly like Router.
+        store = self.manet.store
+        capacity = store.capacity
+        targets = np.asarray(targets, dtype=np.int64)
+        dist = np.full((len(targets), capacity), -1, dtype=np.int32)
+        dist[np.arange(len(targets)), targets] = 0
+
+        frontier_group = np.arange(len(targets))
+        frontier_node = targets
+        level = 0
+        while len(frontier_node) and level < self.ttl:
+            level += 1
+            owner, nbrs, _ = segments(store.indptr, store.indices, frontier_node)
+            group = frontier_group[owner]
+            fresh = dist[group, nbrs] < 0
+            group, nbrs = group[fresh], nbrs[fresh]
+            keys = np.unique(group.astype(np.int64) * capacity + nbrs)
+            group, nbrs = keys // capacity, keys % capacity
+            dist[group, nbrs] = level
+            keep = relays[nbrs]
+            frontier_group, frontier_node = group[keep], nbrs[keep]
+        return dist
+
+    def forward(self, sources, dests):
+        sources = np.asarray(sources, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        status = np.full(len(sources), DROPPED, dtype=np.int8)
+        hops = np.zeros(len(sources), dtype=np.int64)
+        paths = []
+        observed = []
+        forwarded = []
+        senders = []
+        receivers = []
+        lost = []
+        if not len(sources):
+            return PacketBatch(sources, dests, status, hops, paths)
+
+        relays = self.relay_mask()
+        targets, inverse = np.unique(dests, return_inverse=True)
+        for start in range(0, len(targets), self.group_size):
+            group_targets = targets[start:start + self.group_size]
+            dist = self.hop_distances(group_targets, relays)
+            packets = np.flatnonzero((inverse >= start) & (inverse < start + len(group_targets)))
+            found = dist[inverse[packets] - start, sources[packets]]
+            packets = packets[found > 0]
+            steps, taken = self.walk(dist, inverse[packets] - start, sources[packets], dests[packets], relays,
+                                     observed, forwarded, lost)
+            arrived = steps[-1] == dests[packets]
+            status[packets[arrived]] = DELIVERED
+            hops[packets] = taken
+            steps_taken = np.stack(steps)
+            moved = steps_taken[1:] != steps_taken[:-1]
+            senders.append(steps_taken[:-1][moved])
+            receivers.append(steps_taken[1:][moved])
+            for i in np.flatnonzero(arrived)[:self.max_paths - len(paths)].tolist():
+                path = [int(step[i]) for step in steps[:taken[i] + 1]]
+                paths.append(self.manet.store.ids[path].tolist())
+
+        # Transmissions the radio lost were heard by nobody
+        senders.extend(lost)
+        receivers.extend(np.full(len(part), -1, dtype=np.int64) for part in lost)
+        observed = np.concatenate(observed) if observed else None
+        forwarded = np.concatenate(forwarded) if forwarded else None
+        senders = np.concatenate(senders) if senders else None
+        receivers = np.concatenate(receivers) if receivers else None
+        return PacketBatch(sources, dests, status, hops, paths, observed, forwarded, senders, receivers)
+
+    def walk(self, dist, group, current, dests, relays, observed, forwarded, lost):
+        # Move every packet one hop down its distance table per step. Each
+        # relay handed a packet is watched by its sender: a drop stops the
+        # packet there. With a radio model each step's hops are on air
+        # together and a lost hop stops the packet at its sender. Returns
+        # the row of every packet after each step and the hops each one took.
+        store = self.manet.store
+        radio = self.manet.radio
+        current = current.copy()
+        steps = [current.copy()]
+        taken = np.zeros(len(current), dtype=np.int64)
+        moving = np.arange(len(current))
+        while len(moving):
+            owner, nbrs, counts = segments(store.indptr, store.indices, current[moving])
+            here = dist[group[moving], current[moving]]
+            valid = ((dist[group[moving][owner], nbrs] == here[owner] - 1)
+                     & (relays[nbrs] | (nbrs == dests[moving][owner])))
+            # Of the neighbors one hop closer, the best-charged one relays so
+            # load spreads over equally short paths; with a radio model the
+            # most reliable link is preferred first
+            picks = np.flatnonzero(valid)
+            keys = (-store.energy[nbrs[picks]], owner[picks])
+            if radio is not None:
+                keys = (keys[0], -radio.expected(current[moving][owner[picks]], nbrs[picks]), keys[1])
+            picks = picks[np.lexsort(keys)]
+            holders, first = np.unique(owner[picks], return_index=True)
+            moving = moving[holders]
+            nxt = nbrs[picks[first]]
+            heard, _ = radio_outcome(self.manet, current[moving], nxt, store.rng)
+            taken[moving] += 1
+            if not heard.all():
+                lost.append(current[moving[~heard]])
+                moving, nxt = moving[heard], nxt[heard]
+            current[moving] = nxt
+
+            relaying = current[moving] != dests[moving]
+            passed = relay_outcome(store, current[moving[relaying]], self.drop_probability, store.rng)
+            observed.append(current[moving[relaying]])
+            forwarded.append(passed)
+            steps.append(current.copy())
+            moving = moving[relaying][passed]
+        return steps, taken
+
+
+def _members(dest, candidates):
+    # Rows a candidate set depends on besides its owner
+    rows = set(np.asarray(candidates).tolist())
+    rows.add(dest)
+    rows.discard(-1)
+    return rows
+
+
+class CandidateCache:
+    # Ranked forwarder candidates per (node row, destination row). A node's
+    # sets only change with its neighborhood, so link events evict just the
+    # sets of the two endpoints; max_age bounds drift in Q-values and
+    # positions between link changes. Sets are also indexed by their
+    # destination and candidates so released rows evict what refers to them.
+    def __init__(self, max_age=20):
+        self.max_age = max_age
+        self.tick = 0
+        self.sets = {}
+        self.by_node = {}
+        self.by_member = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node, dest):
+        entry = self.sets.get((node, dest))
+        if entry is None or self.tick - entry[1] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, node, dest, candidates):
+        key = (node, dest)
+        self._evict(key)
+        self.sets[key] = (candidates, self.tick)
+        self.by_node.setdefault(node, set()).add(dest)
+        for row in _members(dest, candidates):
+            self.by_member.setdefault(row, set()).add(key)
+
+    def invalidate_node(self, node):
+        for dest in list(self.by_node.get(node, ())):
+            self._evict((node, dest))
+
+    def clear(self, rows=None):
+        # Released rows drop the sets they own, lead to or appear in
+        if rows is None:
+            self.sets.clear()
+            self.by_node.clear()
+            self.by_member.clear()
+            return
+        for row in np.asarray(rows).tolist():
+            self.invalidate_node(row)
+            for key in list(self.by_member.get(row, ())):
+                self._evict(key)
+
+    def _evict(self, key):
+        entry = self.sets.pop(key, None)
+        if entry is None:
+            return
+        node, dest = key
+        dests = self.by_node[node]
+        dests.discard(dest)
+        if not dests:
+            del self.by_node[node]
+        for row in _members(dest, entry[0]):
+            keys = self.by_member[row]
+            keys.discard(key)
+            if not keys:
+                del self.by_member[row]
+
+
+class OpportunisticForwarder:
+    # ExOR-style opportunistic forwarding. Each hop broadcasts to a ranked
+    # candidate set of trusted neighbors that make geographic progress
+    # towards the destination; the highest-ranked candidate that receives
+    # the packet forwards it and the others discard their copy. Candidates
+    # are ranked by Q-value, reputation, progress and residual energy, and
+    # the outcome of every hop is fed back to the Q-router. Receptions follow
+    # the network's radio model if it has one, with every sender of a round
+    # on air together, and a simple distance-based loss curve otherwise.
+    def __init__(self, manet, candidates=3, ttl=64, retries=7, max_paths=5, drop_probability=1.0,
+                 q_weight=1.0, reputation_weight=1.0, progress_weight=2.0, energy_weight=0.5,
+                 loss_exponent=4.0, max_age=20, link_weight=1.0):
+        self.manet = manet
+        self.candidates = candidates
+        self.ttl = ttl
+        self.retries = retries
+        self.max_paths = max_paths
+        self.drop_probability = drop_probability
+        self.q_weight = q_weight
+        self.reputation_weight = reputation_weight
+        self.progress_weight = progress_weight
+        self.energy_weight = energy_weight
+        self.loss_exponent = loss_exponent
+        self.link_weight = link_weight
+        self.cache = CandidateCache(max_age)
+        manet.link_listeners.append(self.on_link_events)
+        manet.store.release_hooks.append(self.cache.clear)
+
+    def on_link_events(self, link_up, link_down):
+        nodes = self.manet.nodes
+        for a, b in list(link_up) + list(link_down):
+            for node_id in (a, b):
+                if node_id in nodes:
+                    self.cache.invalidate_node(nodes[node_id].row)
+
+    def reception_probability(self, distances):
+        # Links get lossier towards the edge of the transmission range
+        ratio = np.asarray(distances) / self.manet.transmission_range
+        return np.clip(1.0 - ratio ** self.loss_exponent, 0.0, 1.0)
+
+    def rank(self, nodes, dests):
+        # Candidate sets for a batch of (node, dest) pairs in one pass,
+        # best first; each row of the result is padded with -1
+        store = self.manet.store
+        nodes = np.asarray(nodes, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        ranked = np.full((len(nodes), self.candidates), -1, dtype=np.int64)
+        owner, nbrs, _ = segments(store.indptr, store.indices, nodes)
+        if not len(nbrs):
+            return ranked
+
+        r = self.manet.transmission_range
+        remaining = np.sqrt(store.squared_distances(nodes, dests))
+        targets = dests[owner]
+        progress = (remaining[owner] - np.sqrt(store.squared_distances(nbrs, targets))) / r
+        is_dest = nbrs == targets
+        usable = is_dest | ((progress > 0) & self.manet.reputation.trusted()[nbrs])
+        scores = (self.q_weight * store.q_router.q_values(nodes[owner], targets, nbrs)
+                  + self.reputation_weight * store.reputation[nbrs]
+                  + self.progress_weight * progress
+                  + self.energy_weight * store.energy[nbrs] / 100.0)
+        if self.manet.radio is not None:
+            scores += self.link_weight * self.manet.radio.expected(nodes[owner], nbrs)
+        scores[is_dest] = np.inf
+
+        keep = np.flatnonzero(usable)
+        keep = keep[np.lexsort((-scores[keep], owner[keep]))]
+        kept_owner = owner[keep]
+        counts = np.bincount(kept_owner, minlength=len(nodes))
+        rank = np.arange(len(keep)) - np.repeat(np.cumsum(counts) - counts, counts)
+        top = rank < self.candidates
+        ranked[kept_owner[top], rank[top]] = nbrs[keep[top]]
+        return ranked
+
+    def candidate_sets(self, nodes, dests):
+        cache = self.cache
+        sets = [cache.get(n, d) for n, d in zip(nodes.tolist(), dests.tolist())]
+        missing = [i for i, c in enumerate(sets) if c is None]
+        if missing:
+            missing = np.array(missing)
+            fresh = self.rank(nodes[missing], dests[missing])
+            for i, n, d, c in zip(missing.tolist(), nodes[missing].tolist(), dests[missing].tolist(), fresh):
+                cache.put(n, d, c)
+                sets[i] = c
+        if not sets:
+            return np.zeros((0, self.candidates), dtype=np.int64)
+        return np.stack(sets)
+
+    def forward(self, sources, dests):
+        store = self.manet.store
+        q_router = store.q_router
+        rng = store.rng
+        sources = np.asarray(sources, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        status = np.full(len(sources), DROPPED, dtype=np.int8)
+        hops = np.zeros(len(sources), dtype=np.int64)
+        attempts = np.zeros(len(sources), dtype=np.int64)
+        current = sources.copy()
+        trail = [current.copy()]
+        observed = []
+        forwarded = []
+        senders = []
+        receivers = []
+        self.cache.tick += 1
+
+        moving = np.arange(len(sources))
+        for _ in range(self.ttl):
+            if not len(moving):
+                break
+            here, targets = current[moving], dests[moving]
+            sets = self.candidate_sets(here, targets)
+            # Reputation can fall between refreshes, so trust is rechecked
+            valid = (sets >= 0) & (self.manet.reputation.trusted()[np.maximum(sets, 0)] | (sets == targets[:, None]))
+            reachable = valid.any(axis=1)
+
+            flat = np.maximum(sets, 0).ravel()
+            if self.manet.radio is None:
+                distances = np.sqrt(store.squared_distances(np.repeat(here, sets.shape[1]), flat))
+                probabilities = self.reception_probability(distances.reshape(sets.shape))
+            else:
+                probabilities = np.zeros(sets.shape)
+                probabilities[valid] = self.manet.radio.link_probability(
+                    np.repeat(here, sets.shape[1])[valid.ravel()], flat[valid.ravel()], here[reachable])
+            received = valid & (rng.random(sets.shape) < probabilities)
+            heard = received.any(axis=1)
+            # The best-ranked receiver forwards; lower-ranked ones stay quiet
+            winner = sets[np.arange(len(moving)), received.argmax(axis=1)]
+
+            # Every broadcast costs the sender; only the forwarder's reception is charged
+            senders.append(here[reachable])
+            receivers.append(np.where(heard, winner, -1)[reachable])
+            attempts[moving[reachable & ~heard]] += 1
+            retry = reachable & ~heard & (attempts[moving] <= self.retries)
+
+            step = np.flatnonzero(heard)
+            packets = moving[step]
+            nxt = winner[step]
+            delivered = nxt == dests[packets]
+            passed = np.ones(len(step), dtype=bool)
+            relaying = ~delivered
+            passed[relaying] = relay_outcome(store, nxt[relaying], self.drop_probability, rng)
+            observed.append(nxt[relaying])
+            forwarded.append(passed[relaying])
+
+            rewards = q_router.hop_rewards(len(step), None if self.manet.radio is None
+                                           else probabilities[step, received[step].argmax(axis=1)])
+            rewards[delivered] += q_router.delivery_reward
+            rewards[~passed] -= q_router.drop_penalty
+            if len(step):
+                q_router.update(current[packets], dests[packets], nxt, rewards, delivered | ~passed)
+
+            current[packets] = nxt
+            hops[packets] += 1
+            attempts[packets] = 0
+            status[packets[delivered]] = DELIVERED
+            trail.append(current.copy())
+            moving = np.concatenate([packets[~delivered & passed], moving[retry]])
+
+        paths = []
+        for i in np.flatnonzero(status == DELIVERED)[:self.max_paths].tolist():
+            path = [int(step[i]) for step in trail]
+            path = [row for k, row in enumerate(path) if k == 0 or row != path[k - 1]]
+            paths.append(store.ids[path].tolist())
+        observed = np.concatenate(observed) if observed else None
+        forwarded = np.concatenate(forwarded) if forwarded else None
+        senders = np.concatenate(senders) if senders else None
+        receivers = np.concatenate(receivers) if receivers else None
+        return PacketBatch(sources, dests, status, hops, paths, observed, forwarded, senders, receivers)
+
+
+FORWARDERS = {
+    'path': PathForwarder,
+    'batch': BatchForwarder,
+    'opportunistic': OpportunisticForwarder,
+}
+
+
+def make_forwarder(kind, manet, **params):
+    if kind not in FORWARDERS:
+        raise ValueError(f"Unknown forwarder '{kind}', expected one of {sorted(FORWARDERS)}")
+    return FORWARDERS[kind](manet, **params)
@@ -0,0 +1,82 @@
+import numpy as np
+
+from energy import EnergyModel
+from node_store import AREA_SIZE, Node, NodeMap, NodeStore
+from qlearning import QRouter
+from radio import RadioModel
+from reputation import ReputationEngine
+from routing import Router
+from topology import IncrementalTopology, make_neighbor_index
+
+
+class MANET:
+    def __init__(self, num_nodes=15, malicious_ratio=0.1, neighbor_index='grid', incremental=True, seed=None,
+                 transmission_range=30, area_size=AREA_SIZE, radio=None):
+        self.store = NodeStore(capacity=max(16, num_nodes), rng=np.random.default_rng(seed), area_size=area_size)
+        self.nodes = NodeMap(self.store)
+        self.transmission_range = transmission_range
+        self.neighbor_index = make_neighbor_index(neighbor_index)
+        self.topology = IncrementalTopology(self.neighbor_index, incremental=incremental)
+        self.link_events = ([], [])
+        self.link_listeners = []
+        self.q_router = QRouter(self.store)
+        self.store.q_router = self.q_router
+        self.store.release_hooks.append(self.q_router.forget)
+        self.reputation = ReputationEngine(self.store)
+        self.store.release_hooks.append(self.reputation.forget)
+        self.energy = EnergyModel(self.store, transmission_range)
+        self.store.release_hooks.append(self.energy.forget)
+        # Without a radio model every hop between linked nodes gets through;
+        # radio is True for the default RadioModel or a dict of its parameters
+        self.radio = None
+        if radio:
+            self.radio = RadioModel(self.store, transmission_range, **(radio if isinstance(radio, dict) else {}))
+            self.store.release_hooks.append(self.radio.forget)
+        self.q_router.radio = self.radio
+        self.router = Router(self)
+        self.link_listeners.append(self.router.on_link_events)
+        num_malicious = int(num_nodes * malicious_ratio)
+
+        self.nodes.add_many(range(num_nodes), is_malicious=np.arange(num_nodes) < num_malicious)
+        self.update_topology()
+
+    def join(self, count=1, positions=None, is_malicious=False, energy=100.0):
+        # Add `count` nodes under fresh ids and link them in; only the
+        # neighborhoods of the new nodes are evaluated. Returns the new ids.
+        node_ids = self.nodes.new_ids(count)
+        self.nodes.add_many(node_ids, positions, is_malicious=is_malicious, energy=energy)
+        self.update_topology()
+        return node_ids
+
+    def leave(self, node_ids):
+        # Remove nodes in one batch; their links are dropped right away and
+        # their store rows are reused by later joins
+        self.nodes.remove_many([node_id for node_id in node_ids if node_id in self.nodes])
+        self.update_topology()
+
+    def move_nodes(self, max_step=2.0):
+        self.store.move(self.store.active_rows(), max_step)
+
+    def drain_energy(self, amount=0.1):
+        self.store.drain(self.store.active_rows(), amount)
+
+    def update_topology(self, max_displacement=None):
+        # The topology works on store rows directly; rows that are free or
+        # hold a dead node are passed with key -1
+        store = self.store
+        size = store.size
+        keys = np.where(store.alive[:size], store.ids[:size], -1)
+        link_up, link_down = self.topology.update(keys, store.xy[:, :size].T, self.transmission_range,
+                                                  max_displacement)
+
+        if self.topology.rebuilt:
+            store.set_links(self.topology.link_rows())
+        else:
+            up, down = self.topology.row_events
+            if len(up) or len(down):
+                store.apply_link_events(up, down)
+
+        self.link_events = (link_up, link_down)
+        for listener in self.link_listeners:
+            listener(link_up, link_down)
+        return link_up, link_down
@@ -0,0 +1,287 @@
+import math
+
+import numpy as np
+
+from traffic import DELIVERED
+
+NODE_COUNTERS = ('sent', 'delivered', 'received', 'transmitted', 'forwarded', 'dropped')
+WINDOW_FIELDS = ('generated', 'delivered', 'dropped', 'hops', 'transmissions')
+
+
+class QuantileSketch:
+    # Constant-memory histogram with relative-accuracy buckets (DDSketch): a
+    # value v > 0 goes to bucket ceil(log(v) / log(gamma)), so any quantile
+    # is reported within `accuracy` of its true value. At most `max_bins`
+    # buckets are kept; when the values span more than that the lowest
+    # buckets are merged, which keeps the upper quantiles accurate. Values
+    # <= 0 are counted in a separate zero bucket.
+    def __init__(self, accuracy=0.01, max_bins=512):
+        self.accuracy = accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = np.zeros(max_bins, dtype=np.int64)
+        self.offset = None
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._cumulative = None
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).reshape(-1)
+        if not len(values):
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        if len(positive):
+            self._insert(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64))
+
+    def merge(self, other):
+        # Fold in a sketch with the same accuracy, e.g. one per worker
+        if other.gamma != self.gamma:
+            raise ValueError(f"Cannot merge sketches with accuracy {other.accuracy} and {self.accuracy}")
+        if not other.count:
+            return
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        used = np.flatnonzero(other.bins)
+        if len(used):
+            self._insert(other.offset + used, other.bins[used])
+
+    def _insert(self, keys, counts=None):
+        self._cumulative = None
+        top = int(keys.max())
+        low = int(keys.min())
+        if self.offset is None:
+            self.offset = max(low, top - self.max_bins + 1)
+        elif top >= self.offset + self.max_bins:
+            # Slide the buckets up, merging the ones that fall off the bottom
+            shift = top - self.max_bins + 1 - self.offset
+            merged = self.bins[:shift + 1].sum()
+            self.bins = np.concatenate([[merged], self.bins[shift + 1:], np.zeros(min(shift, self.max_bins - 1),
+                                                                                  dtype=np.int64)])
+            self.offset += shift
+        elif low < self.offset:
+            # Slide down as far as the highest occupied bucket allows
+            used = np.flatnonzero(self.bins)
+            shift = min(self.offset - low, self.max_bins - 1 - (int(used[-1]) if len(used) else 0))
+            if shift:
+                self.bins = np.concatenate([np.zeros(shift, dtype=np.int64), self.bins[:-shift]])
+                self.offset -= shift
+        index = np.clip(keys - self.offset, 0, self.max_bins - 1)
+        added = np.bincount(index, weights=counts, minlength=self.max_bins)
+        self.bins += added.astype(np.int64)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return min(self.min, 0.0)
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.bins)
+        index = int(np.searchsorted(self._cumulative, rank - self.zeros, side='right'))
+        value = 2 * self.gamma ** (self.offset + index) / (self.gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class SlidingWindow:
+    # Per-tick totals of the last `size` ticks in a ring buffer, plus their
+    # running sums, so a rate over the window is read without summing it
+    def __init__(self, fields, size=100):
+        self.fields = {name: i for i, name in enumerate(fields)}
+        self.size = size
+        self.ring = np.zeros((size, len(fields)))
+        self.sums = np.zeros(len(fields))
+        self.ticks = 0
+
+    def push(self, *values):
+        slot = self.ticks % self.size
+        values = np.asarray(values, dtype=float)
+        self.sums += values - self.ring[slot]
+        self.ring[slot] = values
+        self.ticks += 1
+
+    @property
+    def span(self):
+        return min(self.ticks, self.size)
+
+    def total(self, field):
+        return float(self.sums[self.fields[field]])
+
+    def rate(self, field):
+        # Mean per tick over the window
+        return self.total(field) / self.span if self.ticks else 0.0
+
+    def ratio(self, numerator, denominator):
+        total = self.total(denominator)
+        return self.total(numerator) / total if total else 0.0
+
+
+class StreamingMetrics:
+    # Network statistics kept current as the simulation runs, so reading
+    # them costs the same at any network size:
+    #
+    #   - running aggregates over alive nodes (count, malicious, energy),
+    #     adjusted by store hooks when nodes join, leave or die and by the
+    #     energy model's cumulative drain
+    #   - sliding-window traffic rates over the last `window` ticks
+    #   - quantile sketches of hop count, latency and transmit energy
+    #   - per-node traffic counters by store row
+    #
+    # State changed behind the store's back (the Node setters, drain_energy)
+    # is picked up by resync(), which also runs every `resync_every` ticks
+    # to bound floating-point drift of the energy total.
+    def __init__(self, manet, window=100, resync_every=1000):
+        self.manet = manet
+        self.store = manet.store
+        self.window = SlidingWindow(WINDOW_FIELDS, window)
+        self.resync_every = resync_every
+        self.hops = QuantileSketch()
+        self.latency = QuantileSketch()
+        self.energy_cost = QuantileSketch()
+        self.counted = np.zeros(0, dtype=bool)
+        self.counters = {name: np.zeros(0, dtype=np.int64) for name in NODE_COUNTERS}
+        self.ticks = 0
+        self.store.allocate_hooks.append(self._count)
+        self.store.kill_hooks.append(self._uncount)
+        self.store.release_hooks.append(self._forget)
+        self.resync()
+
+    def _fit(self):
+        capacity = self.store.capacity
+        if len(self.counted) < capacity:
+            extra = capacity - len(self.counted)
+            self.counted = np.concatenate([self.counted, np.zeros(extra, dtype=bool)])
+            for name, counts in self.counters.items():
+                self.counters[name] = np.concatenate([counts, np.zeros(extra, dtype=np.int64)])
+
+    def resync(self):
+        # Recount the aggregates from the store; O(n), unlike everything else
+        self._fit()
+        store = self.store
+        rows = store.active_rows()
+        self.counted[:] = False
+        self.counted[rows] = True
+        self.alive = len(rows)
+        self.malicious = int(store.malicious[rows].sum())
+        self.energy_total = float(store.energy[rows].sum())
+        self.drained = self.manet.energy.drained
+
+    def _count(self, rows):
+        self._fit()
+        rows = rows[~self.counted[rows]]
+        self.counted[rows] = True
+        self.alive += len(rows)
+        self.malicious += int(self.store.malicious[rows].sum())
+        self.energy_total += float(self.store.energy[rows].sum())
+
+    def _uncount(self, rows):
+        self._fit()
+        rows = rows[self.counted[rows]]
+        self.counted[rows] = False
+        self.alive -= len(rows)
+        self.malicious -= int(self.store.malicious[rows].sum())
+        self.energy_total -= float(self.store.energy[rows].sum())
+
+    def _forget(self, rows):
+        # A released row's counters must not follow it to its next node
+        self._uncount(rows)
+        for counts in self.counters.values():
+            counts[rows] = 0
+
+    def _settle(self):
+        drained = self.manet.energy.drained
+        self.energy_total -= drained - self.drained
+        self.drained = drained
+
+    def record(self, batch, costs=None):
+        # Fold in one tick's packets; `costs` are the transmit energies of
+        # batch.senders as charged by the energy model
+        self._fit()
+        delivered = batch.status == DELIVERED
+        hops = batch.hops[delivered]
+        self.window.push(len(batch), int(delivered.sum()), batch.dropped, int(hops.sum()), len(batch.senders))
+        self.hops.add(hops)
+        if batch.latencies is not None:
+            self.latency.add(batch.latencies[delivered])
+        if costs is not None:
+            self.energy_cost.add(costs)
+
+        counters = self.counters
+        np.add.at(counters['sent'], batch.sources, 1)
+        np.add.at(counters['delivered'], batch.sources[delivered], 1)
+        np.add.at(counters['received'], batch.dests[delivered], 1)
+        np.add.at(counters['transmitted'], batch.senders, 1)
+        np.add.at(counters['forwarded'], batch.observed[batch.forwarded], 1)
+        np.add.at(counters['dropped'], batch.observed[~batch.forwarded], 1)
+
+        self.ticks += 1
+        if self.resync_every and self.ticks % self.resync_every == 0:
+            self.resync()
+
+    def aggregates(self):
+        self._settle()
+        return {
+            'nodes': self.alive,
+            'malicious': self.malicious,
+            'energy': self.energy_total,
+            'avg_energy': self.energy_total / self.alive if self.alive else 0.0,
+        }
+
+    def rates(self):
+        window = self.window
+        return {
+            'ticks': window.span,
+            'delivery_ratio': window.ratio('delivered', 'generated'),
+            'throughput': window.rate('delivered'),
+            'offered_load': window.rate('generated'),
+            'drop_rate': window.rate('dropped'),
+            'average_hops': window.ratio('hops', 'delivered'),
+            'transmissions': window.rate('transmissions'),
+        }
+
+    def histograms(self):
+        return {
+            'hops': self.hops.summary(),
+            'latency': self.latency.summary(),
+            'energy_cost': self.energy_cost.summary(),
+        }
+
+    def node(self, row):
+        self._fit()
+        return {name: int(counts[row]) for name, counts in self.counters.items()}
+
+    def summary(self):
+        return {
+            'tick': self.ticks,
+            'aggregates': self.aggregates(),
+            'rates': self.rates(),
+            'histograms': self.histograms(),
+        }
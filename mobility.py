@@ -0,0 +1,307 @@
+import numpy as np
+
+
+class MobilityModel:
+    # Advances every active node in one vectorised step per tick. move()
+    # returns an upper bound on how far any node that existed before the
+    # tick travelled, which the topology uses to skip link checks. Per-node
+    # state lives in arrays indexed by store row and is (re)initialised
+    # whenever a row is handed to a new node.
+    def __init__(self):
+        self.owners = np.empty(0, dtype=np.int64)
+
+    def move(self, store, rows, rng, tick=0):
+        raise NotImplementedError
+
+    def unseen_rows(self, store, rows):
+        # Rows among `rows` that were not seen before or now hold another node
+        if len(self.owners) < store.capacity:
+            self.owners = np.concatenate([self.owners, np.full(store.capacity - len(self.owners), -1, dtype=np.int64)])
+            self.grow(store.capacity)
+        return rows[self.owners[rows] != store.ids[rows]]
+
+    def fresh_rows(self, store, rows):
+        # unseen_rows, which are then marked as seen
+        fresh = self.unseen_rows(store, rows)
+        self.owners[fresh] = store.ids[fresh]
+        return fresh
+
+    def grow(self, capacity):
+        pass
+
+
+def _grown(array, capacity, fill=0.0):
+    # array with its last axis extended to capacity
+    extra = capacity - array.shape[-1]
+    if extra <= 0:
+        return array
+    pad = np.full(array.shape[:-1] + (extra,), fill, dtype=array.dtype)
+    return np.concatenate([array, pad], axis=-1)
+
+
+class RandomJitter(MobilityModel):
+    # The original model: every node moves up to max_step along each axis
+    def __init__(self, max_step=2.0):
+        super().__init__()
+        self.max_step = max_step
+
+    def move(self, store, rows, rng, tick=0):
+        store.move(rows, self.max_step)
+        return self.max_step * np.sqrt(2.0)
+
+
+def _toward(xy, waypoints, speed):
+    # Step (2, n) positions in place towards their waypoints; returns the
+    # mask of those that arrived
+    offset = waypoints - xy
+    distance = np.sqrt((offset * offset).sum(axis=0))
+    arrived = distance <= speed
+    xy += offset * np.where(arrived, 1.0, speed / np.maximum(distance, 1e-12))
+    return arrived
+
+
+class RandomWaypoint(MobilityModel):
+    # Nodes travel in a straight line to a uniformly drawn waypoint at a
+    # uniformly drawn speed, pause there, then pick the next waypoint
+    def __init__(self, min_speed=0.5, max_speed=2.0, pause=0):
+        super().__init__()
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.pause = pause
+        self.waypoints = np.zeros((2, 0))
+        self.speed = np.zeros(0)
+        self.paused = np.zeros(0, dtype=np.int64)
+        self.origin = np.zeros((2, 0))
+        self.velocity = np.zeros((2, 0))
+        self.depart = np.zeros(0)
+        self.arrive = np.zeros(0)
+
+    def grow(self, capacity):
+        self.waypoints = _grown(self.waypoints, capacity)
+        self.speed = _grown(self.speed, capacity)
+        self.paused = _grown(self.paused, capacity)
+        self.origin = _grown(self.origin, capacity)
+        self.velocity = _grown(self.velocity, capacity)
+        self.depart = _grown(self.depart, capacity)
+        self.arrive = _grown(self.arrive, capacity)
+
+    def retarget(self, store, rows, rng):
+        self.waypoints[:, rows] = rng.uniform(0, store.area_size, size=(2, len(rows)))
+        self.speed[rows] = rng.uniform(self.min_speed, self.max_speed, size=len(rows))
+
+    def move(self, store, rows, rng, tick=0):
+        fresh = self.fresh_rows(store, rows)
+        if len(fresh):
+            self.retarget(store, fresh, rng)
+            self.paused[fresh] = 0
+
+        waiting = self.paused[rows] > 0
+        self.paused[rows[waiting]] -= 1
+        rows = rows[~waiting]
+
+        xy = store.xy[:, rows]
+        arrived = _toward(xy, self.waypoints[:, rows], self.speed[rows])
+        store.xy[:, rows] = xy
+        done = rows[arrived]
+        if len(done):
+            self.paused[done] = self.pause
+            self.retarget(store, done, rng)
+        return self.max_speed
+
+    # Continuous-time form used by the event kernel: each leg is stored as
+    # origin, velocity and departure/arrival times, so positions can be
+    # evaluated at any time and only arrivals need an event
+
+    def plan(self, store, rows, rng, now):
+        # Start the next leg of `rows` at time `now`; returns arrival times
+        fresh = self.fresh_rows(store, rows)
+        moving = np.setdiff1d(rows, fresh)
+        if len(moving):
+            self.origin[:, moving] = self.position_at(moving, now)
+        self.origin[:, fresh] = store.xy[:, fresh]
+        self.retarget(store, rows, rng)
+        self.depart[rows] = now
+        self.depart[moving] += self.pause
+        offset = self.waypoints[:, rows] - self.origin[:, rows]
+        distance = np.sqrt((offset * offset).sum(axis=0))
+        self.velocity[:, rows] = offset / np.maximum(distance, 1e-12) * self.speed[rows]
+        self.arrive[rows] = self.depart[rows] + distance / self.speed[rows]
+        return self.arrive[rows]
+
+    def position_at(self, rows, t):
+        elapsed = np.clip(t - self.depart[rows], 0, self.arrive[rows] - self.depart[rows])
+        return self.origin[:, rows] + self.velocity[:, rows] * elapsed
+
+
+class GaussMarkov(MobilityModel):
+    # Speed and heading are first-order autoregressive processes:
+    #
+    #   s' = alpha * s + (1 - alpha) * mean_speed + sqrt(1 - alpha^2) * N(0, speed_std)
+    #
+    # and likewise for the heading, whose mean turns towards the centre of
+    # the area when a node comes within edge_margin of a border.
+    def __init__(self, mean_speed=1.0, alpha=0.75, speed_std=0.5, heading_std=0.5, max_speed=None, edge_margin=10.0):
+        super().__init__()
+        self.mean_speed = mean_speed
+        self.alpha = alpha
+        self.speed_std = speed_std
+        self.heading_std = heading_std
+        self.max_speed = max_speed if max_speed is not None else mean_speed + 3 * speed_std
+        self.edge_margin = edge_margin
+        self.speed = np.zeros(0)
+        self.heading = np.zeros(0)
+        self.mean_heading = np.zeros(0)
+
+    def grow(self, capacity):
+        self.speed = _grown(self.speed, capacity)
+        self.heading = _grown(self.heading, capacity)
+        self.mean_heading = _grown(self.mean_heading, capacity)
+
+    def move(self, store, rows, rng, tick=0):
+        fresh = self.fresh_rows(store, rows)
+        if len(fresh):
+            self.speed[fresh] = self.mean_speed
+            self.heading[fresh] = self.mean_heading[fresh] = rng.uniform(0, 2 * np.pi, size=len(fresh))
+
+        x, y = store.xy[0, rows], store.xy[1, rows]
+        size = store.area_size
+        near_edge = ((x < self.edge_margin) | (x > size - self.edge_margin)
+                     | (y < self.edge_margin) | (y > size - self.edge_margin))
+        mean_heading = self.mean_heading[rows]
+        mean_heading[near_edge] = np.arctan2(size / 2 - y[near_edge], size / 2 - x[near_edge])
+        self.mean_heading[rows] = mean_heading
+
+        a = self.alpha
+        noise = np.sqrt(1 - a * a)
+        speed = (a * self.speed[rows] + (1 - a) * self.mean_speed
+                 + noise * rng.normal(0, self.speed_std, size=len(rows)))
+        speed = np.clip(speed, 0, self.max_speed)
+        # Pull towards the mean heading along the shorter way round
+        turn = np.angle(np.exp(1j * (mean_heading - self.heading[rows])))
+        heading = (self.heading[rows] + (1 - a) * turn
+                   + noise * rng.normal(0, self.heading_std, size=len(rows)))
+        self.speed[rows] = speed
+        self.heading[rows] = heading
+
+        store.xy[0, rows] = np.clip(x + speed * np.cos(heading), 0, size)
+        store.xy[1, rows] = np.clip(y + speed * np.sin(heading), 0, size)
+        return self.max_speed
+
+
+class ReferencePointGroup(MobilityModel):
+    # Reference Point Group Mobility: each group's reference point follows
+    # random waypoints and its members wander within `radius` of it
+    def __init__(self, groups=4, radius=10.0, min_speed=0.5, max_speed=2.0, member_step=0.5):
+        super().__init__()
+        self.groups = groups
+        self.radius = radius
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.member_step = member_step
+        self.centres = None
+        self.group = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros((2, 0))
+
+    def grow(self, capacity):
+        self.group = _grown(self.group, capacity)
+        self.offsets = _grown(self.offsets, capacity)
+
+    def retarget(self, store, groups, rng):
+        self.waypoints[:, groups] = rng.uniform(0, store.area_size, size=(2, len(groups)))
+        self.speed[groups] = rng.uniform(self.min_speed, self.max_speed, size=len(groups))
+
+    def move(self, store, rows, rng, tick=0):
+        if self.centres is None:
+            self.centres = rng.uniform(0, store.area_size, size=(2, self.groups))
+            self.waypoints = np.zeros((2, self.groups))
+            self.speed = np.zeros(self.groups)
+            self.retarget(store, np.arange(self.groups), rng)
+        arrived = _toward(self.centres, self.waypoints, self.speed)
+        if arrived.any():
+            self.retarget(store, np.flatnonzero(arrived), rng)
+
+        bound = self.max_speed + self.member_step * np.sqrt(2.0)
+        fresh = self.fresh_rows(store, rows)
+        if len(fresh):
+            # Joining a group places the node next to its reference point
+            self.group[fresh] = rng.integers(0, self.groups, size=len(fresh))
+            angle = rng.uniform(0, 2 * np.pi, size=len(fresh))
+            distance = self.radius * np.sqrt(rng.random(len(fresh)))
+            self.offsets[:, fresh] = distance * np.stack([np.cos(angle), np.sin(angle)])
+            bound = np.inf
+
+        offsets = self.offsets[:, rows] + rng.uniform(-self.member_step, self.member_step, size=(2, len(rows)))
+        length = np.sqrt((offsets * offsets).sum(axis=0))
+        offsets *= np.minimum(1.0, self.radius / np.maximum(length, 1e-12))
+        self.offsets[:, rows] = offsets
+        store.xy[:, rows] = np.clip(self.centres[:, self.group[rows]] + offsets, 0, store.area_size)
+        return bound
+
+
+class TraceMobility(MobilityModel):
+    # Replays recorded positions. The trace is a whitespace-separated text
+    # file (or an array) with one "time node_id x y" sample per line; node
+    # ids are matched against the store's ids and positions are linearly
+    # interpolated, with `seconds_per_tick` of trace time per tick. Nodes
+    # without samples stay where they are.
+    def __init__(self, trace, seconds_per_tick=1.0):
+        super().__init__()
+        samples = np.loadtxt(trace, ndmin=2, comments='#') if isinstance(trace, str) else np.asarray(trace, dtype=float)
+        order = np.lexsort((samples[:, 0], samples[:, 1]))
+        samples = samples[order]
+        self.seconds_per_tick = seconds_per_tick
+        self.times = samples[:, 0]
+        self.node_ids, starts = np.unique(samples[:, 1].astype(np.int64), return_index=True)
+        self.starts = starts
+        self.ends = np.append(starts[1:], len(samples))
+        self.xy = samples[:, 2:4].T.copy()
+
+        # Keys that sort samples by node then time, for one searchsorted per tick
+        self.t0 = self.times.min() if len(self.times) else 0.0
+        self.span = (self.times.max() - self.t0 + 1.0) if len(self.times) else 1.0
+        node_index = np.repeat(np.arange(len(self.node_ids)), self.ends - self.starts)
+        self.keys = node_index * self.span + (self.times - self.t0)
+
+        same = node_index[1:] == node_index[:-1]
+        step = np.sqrt((np.diff(self.xy, axis=1) ** 2).sum(axis=0))
+        dt = np.diff(self.times)
+        speed = np.where(same & (dt > 0), step / np.where(dt > 0, dt, 1.0), 0.0)
+        # A jump between two samples at the same time has no speed bound
+        jumps = same & (dt <= 0) & (step > 0)
+        self.max_speed = np.inf if jumps.any() else float(speed.max(initial=0.0))
+
+    def positions_at(self, node_index, t):
+        t = np.clip(t - self.t0, 0, self.span - 1.0)
+        query = node_index * self.span + t
+        lo = np.clip(np.searchsorted(self.keys, query, side='right') - 1, self.starts[node_index], self.ends[node_index] - 1)
+        hi = np.minimum(lo + 1, self.ends[node_index] - 1)
+        t_lo, t_hi = self.times[lo] - self.t0, self.times[hi] - self.t0
+        weight = np.where(t_hi > t_lo, np.clip((t - t_lo) / np.where(t_hi > t_lo, t_hi - t_lo, 1.0), 0, 1), 0.0)
+        return self.xy[:, lo] * (1 - weight) + self.xy[:, hi] * weight
+
+    def move(self, store, rows, rng, tick=0):
+        # Nodes jump onto the trace the first time they are seen
+        bound = np.inf if len(self.fresh_rows(store, rows)) else self.max_speed * self.seconds_per_tick
+        ids = store.ids[rows]
+        match = np.searchsorted(self.node_ids, ids)
+        match = np.minimum(match, max(len(self.node_ids) - 1, 0))
+        traced = (self.node_ids[match] == ids) if len(self.node_ids) else np.zeros(len(rows), dtype=bool)
+        if traced.any():
+            t = self.t0 + tick * self.seconds_per_tick
+            store.xy[:, rows[traced]] = np.clip(self.positions_at(match[traced], t), 0, store.area_size)
+        return bound
+
+
+MOBILITY_MODELS = {
+    'jitter': RandomJitter,
+    'waypoint': RandomWaypoint,
+    'gauss_markov': GaussMarkov,
+    'group': ReferencePointGroup,
+    'trace': TraceMobility,
+}
+
+
+def make_mobility(kind='jitter', **params):
+    if kind not in MOBILITY_MODELS:
+        raise ValueError(f"Unknown mobility model '{kind}', expected one of {sorted(MOBILITY_MODELS)}")
+    return MOBILITY_MODELS[kind](**params)
@@ -0,0 +1,302 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+AREA_SIZE = 100.0
+
+
+def _pair_keys(pairs):
+    return (pairs[:, 0].astype(np.int64) << 32) | pairs[:, 1].astype(np.int64)
+
+
+class NodeStore:
+    # Column-oriented storage for every node of a network. Rows are slots in
+    # the arrays; released rows go on a free list and are handed out again.
+    def __init__(self, capacity=16, rng=None, area_size=AREA_SIZE):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.area_size = area_size
+        self.capacity = 0
+        self.size = 0
+        self.free_rows = []
+        self.allocate_hooks = []
+        self.kill_hooks = []
+        self.release_hooks = []
+        self.q_router = None
+        self.xy = np.empty((2, 0))
+        self.energy = np.empty(0)
+        self.reputation = np.empty(0)
+        self.malicious = np.empty(0, dtype=bool)
+        self.alive = np.empty(0, dtype=bool)
+        self.ids = np.empty(0, dtype=np.int64)
+        self._grow(max(1, capacity))
+
+        # Undirected links as canonical (low, high) row pairs plus a CSR view
+        self.links = np.empty((0, 2), dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)
+        self._active = None
+
+    @property
+    def x(self):
+        return self.xy[0]
+
+    @property
+    def y(self):
+        return self.xy[1]
+
+    def _grow(self, capacity):
+        extra = capacity - self.capacity
+        self.xy = np.concatenate([self.xy, np.zeros((2, extra))], axis=1)
+        self.energy = np.concatenate([self.energy, np.zeros(extra)])
+        self.reputation = np.concatenate([self.reputation, np.zeros(extra)])
+        self.malicious = np.concatenate([self.malicious, np.zeros(extra, dtype=bool)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.ids = np.concatenate([self.ids, np.full(extra, -1, dtype=np.int64)])
+        self.capacity = capacity
+
+    def allocate(self, node_id, position=None, energy=100.0, reputation=1.0, is_malicious=False):
+        positions = None if position is None else np.reshape(position, (1, 2))
+        return int(self.allocate_many([node_id], positions, energy, reputation, is_malicious)[0])
+
+    def allocate_many(self, node_ids, positions=None, energy=100.0, reputation=1.0, is_malicious=False):
+        # Rows for a batch of new nodes: released rows first, most recently
+        # released first, then fresh rows at the end with at most one grow
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        count = len(node_ids)
+        reused = [self.free_rows.pop() for _ in range(min(count, len(self.free_rows)))]
+        fresh = count - len(reused)
+        if self.size + fresh > self.capacity:
+            self._grow(max(self.capacity * 2, self.size + fresh))
+        rows = np.concatenate([np.array(reused, dtype=np.int64), np.arange(self.size, self.size + fresh)])
+        self.size += fresh
+
+        if positions is None:
+            positions = self.rng.uniform(0, self.area_size, size=(count, 2))
+        self.xy[:, rows] = np.asarray(positions, dtype=float).reshape(count, 2).T
+        self.energy[rows] = energy
+        self.reputation[rows] = reputation
+        self.malicious[rows] = is_malicious
+        self.alive[rows] = True
+        self.ids[rows] = node_ids
+        self._active = None
+        for hook in self.allocate_hooks:
+            hook(rows)
+        return rows
+
+    def release(self, row):
+        self.release_many([row])
+
+    def release_many(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        self.alive[rows] = False
+        self.ids[rows] = -1
+        self.free_rows.extend(rows.tolist())
+        self._active = None
+        for hook in self.release_hooks:
+            hook(rows)
+
+    def kill(self, rows):
+        # Out of energy: the row leaves the topology but keeps its id
+        rows = np.asarray(rows, dtype=np.int64)
+        self.alive[rows] = False
+        self._active = None
+        for hook in self.kill_hooks:
+            hook(rows)
+
+    def active_rows(self):
+        if self._active is None:
+            self._active = np.flatnonzero(self.alive[:self.size])
+        return self._active
+
+    def positions(self, rows=None):
+        if rows is None:
+            rows = self.active_rows()
+        return self.xy[:, rows].T
+
+    def squared_distances(self, rows_a, rows_b):
+        dx = self.xy[0, rows_a] - self.xy[0, rows_b]
+        dy = self.xy[1, rows_a] - self.xy[1, rows_b]
+        return dx * dx + dy * dy
+
+    def move(self, rows, max_step):
+        step = self.rng.uniform(-max_step, max_step, size=(2, len(rows)))
+        self.xy[:, rows] = np.clip(self.xy[:, rows] + step, 0, self.area_size)
+
+    def clamp(self, rows):
+        self.xy[:, rows] = np.clip(self.xy[:, rows], 0, self.area_size)
+        self.energy[rows] = np.clip(self.energy[rows], 0, None)
+        self.reputation[rows] = np.clip(self.reputation[rows], 0, 1)
+
+    def drain(self, rows, amount):
+        self.energy[rows] = np.maximum(self.energy[rows] - amount, 0)
+
+    def apply_link_events(self, link_up, link_down):
+        # link_up / link_down are (k, 2) arrays of canonical row pairs
+        links = self.links
+        if len(link_down):
+            links = links[~np.isin(_pair_keys(links), _pair_keys(link_down))]
+        if len(link_up):
+            links = np.concatenate([links, link_up])
+        self.set_links(links)
+
+    def set_links(self, links):
+        self.links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+        src = np.concatenate([self.links[:, 0], self.links[:, 1]])
+        dst = np.concatenate([self.links[:, 1], self.links[:, 0]])
+        order = np.lexsort((dst, src))
+        self.indices = dst[order]
+        self.indptr = np.zeros(self.capacity + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.capacity), out=self.indptr[1:])
+
+    def neighbor_rows(self, row):
+        if row + 1 >= len(self.indptr):
+            return self.indices[:0]
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+
+class Node:
+    # Lightweight view over one row of a NodeStore. A Node created on its own
+    # gets a private one-row store and is adopted by a network when added.
+    __slots__ = ('node_id', '_store', '_row')
+
+    def __init__(self, node_id, is_malicious=False, store=None, row=None):
+        self.node_id = node_id
+        if store is None:
+            store = NodeStore(capacity=1)
+            row = store.allocate(node_id, is_malicious=is_malicious)
+        self._store = store
+        self._row = row
+
+    @property
+    def row(self):
+        return self._row
+
+    @property
+    def alive(self):
+        return bool(self._store.alive[self._row])
+
+    @property
+    def is_malicious(self):
+        return bool(self._store.malicious[self._row])
+
+    @is_malicious.setter
+    def is_malicious(self, value):
+        self._store.malicious[self._row] = value
+
+    @property
+    def reputation(self):
+        return float(self._store.reputation[self._row])
+
+    @reputation.setter
+    def reputation(self, value):
+        self._store.reputation[self._row] = value
+
+    @property
+    def energy(self):
+        return float(self._store.energy[self._row])
+
+    @energy.setter
+    def energy(self, value):
+        self._store.energy[self._row] = value
+
+    @property
+    def position(self):
+        return (float(self._store.xy[0, self._row]), float(self._store.xy[1, self._row]))
+
+    @position.setter
+    def position(self, value):
+        self._store.xy[:, self._row] = value
+
+    @property
+    def neighbors(self):
+        # Read-only: links come from the topology, so editing a copy here
+        # would silently change nothing
+        store = self._store
+        return frozenset(store.ids[store.neighbor_rows(self._row)].tolist())
+
+    @property
+    def q_table(self):
+        # {destination id: {next hop id: Q}} read from the network's Q router
+        router = self._store.q_router
+        if router is None:
+            return {}
+        ids = self._store.ids
+        return {
+            int(ids[dest]): {int(ids[hop]): q for hop, q in hops.items()}
+            for dest, hops in router.node_table(self._row).items()
+        }
+
+    def update_position(self, new_x, new_y):
+        self.position = (new_x, new_y)
+
+
+class NodeMap(MutableMapping):
+    # The MANET.nodes mapping: node id -> Node view over the shared store.
+    # next_id is one past the largest id ever added, so ids handed out by
+    # new_ids() are never reused, even after their node is removed.
+    def __init__(self, store):
+        self.store = store
+        self._nodes = {}
+        self.next_id = 0
+
+    def __getitem__(self, node_id):
+        return self._nodes[node_id]
+
+    def __setitem__(self, node_id, node):
+        current = self._nodes.get(node_id)
+        if node._store is self.store:
+            # A view of this network can only be stored again under its own id
+            if current is None or current._row != node._row:
+                raise ValueError(f"Node {node.node_id} is already in this network at row {node._row}; "
+                                 f"remove it before storing it as node {node_id}")
+            self._nodes[node_id] = node
+            return
+        # A node from another store is copied into a row of this one; the
+        # caller's Node keeps viewing its own store
+        if current is not None:
+            del self[node_id]
+        source, source_row = node._store, node._row
+        row = self.store.allocate(
+            node_id,
+            position=source.xy[:, source_row],
+            energy=source.energy[source_row],
+            reputation=source.reputation[source_row],
+            is_malicious=source.malicious[source_row]
+        )
+        self._nodes[node_id] = Node(node_id, store=self.store, row=row)
+        self.next_id = max(self.next_id, node_id + 1)
+
+    def __delitem__(self, node_id):
+        node = self._nodes.pop(node_id)
+        self.store.release(node._row)
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def new_ids(self, count):
+        return list(range(self.next_id, self.next_id + count))
+
+    def add(self, node_id, **attrs):
+        return self.add_many([node_id], **attrs)[0]
+
+    def add_many(self, node_ids, positions=None, **attrs):
+        node_ids = [int(node_id) for node_id in node_ids]
+        taken = sorted(node_id for node_id in set(node_ids) if node_id in self._nodes)
+        if taken:
+            raise ValueError(f"Node ids already in use: {taken}")
+        if len(set(node_ids)) != len(node_ids):
+            raise ValueError("Node ids must be unique")
+        rows = self.store.allocate_many(node_ids, positions, **attrs)
+        nodes = [Node(node_id, store=self.store, row=row) for node_id, row in zip(node_ids, rows.tolist())]
+        self._nodes.update(zip(node_ids, nodes))
+        if node_ids:
+            self.next_id = max(self.next_id, max(node_ids) + 1)
+        return nodes
+
+    def remove_many(self, node_ids):
+        rows = [self._nodes.pop(node_id)._row for node_id in node_ids]
+        if rows:
+            self.store.release_many(rows)
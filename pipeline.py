@@ -0,0 +1,183 @@
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+Snapshot = namedtuple('Snapshot', [
+    'tick', 'ids', 'x', 'y', 'energy', 'reputation', 'malicious',
+    'links', 'link_up', 'link_down', 'routes', 'stats', 'area_size', 'counters',
+])
+
+
+def _frozen(array):
+    array = np.array(array, copy=True)
+    array.setflags(write=False)
+    return array
+
+
+def take_snapshot(simulator, link_up=None, link_down=None):
+    # Immutable copy of everything the UI needs for one frame. Called on the
+    # simulation thread; the UI thread never touches live simulation state.
+    # link_up/link_down are the link changes since the previous frame, or
+    # None when they are unknown.
+    store = simulator.manet.store
+    rows = store.active_rows()
+    streaming = simulator.streaming
+    aggregates = streaming.aggregates()
+    rates = streaming.rates()
+    stats = {
+        'nodes': aggregates['nodes'],
+        'malicious': aggregates['malicious'],
+        'success_rate': simulator.success_rate,
+        'recent_success_rate': rates['delivery_ratio'] * 100,
+        'throughput': rates['throughput'],
+        'hops_p90': streaming.hops.quantile(0.9),
+        'latency_p90': streaming.latency.quantile(0.9),
+        'active_routes': len(simulator.packet_routes),
+        'avg_energy': aggregates['avg_energy'],
+        'dead': simulator.manet.energy.deaths,
+        'metrics': simulator.metrics() if simulator.instrumentation.enabled else None,
+    }
+    return Snapshot(
+        tick=simulator.tick,
+        ids=_frozen(store.ids[rows]),
+        x=_frozen(store.x[rows]),
+        y=_frozen(store.y[rows]),
+        energy=_frozen(store.energy[rows]),
+        reputation=_frozen(store.reputation[rows]),
+        malicious=_frozen(store.malicious[rows]),
+        links=_frozen(store.ids[store.links]),
+        link_up=None if link_up is None else tuple(link_up),
+        link_down=None if link_down is None else tuple(link_down),
+        routes=tuple(tuple(path) for path in simulator.packet_routes),
+        stats=stats,
+        area_size=store.area_size,
+        counters={name: _frozen(counts[rows]) for name, counts in streaming.counters.items()}
+    )
+
+
+class FrameQueue:
+    # Bounded single-producer/single-consumer frame queue. When the consumer
+    # falls behind the oldest frame is dropped, so the UI always renders the
+    # newest state and never blocks the simulation.
+    def __init__(self, maxsize=2):
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def publish(self, snapshot):
+        while True:
+            try:
+                self.frames.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def latest(self):
+        # Newest pending frame and the frames skipped before it
+        newest = None
+        skipped = []
+        while True:
+            try:
+                frame = self.frames.get_nowait()
+            except queue.Empty:
+                break
+            if newest is not None:
+                skipped.append(newest)
+            newest = frame
+        return newest, skipped
+
+
+class CommandQueue:
+    # Edits requested by the UI thread, applied by the simulation between ticks
+    def __init__(self):
+        self.commands = queue.Queue()
+
+    def submit(self, command, *args):
+        self.commands.put((command, args))
+
+    def apply_pending(self):
+        applied = 0
+        while True:
+            try:
+                command, args = self.commands.get_nowait()
+            except queue.Empty:
+                return applied
+            command(*args)
+            applied += 1
+
+
+class SimulationThread:
+    # Runs the simulator off the Tk thread: apply queued commands, step,
+    # publish a snapshot, then pace by the requested tick rate
+    def __init__(self, simulator, frames, commands):
+        self.simulator = simulator
+        self.frames = frames
+        self.commands = commands
+        self.lock = threading.Lock()
+        # Last change per link since the previous frame, so a link that went
+        # down and came back up between two frames is published once
+        self.pending_links = {}
+        self.ticks_per_second = 1.0
+        self.running = False
+        self._thread = None
+        self._stop = threading.Event()
+        simulator.manet.link_listeners.append(self._on_link_events)
+
+    def _on_link_events(self, link_up, link_down):
+        for link in link_down:
+            self.pending_links[link] = False
+        for link in link_up:
+            self.pending_links[link] = True
+
+    def publish(self):
+        pending = self.pending_links
+        self.pending_links = {}
+        link_up = [link for link, up in pending.items() if up]
+        link_down = [link for link, up in pending.items() if not up]
+        with self.simulator.instrumentation.phase('snapshot'):
+            snapshot = take_snapshot(self.simulator, link_up, link_down)
+        self.frames.publish(snapshot)
+
+    def start(self):
+        # Each loop gets its own stop event, so a stopped loop can never be
+        # revived by a later start
+        if self.running:
+            return
+        self.running = True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(self._stop,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Returns once the loop has finished its tick, so a quick restart
+        # never leaves two loops stepping the simulator
+        self.running = False
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def ident(self):
+        # Thread id of the running simulation loop, for the sampling profiler
+        return self._thread.ident if self.running and self._thread is not None else None
+
+    def apply_now(self):
+        # Used while paused: apply queued commands and publish a fresh frame
+        with self.lock:
+            if self.commands.apply_pending():
+                self.simulator.manet.update_topology()
+            self.publish()
+
+    def _loop(self, stopped):
+        while not stopped.is_set():
+            with self.lock:
+                self.commands.apply_pending()
+                self.simulator.step()
+                self.publish()
+            stopped.wait(1.0 / self.ticks_per_second)
@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+import time
+
+
+class _Phase:
+    __slots__ = ('timers', 'name', 'start')
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        timer = self.timers.get(self.name)
+        if timer is None:
+            # calls, total, max, last
+            self.timers[self.name] = [1, elapsed, elapsed, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = max(timer[2], elapsed)
+            timer[3] = elapsed
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_PHASE = _NullPhase()
+
+
+class Instrumentation:
+    # Per-phase wall-clock timers plus named counters. While disabled,
+    # phase() hands back one shared no-op context manager and count() returns
+    # at once, so instrumented code costs a method call per phase. Counters
+    # that components already keep are registered with watch() and only read
+    # when metrics are requested.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timers = {}
+        self.counters = {}
+        self.sources = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self.timers, name)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def watch(self, name, source):
+        self.sources[name] = source
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    def metrics(self):
+        phases = {}
+        for name, (calls, total, longest, last) in list(self.timers.items()):
+            phases[name] = {
+                'calls': calls,
+                'total_ms': total * 1000,
+                'mean_ms': total / calls * 1000,
+                'max_ms': longest * 1000,
+                'last_ms': last * 1000,
+            }
+        counters = dict(self.counters)
+        for name, source in self.sources.items():
+            counters[name] = source()
+        return {'enabled': self.enabled, 'phases': phases, 'counters': counters}
+
+
+def _label(code):
+    # flamegraph.pl splits frames on ';' and the count on the last space
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class Sampler:
+    # Statistical profiler: a daemon thread records the stack of the target
+    # thread (the calling thread by default) every `interval` seconds.
+    # Stacks are kept as collapsed "outer;...;inner count" lines, the input
+    # format of flamegraph.pl, speedscope and similar tools. Nothing runs in
+    # the sampled thread itself.
+    def __init__(self, thread=None, interval=0.002):
+        self.target = thread.ident if isinstance(thread, threading.Thread) else thread
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.running = False
+        self._thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        if self.target is None:
+            self.target = threading.get_ident()
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _loop(self):
+        while self.running:
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self):
+        return [f"{stack} {count}" for stack, count in sorted(self.stacks.items())]
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for line in self.collapsed():
+                f.write(line + '\n')
+        return path
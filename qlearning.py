@@ -0,0 +1,303 @@
+import numpy as np
+
+# Q-values are keyed by (node row, destination row, next-hop row) packed into
+# one int64, which leaves room for just over two million rows.
+ROW_BITS = 21
+MAX_ROWS = 1 << ROW_BITS
+ROW_MASK = np.int64(MAX_ROWS - 1)
+# Floor on a link's delivery probability when scaling hop costs, so a dead
+# link costs a lot rather than infinitely much
+MIN_LINK_PROBABILITY = 0.05
+EMPTY = np.int64(-1)
+# Marks the slot of a forgotten entry: lookups probe past it, inserts
+# leave it alone, and the next rebuild clears it
+TOMBSTONE = np.int64(-2)
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def encode(nodes, dests, hops):
+    nodes = np.asarray(nodes, dtype=np.int64)
+    dests = np.asarray(dests, dtype=np.int64)
+    hops = np.asarray(hops, dtype=np.int64)
+    for rows in (nodes, dests, hops):
+        if rows.size and (rows.min() < 0 or rows.max() >= MAX_ROWS):
+            raise ValueError(f"Q-table keys hold rows 0 to {MAX_ROWS - 1}, got rows {rows.min()} to {rows.max()}")
+    return (nodes << (2 * ROW_BITS)) | (dests << ROW_BITS) | hops
+
+
+def decode(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> (2 * ROW_BITS), (keys >> ROW_BITS) & ROW_MASK, keys & ROW_MASK
+
+
+def segments(indptr, indices, rows):
+    # Flattened CSR neighbor lists of `rows`: (owner position, neighbor row, counts)
+    rows = np.asarray(rows, dtype=np.int64)
+    inside = rows + 1 < len(indptr)
+    starts = np.where(inside, indptr[np.minimum(rows, len(indptr) - 2)], 0)
+    counts = np.where(inside, indptr[np.minimum(rows + 1, len(indptr) - 1)] - starts, 0)
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, indices[np.repeat(starts, counts) + offsets], counts
+
+
+class SparseQTable:
+    # Open-addressing hash table with linear probing, operated on whole
+    # batches of keys at once. Missing entries read as 0.
+    def __init__(self, capacity=1024, max_load=0.5):
+        self.max_load = max_load
+        self.count = 0
+        self.tombstones = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        capacity = 1 << max(4, int(np.ceil(np.log2(capacity))))
+        self.keys = np.full(capacity, EMPTY, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float32)
+        self.mask = capacity - 1
+        self.shift = np.uint64(64 - int(np.log2(capacity)))
+
+    def __len__(self):
+        return self.count
+
+    def _hash(self, keys):
+        return ((keys.astype(np.uint64) * HASH_MULTIPLIER) >> self.shift).astype(np.int64)
+
+    def slots(self, keys, insert=False):
+        keys = np.asarray(keys, dtype=np.int64)
+        if insert:
+            needed = self.count + len(keys)
+            if needed + self.tombstones > self.max_load * len(self.keys):
+                self._resize(max(len(self.keys), needed / self.max_load * 2))
+
+        result = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        probe = self._hash(keys)
+        while len(pending):
+            slot = probe[pending]
+            stored = self.keys[slot]
+            hit = stored == keys[pending]
+            result[pending[hit]] = slot[hit]
+
+            empty = stored == EMPTY
+            if insert and empty.any():
+                # Claim empty slots; when several keys race for one slot the
+                # first wins and the rest probe again on the next pass.
+                claim_slots, first = np.unique(slot[empty], return_index=True)
+                claimants = pending[empty][first]
+                claim_keys, unique_first = np.unique(keys[claimants], return_index=True)
+                claim_slots = claim_slots[unique_first]
+                self.keys[claim_slots] = claim_keys
+                self.count += len(claim_slots)
+                pending = pending[~hit]
+                continue
+
+            advance = ~(hit | empty)
+            probe[pending[advance]] = (slot[advance] + 1) & self.mask
+            pending = pending[advance]
+        return result
+
+    def get(self, keys):
+        slots = self.slots(keys)
+        values = np.zeros(len(slots), dtype=np.float64)
+        found = slots >= 0
+        values[found] = self.values[slots[found]]
+        return values
+
+    def add(self, keys, deltas):
+        slots = self.slots(keys, insert=True)
+        np.add.at(self.values, slots, np.asarray(deltas, dtype=np.float32))
+
+    def entries(self):
+        used = self.keys >= 0
+        return self.keys[used], self.values[used]
+
+    def forget(self, rows):
+        # Drop every entry that mentions one of `rows` as node, destination or
+        # next hop, e.g. when a store row is released and may be reused. The
+        # slots become tombstones, so nothing is rehashed here.
+        used = np.flatnonzero(self.keys >= 0)
+        node, dest, hop = decode(self.keys[used])
+        drop = used[np.isin(node, rows) | np.isin(dest, rows) | np.isin(hop, rows)]
+        self.keys[drop] = TOMBSTONE
+        self.values[drop] = 0
+        self.count -= len(drop)
+        self.tombstones += len(drop)
+
+    def _resize(self, capacity):
+        keys, values = self.entries()
+        self._rebuild(keys, values, capacity)
+
+    def _rebuild(self, keys, values, capacity):
+        self._allocate(capacity)
+        self.count = 0
+        self.tombstones = 0
+        if len(keys):
+            slots = self.slots(keys, insert=True)
+            self.values[slots] = values
+
+
+class QRouter:
+    # Q-routing over the store's CSR adjacency. Q(node, dest, hop) estimates
+    # the return of handing a packet for dest from node to neighbor hop.
+    # With a radio model hops can be lost, and each hop costs its expected
+    # number of transmissions (1 / delivery probability) times hop_cost.
+    def __init__(self, store, alpha=0.5, gamma=0.9, epsilon=0.1,
+                 reputation_weight=1.0, energy_weight=0.5,
+                 hop_cost=1.0, delivery_reward=10.0, drop_penalty=10.0,
+                 drop_probability=1.0, rng=None):
+        self.store = store
+        self.table = SparseQTable()
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.reputation_weight = reputation_weight
+        self.energy_weight = energy_weight
+        self.hop_cost = hop_cost
+        self.delivery_reward = delivery_reward
+        self.drop_penalty = drop_penalty
+        self.drop_probability = drop_probability
+        self.rng = rng if rng is not None else store.rng
+        self.radio = None
+        self.updates = 0
+
+    def forget(self, rows):
+        self.table.forget(rows)
+
+    def hop_rewards(self, count, probabilities=None):
+        if probabilities is None:
+            return np.full(count, -self.hop_cost)
+        return -self.hop_cost / np.maximum(probabilities, MIN_LINK_PROBABILITY)
+
+    def q_values(self, nodes, dests, hops):
+        return self.table.get(encode(nodes, dests, hops))
+
+    def select_next_hops(self, nodes, dests, explore=True):
+        # epsilon-greedy choice for a batch of packets; -1 where the node is isolated
+        store = self.store
+        nodes = np.asarray(nodes, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        owner, hops, counts = segments(store.indptr, store.indices, nodes)
+        choice = np.full(len(nodes), -1, dtype=np.int64)
+        if not len(hops):
+            return choice
+
+        energy = store.energy[hops] / 100.0
+        reputation = store.reputation[hops]
+        scores = (self.q_values(nodes[owner], dests[owner], hops)
+                  + self.reputation_weight * reputation
+                  + self.energy_weight * energy)
+
+        has_hops = counts > 0
+        starts = (np.cumsum(counts) - counts)[has_hops]
+        order = np.lexsort((-scores, owner))
+        choice[has_hops] = hops[order[starts]]
+
+        if explore and self.epsilon > 0:
+            explorers = has_hops & (self.rng.random(len(nodes)) < self.epsilon)
+            if explorers.any():
+                # Exploration is biased towards trusted, well-charged neighbors
+                weights = np.maximum(reputation * energy, 1e-9)
+                cumulative = np.cumsum(weights)
+                base = np.concatenate([[0.0], cumulative])
+                ends = np.cumsum(counts)
+                picks = np.flatnonzero(explorers)
+                lo = base[ends[picks] - counts[picks]]
+                hi = base[ends[picks]]
+                index = np.searchsorted(cumulative, lo + self.rng.random(len(picks)) * (hi - lo), side='right')
+                index = np.clip(index, ends[picks] - counts[picks], ends[picks] - 1)
+                choice[picks] = hops[index]
+        return choice
+
+    def update(self, nodes, dests, hops, rewards, terminal):
+        # One batched Bellman backup for every transition in the batch
+        store = self.store
+        nodes = np.asarray(nodes, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        hops = np.asarray(hops, dtype=np.int64)
+        targets = np.asarray(rewards, dtype=np.float64).copy()
+
+        onward = np.flatnonzero(~np.asarray(terminal, dtype=bool))
+        if len(onward):
+            owner, next_hops, counts = segments(store.indptr, store.indices, hops[onward])
+            if len(next_hops):
+                values = self.q_values(hops[onward][owner], dests[onward][owner], next_hops)
+                has_hops = counts > 0
+                starts = (np.cumsum(counts) - counts)[has_hops]
+                best = np.maximum.reduceat(values, starts)
+                targets[onward[has_hops]] += self.gamma * best
+
+        # Packets sharing a (node, dest, hop) transition are averaged into a
+        # single backup so large batches do not overshoot
+        keys, inverse = np.unique(encode(nodes, dests, hops), return_inverse=True)
+        targets = np.bincount(inverse, weights=targets) / np.bincount(inverse)
+        current = self.table.get(keys)
+        self.table.add(keys, self.alpha * (targets - current))
+        self.updates += len(nodes)
+
+    def forward(self, nodes, dests, explore=True):
+        # Advance a batch of in-flight packets by one hop and learn from it.
+        # Returns the node each packet moved to, -1 where it did not move,
+        # and its status: 0 in flight, 1 delivered, -1 dropped.
+        store = self.store
+        nodes = np.asarray(nodes, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        hops = self.select_next_hops(nodes, dests, explore)
+        status = np.zeros(len(nodes), dtype=np.int8)
+
+        stuck = hops < 0
+        status[stuck] = -1
+        moving = np.flatnonzero(~stuck)
+        if not len(moving):
+            return hops, status
+
+        next_hop = hops[moving]
+        probabilities = None
+        lost = np.zeros(len(moving), dtype=bool)
+        if self.radio is not None:
+            # A lost hop leaves the packet where it was; it counts as dropped
+            probabilities = self.radio.link_probability(nodes[moving], next_hop)
+            lost = self.rng.random(len(moving)) >= probabilities
+        delivered = ~lost & (next_hop == dests[moving])
+        dropped = lost | (~delivered & store.malicious[next_hop]
+                          & (self.rng.random(len(moving)) < self.drop_probability))
+
+        rewards = self.hop_rewards(len(moving), probabilities)
+        rewards[delivered] += self.delivery_reward
+        rewards[dropped] -= self.drop_penalty
+        self.update(nodes[moving], dests[moving], next_hop, rewards, delivered | dropped)
+
+        status[moving[delivered]] = 1
+        status[moving[dropped]] = -1
+        hops[moving[lost]] = -1
+        return hops, status
+
+    def route_batch(self, sources, dests, max_hops=32, explore=True):
+        # Route every packet to completion; returns status and hop counts
+        current = np.asarray(sources, dtype=np.int64).copy()
+        dests = np.asarray(dests, dtype=np.int64)
+        status = np.where(current == dests, 1, 0).astype(np.int8)
+        hop_count = np.zeros(len(current), dtype=np.int64)
+
+        for _ in range(max_hops):
+            active = np.flatnonzero(status == 0)
+            if not len(active):
+                break
+            hops, result = self.forward(current[active], dests[active], explore)
+            moved = hops >= 0
+            current[active[moved]] = hops[moved]
+            hop_count[active[moved]] += 1
+            status[active] = result
+
+        status[status == 0] = -1
+        return status, hop_count
+
+    def node_table(self, row):
+        # {destination row: {next hop row: q}} for one node, for inspection
+        keys, values = self.table.entries()
+        node, dest, hop = decode(keys)
+        table = {}
+        for d, h, q in zip(dest[node == row].tolist(), hop[node == row].tolist(), values[node == row].tolist()):
+            table.setdefault(d, {})[h] = q
+        return table
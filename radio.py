@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+
+from topology import GridNeighborIndex
+
+
+class RadioModel:
+    # Log-distance path loss with SINR-based reception. For a transmission
+    # over distance d while other nodes are on air:
+    #
+    #   path_loss(d) = reference_loss + 10 * exponent * log10(d / 1 m)
+    #   signal       = tx_power - path_loss(d)                       (dBm)
+    #   SINR         = signal / (noise + activity * sum of interferers)
+    #   P(delivery)  = 1 / (1 + exp(-(SINR_dB - threshold) / width))
+    #
+    # tx_power is chosen so that without interference a hop of exactly
+    # transmission_range has an SNR of threshold + edge_margin, so links are
+    # reliable well inside the range and lossy at its edge. `activity` is
+    # the chance that a transmitter of the same tick overlaps a given packet,
+    # roughly twice a packet's airtime over a tick; callers that know which
+    # transmissions really overlap pass activity=1.
+    # Interferers too far away to raise the noise floor by `floor` are
+    # pruned with a grid over the transmitters, so the cost grows with the
+    # transmitters near each receiver rather than with all of them.
+    #
+    # The interference each row last measured is kept as a moving average,
+    # so routing can estimate a link's quality before transmitting on it.
+    def __init__(self, store, transmission_range=30, exponent=3.0, reference_loss=40.0, noise=-95.0,
+                 threshold=10.0, width=2.0, edge_margin=0.0, activity=0.02, floor=0.1, memory=0.5):
+        self.store = store
+        self.transmission_range = transmission_range
+        self.exponent = exponent
+        self.reference_loss = reference_loss
+        self.noise = noise
+        self.threshold = threshold
+        self.width = width
+        self.edge_margin = edge_margin
+        self.activity = activity
+        self.floor = floor
+        self.memory = memory
+        self.index = GridNeighborIndex()
+        self.interference = np.zeros(0)
+        self.transmissions = 0
+        self.interferers = 0
+        self._fit()
+
+    def _fit(self):
+        if len(self.interference) < self.store.capacity:
+            self.interference = np.concatenate([self.interference,
+                                                np.zeros(self.store.capacity - len(self.interference))])
+
+    @property
+    def tx_power(self):
+        return self.noise + self.threshold + self.edge_margin + self.path_loss(self.transmission_range)
+
+    @property
+    def noise_mw(self):
+        return 10 ** (self.noise / 10)
+
+    def interference_range(self, activity=None):
+        # Beyond this distance a transmitter adds less than floor * noise
+        activity = self.activity if activity is None else activity
+        edge_snr = 10 ** ((self.threshold + self.edge_margin) / 10)
+        return self.transmission_range * (edge_snr * activity / self.floor) ** (1 / self.exponent)
+
+    def path_loss(self, distances):
+        # Distances below 1 m are clamped to the reference distance
+        return self.reference_loss + 10 * self.exponent * np.log10(np.maximum(distances, 1.0))
+
+    def received_power(self, distances):
+        # Received power in mW
+        return 10 ** ((self.tx_power - self.path_loss(distances)) / 10)
+
+    def delivery_probability(self, sinr_db):
+        return 1.0 / (1.0 + np.exp(-(np.asarray(sinr_db) - self.threshold) / self.width))
+
+    def sinr(self, signal, interference):
+        return 10 * np.log10(signal / (self.noise_mw + interference))
+
+    def interference_at(self, receivers, senders, transmitters, activity=None):
+        # Power at each receiver from every transmitter but its own sender.
+        # Nodes cannot hear while they transmit, which is not modelled here.
+        store = self.store
+        receivers = np.asarray(receivers, dtype=np.int64)
+        senders = np.asarray(senders, dtype=np.int64)
+        activity = self.activity if activity is None else activity
+        if activity <= 0:
+            return np.zeros(len(receivers))
+        reach = self.interference_range(activity)
+        targets, inverse = np.unique(receivers, return_inverse=True)
+        positions = np.concatenate([store.xy[:, transmitters].T, store.xy[:, targets].T])
+        found, near = self.index.candidates(positions, np.arange(len(transmitters), len(positions)), reach)
+        keep = near < len(transmitters)
+        found, near = found[keep] - len(transmitters), near[keep]
+        rows = transmitters[near]
+        distances = np.sqrt(store.squared_distances(rows, targets[found]))
+        keep = (distances <= reach) & (rows != targets[found])
+        self.interferers += int(keep.sum())
+        found, rows, power = found[keep], rows[keep], self.received_power(distances[keep])
+
+        # Every interferer of a receiver counts once for each transmission
+        # to that receiver, except in the one it sends itself
+        counts = np.bincount(inverse, minlength=len(targets))
+        order = np.argsort(inverse, kind='stable')
+        starts = np.cumsum(counts) - counts
+        repeat = counts[found]
+        pair = np.repeat(np.arange(len(found)), repeat)
+        offset = np.arange(len(pair)) - np.repeat(np.cumsum(repeat) - repeat, repeat)
+        transmission = order[starts[found[pair]] + offset]
+        keep = rows[pair] != senders[transmission]
+        total = np.bincount(transmission[keep], weights=power[pair[keep]], minlength=len(receivers))
+        return activity * total
+
+    def link_probability(self, senders, receivers, transmitters=None, activity=None):
+        # Delivery probability of each sender -> receiver transmission while
+        # `transmitters` (by default the distinct senders) are on air. The
+        # interference measured at the receivers is remembered for estimate().
+        senders = np.asarray(senders, dtype=np.int64)
+        receivers = np.asarray(receivers, dtype=np.int64)
+        if not len(senders):
+            return np.zeros(0)
+        self._fit()
+        transmitters = np.unique(senders) if transmitters is None else np.unique(transmitters)
+        signal = self.received_power(np.sqrt(self.store.squared_distances(senders, receivers)))
+        interference = self.interference_at(receivers, senders, transmitters, activity)
+        self.interference[receivers] *= self.memory
+        self.interference[receivers] += (1 - self.memory) * interference
+        self.transmissions += len(senders)
+        return self.delivery_probability(self.sinr(signal, interference))
+
+    def expected(self, senders, receivers):
+        # Delivery probability of each hop given the interference last
+        # measured at its receiver; nothing is recomputed
+        self._fit()
+        distances = np.sqrt(self.store.squared_distances(senders, receivers))
+        return self.delivery_probability(self.sinr(self.received_power(distances), self.interference[receivers]))
+
+    def estimate(self, distance, row):
+        # expected() for a single hop, without numpy overhead, for route search
+        noise = self.noise_mw
+        edge = noise * 10 ** ((self.threshold + self.edge_margin) / 10)
+        signal = edge * (self.transmission_range / max(distance, 1.0)) ** self.exponent
+        recent = float(self.interference[row]) if row < len(self.interference) else 0.0
+        sinr = 10 * math.log10(signal / (noise + recent))
+        return 1.0 / (1.0 + math.exp(-(sinr - self.threshold) / self.width))
+
+    def forget(self, rows):
+        self._fit()
+        self.interference[rows] = 0
@@ -0,0 +1,275 @@
+import json
+import os
+
+import numpy as np
+
+from pipeline import Snapshot
+from traffic import DELIVERED
+
+# Column layout of every table of a recorded run. Node ids are recorded,
+# not store rows, so a trace stays meaningful when rows are reused.
+SCHEMAS = {
+    'ticks': (('tick', np.int64), ('generated', np.int64), ('delivered', np.int64), ('dead', np.int64)),
+    'nodes': (('tick', np.int64), ('id', np.int64), ('x', np.float32), ('y', np.float32),
+              ('energy', np.float32), ('reputation', np.float32), ('malicious', np.bool_)),
+    # kind 0 is a keyframe link, 1 a link coming up and -1 a link going down
+    'links': (('tick', np.int64), ('a', np.int64), ('b', np.int64), ('kind', np.int8)),
+    'packets': (('tick', np.int64), ('source', np.int64), ('dest', np.int64), ('status', np.int8), ('hops', np.int64)),
+    'routes': (('tick', np.int64), ('route', np.int64), ('hop', np.int64), ('node', np.int64)),
+}
+FORMATS = {'arrow': '.arrow', 'parquet': '.parquet'}
+# Ticks covered by the recent rates of a replayed frame, as in StreamingMetrics
+WINDOW = 100
+
+
+def _pyarrow():
+    # pyarrow is only needed to record or replay, so it is imported on use
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("recording and replaying runs requires pyarrow") from None
+    return pyarrow
+
+
+def _schema(pa, name):
+    return pa.schema([(column, pa.from_numpy_dtype(np.dtype(dtype))) for column, dtype in SCHEMAS[name]])
+
+
+class TraceRecorder:
+    # Observer that streams every tick of a simulator into one columnar file
+    # per table. Ticks are buffered as numpy arrays and written in chunks of
+    # chunk_ticks, so recording mostly costs a few array copies per tick.
+    # A full link set is written every keyframe_ticks ticks and only link
+    # events in between, which keeps seeking cheap and the files small.
+    def __init__(self, simulator, directory, format='arrow', chunk_ticks=64, keyframe_ticks=None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown trace format '{format}', expected one of {sorted(FORMATS)}")
+        self.pa = _pyarrow()
+        self.simulator = simulator
+        self.directory = directory
+        self.format = format
+        self.chunk_ticks = chunk_ticks
+        self.keyframe_ticks = keyframe_ticks or chunk_ticks
+        self.buffers = {name: [] for name in SCHEMAS}
+        self.writers = {}
+        self.buffered = 0
+        self.ticks = 0
+        self.first_tick = None
+        self.pending_links = ([], [])
+        os.makedirs(directory, exist_ok=True)
+        simulator.manet.link_listeners.append(self._on_link_events)
+        simulator.add_observer(self)
+
+    def _on_link_events(self, link_up, link_down):
+        self.pending_links[0].extend(link_up)
+        self.pending_links[1].extend(link_down)
+
+    def __call__(self, simulator):
+        tick = simulator.tick
+        store = simulator.manet.store
+        rows = store.active_rows()
+        if self.first_tick is None:
+            self.first_tick = tick
+        buffers = self.buffers
+
+        buffers['ticks'].append((np.array([tick]), np.array([simulator.stats.generated]),
+                                 np.array([simulator.stats.delivered]), np.array([simulator.manet.energy.deaths])))
+        buffers['nodes'].append((np.full(len(rows), tick), store.ids[rows], store.x[rows], store.y[rows],
+                                 store.energy[rows], store.reputation[rows], store.malicious[rows]))
+
+        link_up, link_down = self.pending_links
+        self.pending_links = ([], [])
+        if (tick - self.first_tick) % self.keyframe_ticks == 0:
+            links = store.ids[store.links]
+            kind = np.zeros(len(links), dtype=np.int8)
+        else:
+            links = np.array(list(link_down) + list(link_up), dtype=np.int64).reshape(-1, 2)
+            kind = np.concatenate([np.full(len(link_down), -1, dtype=np.int8), np.ones(len(link_up), dtype=np.int8)])
+        buffers['links'].append((np.full(len(links), tick), links[:, 0], links[:, 1], kind))
+
+        batch = simulator.last_batch
+        if batch is not None and len(batch):
+            buffers['packets'].append((np.full(len(batch), tick), store.ids[batch.sources], store.ids[batch.dests],
+                                       batch.status, batch.hops))
+        # The routes on show, i.e. the simulator's rolling window of the last
+        # max_routes delivered paths, which may reach back before this tick
+        paths = simulator.packet_routes
+        if paths:
+            lengths = [len(path) for path in paths]
+            buffers['routes'].append((np.full(sum(lengths), tick), np.repeat(np.arange(len(paths)), lengths),
+                                      np.concatenate([np.arange(n) for n in lengths]),
+                                      np.concatenate([np.asarray(path, dtype=np.int64) for path in paths])))
+
+        self.ticks += 1
+        self.buffered += 1
+        if self.buffered >= self.chunk_ticks:
+            self.flush()
+
+    def flush(self):
+        for name, chunks in self.buffers.items():
+            if chunks:
+                columns = [np.concatenate(parts).astype(dtype) for parts, (_, dtype) in zip(zip(*chunks), SCHEMAS[name])]
+                self._writer(name).write_table(self.pa.Table.from_arrays(columns, schema=_schema(self.pa, name)))
+                chunks.clear()
+        self.buffered = 0
+
+    def _writer(self, name):
+        writer = self.writers.get(name)
+        if writer is None:
+            path = os.path.join(self.directory, name + FORMATS[self.format])
+            schema = _schema(self.pa, name)
+            if self.format == 'arrow':
+                writer = self.pa.ipc.new_file(path, schema)
+            else:
+                writer = self.pa.parquet.ParquetWriter(path, schema)
+            self.writers[name] = writer
+        return writer
+
+    def close(self):
+        self.flush()
+        for name in SCHEMAS:
+            # Tables that never got a row are still written, empty
+            self._writer(name).close()
+        self.writers = {}
+        self.simulator.remove_observer(self)
+        self.simulator.manet.link_listeners.remove(self._on_link_events)
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as f:
+            json.dump({
+                'format': self.format,
+                'first_tick': self.first_tick,
+                'ticks': self.ticks,
+                'keyframe_ticks': self.keyframe_ticks,
+                'area_size': self.simulator.manet.store.area_size,
+            }, f)
+
+
+class TraceReader:
+    # Random access to a recorded run. Arrow files are memory-mapped, so
+    # opening a run only reads the tick columns used for indexing; each
+    # frame then touches just its own slice of the tables.
+    def __init__(self, directory):
+        pa = _pyarrow()
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.area_size = self.meta['area_size']
+        self.keyframe_ticks = self.meta['keyframe_ticks']
+        self.tables = {}
+        for name in SCHEMAS:
+            path = os.path.join(directory, name + FORMATS[self.meta['format']])
+            if self.meta['format'] == 'arrow':
+                self.tables[name] = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            else:
+                self.tables[name] = pa.parquet.read_table(path, memory_map=True)
+        self.tick_columns = {name: table.column('tick').to_numpy() for name, table in self.tables.items()}
+        self.ticks = self.tick_columns['ticks']
+        links = self.tables['links']
+        self.link_kind = links.column('kind').to_numpy()
+        self.keyframes = np.unique(self.tick_columns['links'][self.link_kind == 0])
+
+    def __len__(self):
+        return len(self.ticks)
+
+    @property
+    def first_tick(self):
+        return int(self.ticks[0]) if len(self.ticks) else 0
+
+    @property
+    def last_tick(self):
+        return int(self.ticks[-1]) if len(self.ticks) else 0
+
+    def rows(self, name, start, stop=None):
+        # Slice of table `name` for ticks in [start, stop] as numpy columns
+        ticks = self.tick_columns[name]
+        lo = np.searchsorted(ticks, start, side='left')
+        hi = np.searchsorted(ticks, start if stop is None else stop, side='right')
+        part = self.tables[name].slice(lo, hi - lo)
+        return {column: part.column(column).to_numpy() for column, _ in SCHEMAS[name]}
+
+    def links(self, tick):
+        # Link set at the end of `tick`: the last keyframe plus the final
+        # event of every link that changed since
+        before = self.keyframes[self.keyframes <= tick]
+        if not len(before):
+            return np.empty((0, 2), dtype=np.int64)
+        keyframe = int(before[-1])
+        frame = self.rows('links', keyframe)
+        keep = frame['kind'] == 0
+        current = set(zip(frame['a'][keep].tolist(), frame['b'][keep].tolist()))
+        if tick > keyframe:
+            events = self.rows('links', keyframe + 1, tick)
+            for a, b, kind in zip(events['a'].tolist(), events['b'].tolist(), events['kind'].tolist()):
+                link = (min(a, b), max(a, b))
+                if kind > 0:
+                    current.add(link)
+                else:
+                    current.discard(link)
+        return np.array(sorted(current), dtype=np.int64).reshape(-1, 2)
+
+    def routes(self, tick):
+        rows = self.rows('routes', tick)
+        order = np.lexsort((rows['hop'], rows['route']))
+        route, node = rows['route'][order], rows['node'][order]
+        bounds = np.flatnonzero(np.diff(route)) + 1
+        return tuple(tuple(part.tolist()) for part in np.split(node, bounds) if len(part))
+
+    def recent(self, tick, window=WINDOW):
+        # Delivery ratio, throughput and 90th percentile hop count over the
+        # `window` ticks up to `tick`. The tick table is cumulative, so the
+        # rates are a difference of two rows.
+        summary = self.rows('ticks', tick - window + 1, tick)
+        if not len(summary['tick']):
+            return 0.0, 0.0, float('nan')
+        generated = int(summary['generated'][-1])
+        delivered = int(summary['delivered'][-1])
+        before = self.rows('ticks', tick - window)
+        if len(before['tick']):
+            generated -= int(before['generated'][0])
+            delivered -= int(before['delivered'][0])
+        packets = self.rows('packets', tick - window + 1, tick)
+        hops = packets['hops'][packets['status'] == DELIVERED]
+        return (delivered / generated * 100 if generated else 0.0, delivered / len(summary['tick']),
+                float(np.percentile(hops, 90)) if len(hops) else float('nan'))
+
+    def frame(self, tick):
+        # Snapshot of `tick` in the same shape the live pipeline produces
+        nodes = self.rows('nodes', tick)
+        summary = self.rows('ticks', tick)
+        generated = int(summary['generated'][0]) if len(summary['tick']) else 0
+        delivered = int(summary['delivered'][0]) if len(summary['tick']) else 0
+        routes = self.routes(tick)
+        energy = nodes['energy'].astype(float)
+        recent_success_rate, throughput, hops_p90 = self.recent(tick)
+        stats = {
+            'nodes': len(nodes['id']),
+            'malicious': int(nodes['malicious'].sum()),
+            'success_rate': delivered / generated * 100 if generated else 0.0,
+            'recent_success_rate': recent_success_rate,
+            'throughput': throughput,
+            'hops_p90': hops_p90,
+            # Packet latency is not recorded
+            'latency_p90': float('nan'),
+            'active_routes': len(routes),
+            'avg_energy': float(energy.mean()) if len(energy) else 0.0,
+            'dead': int(summary['dead'][0]) if len(summary['tick']) else 0,
+            'metrics': None,
+        }
+        return Snapshot(
+            tick=tick,
+            ids=nodes['id'],
+            x=nodes['x'].astype(float),
+            y=nodes['y'].astype(float),
+            energy=energy,
+            reputation=nodes['reputation'].astype(float),
+            malicious=nodes['malicious'],
+            links=self.links(tick),
+            # Frames can be read in any order, so the changes since the one
+            # drawn before are unknown and the renderer rescans the links
+            link_up=None,
+            link_down=None,
+            routes=routes,
+            stats=stats,
+            area_size=self.area_size,
+            counters=None
+        )
@@ -0,0 +1,472 @@
+import numpy as np
+
+MARGIN = 20
+MIN_ZOOM = 1.0
+MAX_ZOOM = 500.0
+
+
+def _blend(low, high, t):
+    low = [int(low[i:i + 2], 16) for i in (1, 3, 5)]
+    high = [int(high[i:i + 2], 16) for i in (1, 3, 5)]
+    return '#' + ''.join(f"{round(a + (b - a) * t):02x}" for a, b in zip(low, high))
+
+
+class PickIndex:
+    # Uniform grid over one frame's node positions for nearest-node queries,
+    # so a click only looks at the nodes in the cells around it
+    def __init__(self, xs, ys, cell):
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.cell = cell
+        keys = self._keys(np.floor(self.xs / cell), np.floor(self.ys / cell))
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    @staticmethod
+    def _keys(cx, cy):
+        return (cx.astype(np.int64) << 32) + cy.astype(np.int64)
+
+    def nearest(self, x, y, radius):
+        # Index of the closest node within `radius` of (x, y), or None
+        reach = int(np.ceil(radius / self.cell))
+        cx, cy = np.floor(x / self.cell), np.floor(y / self.cell)
+        offsets = np.arange(-reach, reach + 1)
+        keys = self._keys(cx + np.repeat(offsets, len(offsets)), cy + np.tile(offsets, len(offsets)))
+        lo = np.searchsorted(self.sorted_keys, keys, side='left')
+        hi = np.searchsorted(self.sorted_keys, keys, side='right')
+        if not (hi - lo).any():
+            return None
+        candidates = self.order[np.concatenate([np.arange(a, b) for a, b in zip(lo.tolist(), hi.tolist())])]
+        d2 = (self.xs[candidates] - x) ** 2 + (self.ys[candidates] - y) ** 2
+        best = int(np.argmin(d2))
+        return int(candidates[best]) if d2[best] <= radius * radius else None
+
+
+class NetworkRenderer:
+    # Retained-mode drawing of the network on a Tk canvas with zoom, pan and
+    # level of detail. Canvas items are created once per visible node and
+    # link and then moved or restyled in place; nodes and links outside the
+    # viewport have no items at all. Each frame picks a level of detail from
+    # the number of visible nodes:
+    #
+    #   detail   nodes with label, energy and reputation arcs, dashed links
+    #   simple   small plain dots and solid links
+    #   heatmap  nodes aggregated into tiles shaded by how many they hold
+    #
+    # Routes and the selected node are drawn at every level. Links are
+    # added and removed from each frame's link events; the whole link set is
+    # only scanned again when the view changes or frames were lost.
+    def __init__(self, canvas, colors, node_radius, detail_limit=400, node_limit=4000, tile_size=16):
+        self.canvas = canvas
+        self.colors = colors
+        self.node_radius = node_radius
+        self.detail_limit = detail_limit
+        self.node_limit = node_limit
+        self.tile_size = tile_size
+        self.width = max(canvas.winfo_width(), 1)
+        self.height = max(canvas.winfo_height(), 1)
+        self.node_items = {}
+        self.node_state = {}
+        self.edge_items = {}
+        self.edge_coords = {}
+        self.edge_arrays = None
+        self.shown_ids = np.zeros(0, dtype=np.int64)
+        self.rescan = True
+        self.last_snapshot = None
+        self.route_items = []
+        self.tile_items = []
+        self.tile_state = []
+        self.marker = None
+        self.screen = {}
+        self.lod = None
+        self.area_size = 100.0
+        self.zoom = 1.0
+        self.center = None
+        self.items_created = 0
+        self.visible = 0
+        self.palettes = {
+            False: [_blend('#1f2f3f', colors['normal_node'], t) for t in np.linspace(0.15, 1, 16)],
+            True: [_blend('#3f1f1f', colors['malicious_node'], t) for t in np.linspace(0.15, 1, 16)],
+        }
+        canvas.bind('<Configure>', self.on_configure, add='+')
+
+    def on_configure(self, event):
+        if (event.width, event.height) != (self.width, self.height):
+            self.width = max(event.width, 1)
+            self.height = max(event.height, 1)
+            # Every item has to move, so forget the cached screen positions
+            self.invalidate()
+
+    def _scale(self):
+        # Pixels per world unit along x and y
+        return ((self.width - 2 * MARGIN) / self.area_size * self.zoom,
+                (self.height - 2 * MARGIN) / self.area_size * self.zoom)
+
+    def _center(self):
+        if self.center is None:
+            return self.area_size / 2, self.area_size / 2
+        return self.center
+
+    def to_screen(self, x, y):
+        kx, ky = self._scale()
+        cx, cy = self._center()
+        x = (np.asarray(x, dtype=float) - cx) * kx + self.width / 2
+        y = (np.asarray(y, dtype=float) - cy) * ky + self.height / 2
+        return x, y
+
+    def to_world(self, sx, sy):
+        kx, ky = self._scale()
+        cx, cy = self._center()
+        return (sx - self.width / 2) / max(kx, 1e-12) + cx, (sy - self.height / 2) / max(ky, 1e-12) + cy
+
+    def zoom_at(self, sx, sy, factor):
+        # Zoom by `factor` keeping the world point under (sx, sy) in place
+        wx, wy = self.to_world(sx, sy)
+        self.zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        kx, ky = self._scale()
+        self.center = (wx - (sx - self.width / 2) / kx, wy - (sy - self.height / 2) / ky)
+        self.invalidate()
+
+    def pan(self, dx, dy):
+        # Move the view by (dx, dy) screen pixels
+        kx, ky = self._scale()
+        cx, cy = self._center()
+        self.center = (cx - dx / kx, cy - dy / ky)
+        self.invalidate()
+
+    def reset_view(self):
+        self.zoom = 1.0
+        self.center = None
+        self.invalidate()
+
+    def pick_radius(self):
+        # Click tolerance in world units
+        return max(self.node_radius, 6) / min(self._scale())
+
+    def render_snapshot(self, snapshot, selected=None, skipped=()):
+        # `skipped` are the frames published since the last one drawn, whose
+        # link events still have to be applied. Redrawing the same snapshot
+        # applies nothing; unknown events (None) force a rescan.
+        if snapshot is self.last_snapshot:
+            link_events = []
+        else:
+            frames = list(skipped) + [snapshot]
+            link_events = None
+            if all(frame.link_up is not None for frame in frames):
+                link_events = [(frame.link_up, frame.link_down) for frame in frames]
+        self.last_snapshot = snapshot
+        self.render(
+            snapshot.ids,
+            snapshot.x, snapshot.y,
+            snapshot.energy, snapshot.reputation, snapshot.malicious,
+            links=snapshot.links,
+            routes=snapshot.routes,
+            selected=selected,
+            area_size=snapshot.area_size,
+            link_events=link_events
+        )
+
+    def render(self, ids, xs, ys, energy, reputation, malicious, links=(), routes=(), selected=None,
+               area_size=100.0, link_events=None):
+        # link_events: (link_up, link_down) per frame since the last render,
+        # or None to rescan `links`
+        if area_size != self.area_size:
+            self.area_size = area_size
+            self.invalidate()
+
+        ids = np.asarray(ids, dtype=np.int64)
+        malicious = np.asarray(malicious, dtype=bool)
+        sx, sy = self.to_screen(xs, ys)
+        pad = self.node_radius + 8
+        visible = (sx >= -pad) & (sx <= self.width + pad) & (sy >= -pad) & (sy <= self.height + pad)
+        shown = np.flatnonzero(visible)
+        self.visible = len(shown)
+
+        if len(shown) <= self.detail_limit:
+            lod = 'detail'
+        elif len(shown) <= self.node_limit:
+            lod = 'simple'
+        else:
+            lod = 'heatmap'
+        if lod != self.lod:
+            self._clear()
+            self.lod = lod
+
+        order = np.argsort(ids, kind='stable')
+        if lod == 'heatmap':
+            self._update_tiles(sx[shown], sy[shown], malicious[shown])
+        else:
+            self._update_nodes(ids[shown], sx[shown], sy[shown], np.asarray(energy)[shown],
+                               np.asarray(reputation)[shown], malicious[shown], selected)
+            self._update_edges(ids, order, sx, sy, visible, links, link_events)
+
+        self._update_routes(routes, ids, order, sx, sy)
+        self._update_marker(selected, ids, order, sx, sy)
+
+        self.canvas.tag_raise('route')
+        self.canvas.tag_raise('node')
+        self.canvas.tag_raise('marker')
+
+    def _locate(self, ids, order, wanted):
+        # Positions in `ids` of the node ids in `wanted`, -1 where missing
+        wanted = np.asarray(wanted, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(wanted), -1, dtype=np.int64)
+        at = np.minimum(np.searchsorted(ids, wanted, sorter=order), len(ids) - 1)
+        index = order[at]
+        return np.where(ids[index] == wanted, index, -1)
+
+    def _clear(self):
+        for node_id in list(self.node_items):
+            self._remove_node(node_id)
+        for link in list(self.edge_items):
+            self._remove_edge(link)
+        self.rescan = True
+        for i, item in enumerate(self.tile_items):
+            if self.tile_state[i] is not None:
+                self.canvas.itemconfig(item, state='hidden')
+                self.tile_state[i] = None
+
+    def _update_nodes(self, ids, sx, sy, energy, reputation, malicious, selected):
+        current = set(ids.tolist())
+        for node_id in [n for n in self.node_items if n not in current]:
+            self._remove_node(node_id)
+
+        for node_id, x, y, e, rep, bad in zip(ids.tolist(), sx.tolist(), sy.tolist(), energy.tolist(),
+                                              reputation.tolist(), malicious.tolist()):
+            if node_id not in self.node_items:
+                self._create_node(node_id)
+            old = self.screen.get(node_id)
+            if old is None or abs(old[0] - x) >= 0.5 or abs(old[1] - y) >= 0.5:
+                self.screen[node_id] = (x, y)
+                self._move_node(node_id, x, y)
+            self._style_node(node_id, e, rep, bad, node_id == selected)
+
+    def _create_node(self, node_id):
+        canvas = self.canvas
+        if self.lod == 'simple':
+            items = {'oval': canvas.create_oval(0, 0, 0, 0, width=0, tags=('node',))}
+        else:
+            items = {
+                'energy': canvas.create_arc(0, 0, 0, 0, start=0, extent=0, style='arc',
+                                            outline='#4CAF50', width=2, tags=('node',)),
+                'oval': canvas.create_oval(0, 0, 0, 0, outline='white', width=2, tags=('node',)),
+                'text': canvas.create_text(0, 0, text=str(node_id), fill=self.colors['text'],
+                                           font=('Helvetica', 9, 'bold'), tags=('node',)),
+                'reputation': canvas.create_arc(0, 0, 0, 0, start=0, extent=0, style='arc',
+                                                outline='#2196F3', width=2, tags=('node',)),
+            }
+        self.items_created += len(items)
+        self.node_items[node_id] = items
+        self.node_state[node_id] = {}
+
+    def _remove_node(self, node_id):
+        for item in self.node_items.pop(node_id).values():
+            self.canvas.delete(item)
+        self.node_state.pop(node_id, None)
+        self.screen.pop(node_id, None)
+
+    def _move_node(self, node_id, x, y):
+        items = self.node_items[node_id]
+        if self.lod == 'simple':
+            r = max(2.0, min(self.node_radius / 3, self.node_radius * self.zoom / 8))
+            self.canvas.coords(items['oval'], x - r, y - r, x + r, y + r)
+            return
+        r = self.node_radius
+        self.canvas.coords(items['oval'], x - r, y - r, x + r, y + r)
+        self.canvas.coords(items['text'], x, y)
+        r = self.node_radius + 4
+        self.canvas.coords(items['energy'], x - r, y - r, x + r, y + r)
+        r = self.node_radius + 8
+        self.canvas.coords(items['reputation'], x - r, y - r, x + r, y + r)
+
+    def _style_node(self, node_id, energy, reputation, malicious, selected):
+        items = self.node_items[node_id]
+        state = self.node_state[node_id]
+
+        color = self.colors['malicious_node'] if malicious else self.colors['normal_node']
+        if selected:
+            color = self.colors['selected_node']
+        if state.get('color') != color:
+            self.canvas.itemconfig(items['oval'], fill=color)
+            state['color'] = color
+        if self.lod == 'simple':
+            return
+
+        # Arc extents only change when they moved by at least a degree
+        energy_angle = round(energy * 3.6)
+        if state.get('energy') != energy_angle:
+            self.canvas.itemconfig(items['energy'], extent=min(energy_angle, 359.9))
+            state['energy'] = energy_angle
+
+        rep_angle = round(reputation * 360)
+        if state.get('reputation') != rep_angle:
+            self.canvas.itemconfig(items['reputation'], extent=min(rep_angle, 359.9))
+            state['reputation'] = rep_angle
+
+    def _update_edges(self, ids, order, sx, sy, visible, links, link_events):
+        # Links with at least one visible end; the far end may lie outside
+        links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+        shown_ids = ids[visible]
+        if self.rescan or link_events is None:
+            self.rescan = False
+            pending = set(map(tuple, np.sort(links, axis=1).tolist()))
+            for link in [link for link in self.edge_items if link not in pending]:
+                self._remove_edge(link)
+        else:
+            # Events apply in order, so a link that came up and went down
+            # again between two renders is never drawn
+            pending = set()
+            for link_up, link_down in link_events:
+                for a, b in link_down:
+                    link = (min(a, b), max(a, b))
+                    pending.discard(link)
+                    self._remove_edge(link)
+                for a, b in link_up:
+                    pending.add((min(a, b), max(a, b)))
+            # Nodes that came into or left the view gain or lose their links
+            changed = np.setxor1d(shown_ids, self.shown_ids)
+            if len(changed):
+                touching = np.isin(links[:, 0], changed) | np.isin(links[:, 1], changed)
+                pending.update(map(tuple, np.sort(links[touching], axis=1).tolist()))
+        self.shown_ids = shown_ids
+
+        if pending:
+            pairs = np.array(sorted(pending), dtype=np.int64)
+            a = self._locate(ids, order, pairs[:, 0])
+            b = self._locate(ids, order, pairs[:, 1])
+            keep = (a >= 0) & (b >= 0)
+            keep[keep] = visible[a[keep]] | visible[b[keep]]
+            for link, wanted in zip(map(tuple, pairs.tolist()), keep.tolist()):
+                if not wanted:
+                    self._remove_edge(link)
+                elif link not in self.edge_items:
+                    self._create_edge(link)
+        self._move_edges(ids, order, sx, sy)
+
+    def _create_edge(self, link):
+        # Dashes are costly to draw, so only the detail level has them
+        style = {'dash': (4, 4)} if self.lod == 'detail' else {}
+        self.edge_items[link] = self.canvas.create_line(0, 0, 0, 0, fill=self.colors['connection'], width=1,
+                                                        tags=('edge',), **style)
+        self.edge_coords[link] = None
+        self.edge_arrays = None
+        self.items_created += 1
+
+    def _move_edges(self, ids, order, sx, sy):
+        # Move the drawn links whose ends moved, with array maths over arrays
+        # that are only rebuilt when links were added or removed
+        if not self.edge_items:
+            return
+        if self.edge_arrays is None:
+            links = list(self.edge_items)
+            self.edge_arrays = (
+                links,
+                np.array(links, dtype=np.int64).reshape(-1, 2),
+                list(self.edge_items.values()),
+                np.array([self.edge_coords[link] or (np.nan,) * 4 for link in links], dtype=float).reshape(-1, 4)
+            )
+        links, pairs, items, drawn = self.edge_arrays
+        a = self._locate(ids, order, pairs[:, 0])
+        b = self._locate(ids, order, pairs[:, 1])
+        # A link whose end is gone stays put until its link_down arrives
+        present = np.flatnonzero((a >= 0) & (b >= 0))
+        a, b = a[present], b[present]
+        coords = np.round(np.stack([sx[a], sy[a], sx[b], sy[b]], axis=1), 1)
+        moved = (coords != drawn[present]).any(axis=1)
+        for i, xy in zip(present[moved].tolist(), coords[moved].tolist()):
+            self.canvas.coords(items[i], *xy)
+            self.edge_coords[links[i]] = tuple(xy)
+        drawn[present[moved]] = coords[moved]
+
+    def _remove_edge(self, link):
+        item = self.edge_items.pop(link, None)
+        if item is not None:
+            self.canvas.delete(item)
+            self.edge_coords.pop(link, None)
+            self.edge_arrays = None
+
+    def _update_tiles(self, sx, sy, malicious):
+        # Visible nodes binned into screen tiles from a reused pool of
+        # rectangles, shaded by log node count; tiles where most nodes are
+        # malicious use the malicious palette
+        size = self.tile_size
+        cols = int(self.width // size) + 1
+        rows = int(self.height // size) + 1
+        cx = np.clip((sx // size).astype(np.int64), 0, cols - 1)
+        cy = np.clip((sy // size).astype(np.int64), 0, rows - 1)
+        cells = cy * cols + cx
+        counts = np.bincount(cells, minlength=cols * rows)
+        bad = np.bincount(cells, weights=malicious, minlength=cols * rows)
+        used = np.flatnonzero(counts)
+        if len(used):
+            level = np.log1p(counts[used]) / np.log1p(counts[used].max())
+            shade = np.minimum((level * 15).round().astype(np.int64), 15)
+            hostile = bad[used] * 2 > counts[used]
+        else:
+            shade = hostile = used
+
+        canvas = self.canvas
+        while len(self.tile_items) < len(used):
+            self.tile_items.append(canvas.create_rectangle(0, 0, 0, 0, width=0, state='hidden', tags=('tile',)))
+            self.tile_state.append(None)
+            self.items_created += 1
+        for i, (cell, s, h) in enumerate(zip(used.tolist(), shade.tolist(), hostile.tolist())):
+            x, y = (cell % cols) * size, (cell // cols) * size
+            state = (x, y, self.palettes[h][s])
+            if self.tile_state[i] != state:
+                item = self.tile_items[i]
+                if self.tile_state[i] is None or self.tile_state[i][:2] != state[:2]:
+                    canvas.coords(item, x, y, x + size, y + size)
+                canvas.itemconfig(item, fill=state[2], state='normal')
+                self.tile_state[i] = state
+        for i in range(len(used), len(self.tile_items)):
+            if self.tile_state[i] is not None:
+                canvas.itemconfig(self.tile_items[i], state='hidden')
+                self.tile_state[i] = None
+
+    def _update_routes(self, routes, ids, order, sx, sy):
+        # Route segments come from a small pool of reused line items
+        segments = []
+        for path in routes:
+            index = self._locate(ids, order, path).tolist()
+            for a, b in zip(index, index[1:]):
+                if a >= 0 and b >= 0:
+                    segments.append((sx[a], sy[a], sx[b], sy[b]))
+        canvas = self.canvas
+        while len(self.route_items) < len(segments):
+            self.route_items.append(canvas.create_line(
+                0, 0, 0, 0,
+                fill=self.colors['active_route'],
+                width=2,
+                tags=('route',)
+            ))
+            self.items_created += 1
+        for item, xy in zip(self.route_items, segments):
+            canvas.coords(item, *xy)
+            canvas.itemconfig(item, state='normal')
+        for item in self.route_items[len(segments):]:
+            canvas.itemconfig(item, state='hidden')
+
+    def _update_marker(self, selected, ids, order, sx, sy):
+        # Ring around the selected node, so it stays findable at any level
+        canvas = self.canvas
+        index = self._locate(ids, order, [selected])[0] if selected is not None else -1
+        if index < 0:
+            if self.marker is not None:
+                canvas.itemconfig(self.marker, state='hidden')
+            return
+        if self.marker is None:
+            self.marker = canvas.create_oval(0, 0, 0, 0, outline=self.colors['selected_node'], width=2,
+                                             tags=('marker',))
+            self.items_created += 1
+        r = self.node_radius + 12
+        x, y = sx[index], sy[index]
+        canvas.coords(self.marker, x - r, y - r, x + r, y + r)
+        canvas.itemconfig(self.marker, state='normal')
+
+    def invalidate(self):
+        # Force every visible item to be repositioned and the links to be
+        # rescanned on the next frame
+        self.screen = {}
+        self.rescan = True
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class ReputationEngine:
+    # Beta-distribution trust per store row. Watchdog observations (a relay
+    # seen forwarding or dropping a packet by the node that handed it over)
+    # are accumulated during a tick and folded in by one vectorised update:
+    #
+    #   alpha = decay * alpha + forwarded
+    #   beta  = decay * beta  + dropped
+    #   reputation = (alpha + prior_alpha) / (alpha + beta + prior_alpha + prior_beta)
+    #
+    # The default prior has no failures, so nodes start fully trusted as
+    # before and old evidence fades so nodes can redeem themselves.
+    def __init__(self, store, decay=0.98, prior_alpha=4.0, prior_beta=0.0, trust_threshold=0.5):
+        self.store = store
+        self.decay = decay
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.trust_threshold = trust_threshold
+        self.alpha = np.zeros(0)
+        self.beta = np.zeros(0)
+        self.pending_forwarded = np.zeros(0)
+        self.pending_dropped = np.zeros(0)
+        self._fit()
+
+    def _fit(self):
+        capacity = self.store.capacity
+        if len(self.alpha) < capacity:
+            extra = capacity - len(self.alpha)
+            self.alpha = np.concatenate([self.alpha, np.zeros(extra)])
+            self.beta = np.concatenate([self.beta, np.zeros(extra)])
+            self.pending_forwarded = np.concatenate([self.pending_forwarded, np.zeros(extra)])
+            self.pending_dropped = np.concatenate([self.pending_dropped, np.zeros(extra)])
+
+    def observe(self, relays, forwarded):
+        relays = np.asarray(relays, dtype=np.int64)
+        if not len(relays):
+            return
+        self._fit()
+        forwarded = np.asarray(forwarded, dtype=bool)
+        capacity = len(self.alpha)
+        self.pending_forwarded += np.bincount(relays[forwarded], minlength=capacity)
+        self.pending_dropped += np.bincount(relays[~forwarded], minlength=capacity)
+
+    def update(self, rows=None):
+        # With `rows` only those take in their evidence and decay; the others
+        # keep their trust and pending observations
+        self._fit()
+        if rows is None:
+            self.alpha *= self.decay
+            self.beta *= self.decay
+            self.alpha += self.pending_forwarded
+            self.beta += self.pending_dropped
+            self.pending_forwarded[:] = 0
+            self.pending_dropped[:] = 0
+            rows = self.store.active_rows()
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            self.alpha[rows] = self.decay * self.alpha[rows] + self.pending_forwarded[rows]
+            self.beta[rows] = self.decay * self.beta[rows] + self.pending_dropped[rows]
+            self.pending_forwarded[rows] = 0
+            self.pending_dropped[rows] = 0
+            rows = rows[self.store.alive[rows]]
+        self.store.reputation[rows] = ((self.alpha[rows] + self.prior_alpha)
+                                       / (self.alpha[rows] + self.beta[rows] + self.prior_alpha + self.prior_beta))
+
+    def evidence(self, rows):
+        # Decayed (alpha, beta) of rows, e.g. to move a node's trust along
+        # with it; set_evidence puts it back
+        self._fit()
+        return self.alpha[rows], self.beta[rows]
+
+    def set_evidence(self, rows, alpha, beta):
+        self._fit()
+        self.alpha[rows] = alpha
+        self.beta[rows] = beta
+
+    def take_pending(self, rows):
+        # Pending (forwarded, dropped) counts of rows, cleared here, so the
+        # evidence can be handed to wherever those nodes are updated
+        self._fit()
+        forwarded, dropped = self.pending_forwarded[rows], self.pending_dropped[rows]
+        self.pending_forwarded[rows] = 0
+        self.pending_dropped[rows] = 0
+        return forwarded, dropped
+
+    def add_pending(self, rows, forwarded, dropped):
+        self._fit()
+        np.add.at(self.pending_forwarded, rows, forwarded)
+        np.add.at(self.pending_dropped, rows, dropped)
+
+    def trusted(self):
+        # Mask over store rows of nodes routing may use as relays
+        return self.store.alive & (self.store.reputation >= self.trust_threshold)
+
+    def forget(self, rows):
+        self._fit()
+        self.alpha[rows] = 0
+        self.beta[rows] = 0
+        self.pending_forwarded[rows] = 0
+        self.pending_dropped[rows] = 0
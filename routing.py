@@ -0,0 +1,218 @@
+import heapq
+import math
+from collections import deque
+
+from qlearning import MIN_LINK_PROBABILITY
+
+
+class RouteCache:
+    # Memoised routes per (source, dest), indexed by the links and nodes they
+    # use so topology events only evict the routes they can affect.
+    def __init__(self, max_age=10):
+        self.max_age = max_age
+        self.tick = 0
+        self.routes = {}
+        self.by_link = {}
+        self.by_node = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, dest):
+        entry = self.routes.get((source, dest))
+        if entry is None or self.tick - entry[1] > self.max_age:
+            if entry is not None:
+                self._evict((source, dest))
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, source, dest, path, reached=()):
+        key = (source, dest)
+        self._evict(key)
+        if path is None:
+            # An unreachable pair is indexed by the nodes its search reached
+            self.routes[key] = (None, self.tick, tuple(reached))
+            for node in reached:
+                self.by_node.setdefault(node, set()).add(key)
+            return
+        self.routes[key] = (path, self.tick)
+        for node in path:
+            self.by_node.setdefault(node, set()).add(key)
+        for a, b in zip(path, path[1:]):
+            self.by_link.setdefault((min(a, b), max(a, b)), set()).add(key)
+
+    def on_link_events(self, link_up, link_down):
+        # Only a lost link breaks a cached route. A new link may offer a
+        # shorter one, but under mobility nearly every node gains a link
+        # every tick, so cached routes are kept and max_age bounds how long
+        # they can miss a better path.
+        self.tick += 1
+        for link in link_down:
+            for key in list(self.by_link.get(link, ())):
+                self._evict(key)
+        # A new link can only connect an unreachable pair if it leaves the
+        # part of the network the pair's search reached
+        for a, b in link_up:
+            for key in self.by_node.get(a, set()) ^ self.by_node.get(b, set()):
+                entry = self.routes.get(key)
+                if entry is not None and entry[0] is None:
+                    self._evict(key)
+
+    def invalidate_node(self, node):
+        for key in list(self.by_node.get(node, ())):
+            self._evict(key)
+
+    def clear(self):
+        self.routes.clear()
+        self.by_link.clear()
+        self.by_node.clear()
+
+    def _evict(self, key):
+        entry = self.routes.pop(key, None)
+        if entry is None:
+            return
+        path = entry[0]
+        for node in path if path is not None else entry[2]:
+            keys = self.by_node.get(node)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_node[node]
+        if path is None:
+            return
+        for a, b in zip(path, path[1:]):
+            link = (min(a, b), max(a, b))
+            keys = self.by_link.get(link)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_link[link]
+
+
+class Router:
+    ALGORITHMS = ('bfs', 'dijkstra', 'astar')
+
+    def __init__(self, manet, algorithm='astar', energy_weight=1.0, reputation_weight=2.0,
+                 cache=True, max_age=10, link_weight=1.0):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown routing algorithm '{algorithm}', expected one of {self.ALGORITHMS}")
+        self.manet = manet
+        self.algorithm = algorithm
+        self.energy_weight = energy_weight
+        self.reputation_weight = reputation_weight
+        self.link_weight = link_weight
+        self.cache = RouteCache(max_age) if cache else None
+        self.expanded = 0
+        # Rows reached by the last search that did not find its destination
+        self.reached = []
+
+    def on_link_events(self, link_up, link_down):
+        if self.cache is not None:
+            self.cache.on_link_events(link_up, link_down)
+
+    def find_path(self, source, dest):
+        if source not in self.manet.nodes or dest not in self.manet.nodes:
+            return None
+        if self.cache is not None:
+            path = self.cache.get(source, dest)
+            if path is not None and all(self._usable(self.manet.nodes[n].row) for n in path[1:-1]):
+                return path
+            if path is None and (source, dest) in self.cache.routes:
+                return None
+
+        store = self.manet.store
+        path = self.find_row_path(self.manet.nodes[source].row, self.manet.nodes[dest].row)
+        if path is not None:
+            path = store.ids[path].tolist()
+        if self.cache is not None:
+            self.cache.put(source, dest, path, store.ids[self.reached].tolist() if path is None else ())
+        return path
+
+    def find_row_path(self, source, dest, algorithm=None):
+        algorithm = algorithm or self.algorithm
+        if source == dest:
+            return [source]
+        if algorithm == 'bfs':
+            return self._bfs(source, dest)
+        return self._search(source, dest, heuristic=(algorithm == 'astar'))
+
+    def edge_cost(self, u, v, distance):
+        # Longer hops, drained relays and low-reputation relays cost more. The
+        # energy term grows with the inverse of the residual battery, so
+        # traffic moves off nodes well before they run dry. With a radio
+        # model, lossy links add their expected retransmissions.
+        store = self.manet.store
+        cost = (distance / self.manet.transmission_range
+                + self.energy_weight * (100.0 / max(float(store.energy[v]), 1.0) - 1.0)
+                + self.reputation_weight * (1.0 - store.reputation[v]))
+        radio = self.manet.radio
+        if radio is not None:
+            cost += self.link_weight * (1.0 / max(radio.estimate(distance, v), MIN_LINK_PROBABILITY) - 1.0)
+        return cost
+
+    def _usable(self, row):
+        # Relays must be trusted by the reputation engine; endpoints need not
+        return self.manet.store.reputation[row] >= self.manet.reputation.trust_threshold
+
+    def _bfs(self, source, dest):
+        store = self.manet.store
+        indptr, indices = store.indptr, store.indices
+        parent = {source: source}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            self.expanded += 1
+            for nxt in indices[indptr[current]:indptr[current + 1]].tolist():
+                if nxt in parent or (nxt != dest and not self._usable(nxt)):
+                    continue
+                parent[nxt] = current
+                if nxt == dest:
+                    return self._unwind(parent, dest)
+                queue.append(nxt)
+        self.reached = list(parent)
+        return None
+
+    def _search(self, source, dest, heuristic):
+        store = self.manet.store
+        indptr, indices = store.indptr, store.indices
+        x, y = store.xy[0], store.xy[1]
+        r = float(self.manet.transmission_range)
+        dx, dy = float(x[dest]), float(y[dest])
+
+        def estimate(row):
+            # Every hop costs at least its length over the range, so the
+            # straight-line distance is admissible
+            return math.hypot(float(x[row]) - dx, float(y[row]) - dy) / r if heuristic else 0.0
+
+        best = {source: 0.0}
+        parent = {source: source}
+        frontier = [(estimate(source), 0.0, source)]
+        done = set()
+        while frontier:
+            _, cost, current = heapq.heappop(frontier)
+            if current in done:
+                continue
+            if current == dest:
+                return self._unwind(parent, dest)
+            done.add(current)
+            self.expanded += 1
+            cx, cy = float(x[current]), float(y[current])
+            for nxt in indices[indptr[current]:indptr[current + 1]].tolist():
+                if nxt in done or (nxt != dest and not self._usable(nxt)):
+                    continue
+                step = self.edge_cost(current, nxt, math.hypot(float(x[nxt]) - cx, float(y[nxt]) - cy))
+                new_cost = cost + step
+                if new_cost < best.get(nxt, math.inf):
+                    best[nxt] = new_cost
+                    parent[nxt] = current
+                    heapq.heappush(frontier, (new_cost + estimate(nxt), new_cost, nxt))
+        self.reached = list(parent)
+        return None
+
+    def _unwind(self, parent, dest):
+        path = [dest]
+        while parent[path[-1]] != path[-1]:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
@@ -0,0 +1,374 @@
+import time
+
+import numpy as np
+
+from events import EventScheduler
+from forwarding import PathForwarder, relay_outcome
+from manet import MANET
+from metrics import StreamingMetrics
+from mobility import RandomJitter, RandomWaypoint
+from profiling import Instrumentation
+from traffic import DELIVERED, DROPPED, IN_FLIGHT, ConstantBitrateTraffic, PacketBatch, TrafficStats
+
+
+class Simulator:
+    # Headless simulation core: mobility, energy accounting, topology and packet
+    # routing, one tick per step(). Observers are called after every tick
+    # with the simulator, e.g. to redraw a visualizer.
+    def __init__(self, manet=None, num_nodes=15, malicious_ratio=0.1, seed=None,
+                 mobility_step=2.0, energy_drain=0.01, max_routes=5, traffic=None, forwarder=None,
+                 mobility=None):
+        self.manet = manet if manet is not None else MANET(num_nodes=num_nodes, malicious_ratio=malicious_ratio, seed=seed)
+        self.rng = self.manet.store.rng
+        self.mobility_step = mobility_step
+        self.mobility = mobility if mobility is not None else RandomJitter(mobility_step)
+        self.energy_drain = energy_drain
+        self.max_routes = max_routes
+        self.traffic = traffic if traffic is not None else ConstantBitrateTraffic(1)
+        self.forwarder = forwarder if forwarder is not None else PathForwarder(self.manet, max_paths=max_routes)
+        self.stats = TrafficStats()
+        self.streaming = StreamingMetrics(self.manet)
+        self.tick = 0
+        self.packet_routes = []
+        self.observers = []
+        self.instrumentation = Instrumentation()
+        self.instrumentation.watch('neighbor_checks', lambda: self.manet.topology.checks)
+        self.instrumentation.watch('topology_skips', lambda: self.manet.topology.skipped)
+        self.instrumentation.watch('node_expansions', lambda: self.manet.router.expanded)
+        self.instrumentation.watch('q_updates', lambda: self.manet.q_router.updates)
+        self.instrumentation.watch('route_cache_hits',
+                                   lambda: self.manet.router.cache.hits if self.manet.router.cache else 0)
+
+    @property
+    def success_count(self):
+        return self.stats.delivered
+
+    @property
+    def total_routes(self):
+        return self.stats.generated
+
+    @property
+    def total_hops(self):
+        return self.stats.total_hops
+
+    @property
+    def success_rate(self):
+        return self.stats.delivery_ratio * 100
+
+    @property
+    def average_path_length(self):
+        return self.stats.average_hops
+
+    @property
+    def last_batch(self):
+        return self.stats.last_batch
+
+    @property
+    def lifetime(self):
+        return self.manet.energy.lifetime()
+
+    def metrics(self):
+        # Phase timings and counters; timings are only collected while
+        # instrumentation is enabled
+        metrics = self.instrumentation.metrics()
+        metrics['tick'] = self.tick
+        return metrics
+
+    def count_batch(self, batch):
+        # Per-tick packet work, tallied only while instrumentation is on
+        instrumentation = self.instrumentation
+        if instrumentation.enabled:
+            instrumentation.count('transmissions', len(batch.senders))
+            instrumentation.count('packets_forwarded', int(np.count_nonzero(batch.forwarded)))
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def step(self):
+        manet = self.manet
+        phase = self.instrumentation.phase
+        with phase('mobility'):
+            displacement = self.mobility.move(manet.store, manet.store.active_rows(), self.rng, self.tick)
+        # Last tick's transmissions and the idle drain are settled in one
+        # batch; nodes that ran dry drop out of this tick's topology
+        with phase('energy'):
+            manet.energy.update(self.tick, idle=self.energy_drain)
+        with phase('topology'):
+            manet.update_topology(displacement)
+
+        # Route this tick's packets in one pass
+        with phase('routing'):
+            sources, dests = self.traffic.generate(manet.store.active_rows(), self.rng, self.tick)
+            batch = self.forwarder.forward(sources, dests)
+        with phase('stats'):
+            self.stats.record(batch)
+            costs = manet.energy.charge(batch.senders, batch.receivers)
+            self.streaming.record(batch, costs)
+            self.count_batch(batch)
+        with phase('learning'):
+            manet.reputation.observe(batch.observed, batch.forwarded)
+            manet.reputation.update()
+        if batch.paths:
+            self.packet_routes = (self.packet_routes + batch.paths)[-self.max_routes:]
+
+        self.tick += 1
+        with phase('observers'):
+            for observer in self.observers:
+                observer(self)
+
+    def run(self, n_ticks):
+        for _ in range(n_ticks):
+            self.step()
+        return self
+
+
+class Packet:
+    __slots__ = ('source', 'dest', 'current', 'hops', 'path', 'route', 'status', 'timeout', 'sent', 'finished')
+
+    def __init__(self, source, dest):
+        self.source = source
+        self.dest = dest
+        self.current = source
+        self.hops = 0
+        self.path = [source]
+        self.route = []
+        self.status = IN_FLIGHT
+        self.timeout = None
+        self.sent = 0.0
+        self.finished = 0.0
+
+
+class EventSimulator(Simulator):
+    # Discrete-event variant of the simulator. Packets travel hop by hop as
+    # transmit/receive events, expire through timeout events, and with
+    # Random Waypoint mobility nodes move in continuous time with one event
+    # per waypoint. Positions and links are only brought up to date when a
+    # packet is about to be sent, so nothing is recomputed while the network
+    # is idle. step() advances one tick of simulated time; per-tick work is
+    # limited to traffic generation and the batched energy and reputation
+    # bookkeeping. Other mobility models move once per tick.
+    def __init__(self, manet=None, num_nodes=15, malicious_ratio=0.1, seed=None, energy_drain=0.01,
+                 max_routes=5, traffic=None, mobility=None, hop_delay=0.01, timeout=5.0, drop_probability=1.0,
+                 topology_interval=0.25):
+        super().__init__(manet, num_nodes, malicious_ratio, seed, energy_drain=energy_drain, max_routes=max_routes,
+                         traffic=traffic, mobility=mobility if mobility is not None else RandomWaypoint())
+        self.scheduler = EventScheduler()
+        self.hop_delay = hop_delay
+        self.timeout = timeout
+        self.drop_probability = drop_probability
+        self.topology_interval = topology_interval
+        self.topology_time = 0.0
+        self.travel = 0.0
+        self.finished = []
+        self.transmissions = ([], [])
+        self.watchdog = ([], [])
+        self.on_air = {}
+
+        self.instrumentation.watch('events', lambda: sum(self.scheduler.processed.values()))
+
+        if not self.continuous:
+            self.scheduler.schedule_at(0.0, 'mobility', self._move)
+        self.scheduler.schedule_at(0.0, 'traffic', self._generate)
+
+    @property
+    def continuous(self):
+        return isinstance(self.mobility, RandomWaypoint)
+
+    @property
+    def now(self):
+        return self.scheduler.now
+
+    def step(self):
+        manet = self.manet
+        store = manet.store
+        phase = self.instrumentation.phase
+        if self.continuous:
+            with phase('mobility'):
+                unseen = self.mobility.unseen_rows(store, store.active_rows())
+                if len(unseen):
+                    self._plan(unseen)
+        # Mobility, topology syncs and routing are interleaved as events
+        with phase('events'):
+            self.scheduler.run(until=self.tick + 1)
+
+        with phase('stats'):
+            batch = self._collect()
+            self.stats.record(batch)
+            costs = manet.energy.charge(batch.senders, batch.receivers)
+            self.streaming.record(batch, costs)
+            self.count_batch(batch)
+        with phase('energy'):
+            manet.energy.update(self.tick, idle=self.energy_drain)
+        with phase('learning'):
+            manet.reputation.observe(batch.observed, batch.forwarded)
+            manet.reputation.update()
+        if batch.paths:
+            self.packet_routes = (self.packet_routes + batch.paths)[-self.max_routes:]
+
+        self.tick += 1
+        if self.observers:
+            # Observers see positions and links as of the end of the tick
+            with phase('topology'):
+                self.sync_topology()
+        with phase('observers'):
+            for observer in self.observers:
+                observer(self)
+
+    def run(self, n_ticks, speed=None):
+        # As fast as possible, or with speed given, no faster than `speed`
+        # ticks per wall-clock second, syncing once per tick
+        start_tick = self.tick
+        start_wall = time.perf_counter()
+        for _ in range(n_ticks):
+            self.step()
+            if speed:
+                ahead = (self.tick - start_tick) / speed - (time.perf_counter() - start_wall)
+                if ahead > 0:
+                    time.sleep(ahead)
+        return self
+
+    def sync_topology(self):
+        now = self.scheduler.now
+        store = self.manet.store
+        rows = store.active_rows()
+        if self.continuous:
+            store.xy[:, rows] = self.mobility.position_at(rows, now)
+            displacement = self.mobility.max_speed * (now - self.topology_time)
+        else:
+            displacement = self.travel
+        self.travel = 0.0
+        self.topology_time = now
+        self.manet.update_topology(displacement)
+
+    def _plan(self, rows):
+        store = self.manet.store
+        arrivals = self.mobility.plan(store, rows, self.rng, self.scheduler.now)
+        for row, node_id, when in zip(rows.tolist(), store.ids[rows].tolist(), arrivals.tolist()):
+            self.scheduler.schedule_at(when, 'waypoint', self._waypoint, row, node_id)
+
+    def _waypoint(self, row, node_id):
+        store = self.manet.store
+        # The row may have been released or its node died since
+        if store.ids[row] == node_id and store.alive[row]:
+            self._plan(np.array([row]))
+
+    def _move(self):
+        store = self.manet.store
+        self.travel += self.mobility.move(store, store.active_rows(), self.rng, self.tick)
+        self.scheduler.schedule(1.0, 'mobility', self._move)
+
+    def _generate(self):
+        scheduler = self.scheduler
+        now = scheduler.now
+        sources, dests = self.traffic.generate(self.manet.store.active_rows(), self.rng, int(now))
+        # This tick's packets are spread uniformly over the tick
+        offsets = np.sort(self.rng.random(len(sources)))
+        for source, dest, offset in zip(sources.tolist(), dests.tolist(), offsets.tolist()):
+            packet = Packet(source, dest)
+            packet.sent = now + offset
+            scheduler.schedule_at(now + offset, 'transmit', self._transmit, packet)
+            packet.timeout = scheduler.schedule_at(now + offset + self.timeout, 'timeout', self._expire, packet)
+        scheduler.schedule(1.0, 'traffic', self._generate)
+
+    def _transmit(self, packet):
+        if packet.status != IN_FLIGHT:
+            return
+        # Links are reused for topology_interval of simulated time, so a
+        # packet's hops in quick succession share one update
+        if self.scheduler.now - self.topology_time >= self.topology_interval:
+            self.sync_topology()
+        manet = self.manet
+        store = manet.store
+        node = packet.current
+        if not store.alive[node] or not store.alive[packet.dest]:
+            self._finish(packet, DROPPED)
+            return
+
+        # Follow the planned route while its next hop is still a trusted
+        # neighbor, otherwise route again from here
+        route = packet.route
+        if not route or route[0] not in store.neighbor_rows(node) or not self._trusted(route[0], packet.dest):
+            path = manet.router.find_path(int(store.ids[node]), int(store.ids[packet.dest]))
+            if not path:
+                self._finish(packet, DROPPED)
+                return
+            route[:] = [manet.nodes[n].row for n in path[1:]]
+        nxt = route.pop(0)
+        self.transmissions[0].append(node)
+        radio = manet.radio
+        if radio is not None:
+            # Every sender whose packet is still in the air interferes
+            self.on_air[node] = self.on_air.get(node, 0) + 1
+            probability = radio.link_probability([node], [nxt], list(self.on_air), activity=1.0)[0]
+            if self.rng.random() >= probability:
+                self.transmissions[1].append(-1)
+                self.scheduler.schedule(self.hop_delay, 'lost', self._lose, packet)
+                return
+        self.transmissions[1].append(nxt)
+        self.scheduler.schedule(self.hop_delay, 'receive', self._receive, packet, nxt)
+
+    def _land(self, sender):
+        count = self.on_air.pop(sender, 0) - 1
+        if count > 0:
+            self.on_air[sender] = count
+
+    def _lose(self, packet):
+        self._land(packet.current)
+        if packet.status == IN_FLIGHT:
+            self._finish(packet, DROPPED)
+
+    def _trusted(self, row, dest):
+        reputation = self.manet.reputation
+        return row == dest or self.manet.store.reputation[row] >= reputation.trust_threshold
+
+    def _receive(self, packet, node):
+        if self.manet.radio is not None:
+            self._land(packet.current)
+        if packet.status != IN_FLIGHT:
+            return
+        packet.hops += 1
+        packet.path.append(node)
+        packet.current = node
+        if node == packet.dest:
+            self._finish(packet, DELIVERED)
+            return
+        passed = bool(relay_outcome(self.manet.store, [node], self.drop_probability, self.rng)[0])
+        self.watchdog[0].append(node)
+        self.watchdog[1].append(passed)
+        if not passed:
+            self._finish(packet, DROPPED)
+            return
+        self.scheduler.schedule(0.0, 'transmit', self._transmit, packet)
+
+    def _expire(self, packet):
+        if packet.status == IN_FLIGHT:
+            packet.timeout = None
+            self._finish(packet, DROPPED)
+
+    def _finish(self, packet, status):
+        packet.status = status
+        packet.finished = self.scheduler.now
+        self.scheduler.cancel(packet.timeout)
+        self.finished.append(packet)
+
+    def _collect(self):
+        # Packets finished during the tick as one PacketBatch
+        finished, self.finished = self.finished, []
+        ids = self.manet.store.ids
+        paths = [ids[p.path].tolist() for p in finished if p.status == DELIVERED][:self.max_routes]
+        batch = PacketBatch(
+            np.array([p.source for p in finished], dtype=np.int64),
+            np.array([p.dest for p in finished], dtype=np.int64),
+            np.array([p.status for p in finished], dtype=np.int8),
+            np.array([p.hops for p in finished], dtype=np.int64),
+            paths,
+            np.array(self.watchdog[0], dtype=np.int64), np.array(self.watchdog[1], dtype=bool),
+            np.array(self.transmissions[0], dtype=np.int64), np.array(self.transmissions[1], dtype=np.int64),
+            np.array([p.finished - p.sent for p in finished], dtype=float)
+        )
+        self.transmissions = ([], [])
+        self.watchdog = ([], [])
+        return batch
@@ -286,7 +286,8 @@ class EnhancedMANETVisualizer(ctk.CTk):
         # Update statistics
         self.stats_labels['nodes'].configure(text=str(len(self.manet.nodes)))
         self.stats_labels['malicious'].configure(text=str(sum(1 for n in self.manet.nodes.values() if n.is_malicious)))
-        self.stats_labels['success_rate'].configure(text=f"{(self.success_count/self.total_routes)*100:.2f}%")
+        success_rate = self.success_count / self.total_routes * 100 if self.total_routes else 0.0
+        self.stats_labels['success_rate'].configure(text=f"{success_rate:.2f}%")
         self.stats_labels['active_routes'].configure(text=str(len(self.packet_routes)))
         self.stats_labels['avg_energy'].configure(text=f"{np.mean([n.energy for n in self.manet.nodes.values()]):.2f}")
     
@@ -0,0 +1,10 @@
+from benchmark import run_neighbors
+
+
+def test_neighbor_scaling_times_the_topology_update_and_the_tick(capsys):
+    run_neighbors([15, 200], ['grid'], brute_limit=200, repeats=1, seed=0)
+    header, *rows = capsys.readouterr().out.splitlines()
+    assert header.split() == ['nodes', 'links', 'brute', 'ms', 'grid', 'ms', 'topology', 'ms', 'step', 'ms']
+    assert [row.split()[0] for row in rows] == ['15', '200']
+    for row in rows:
+        assert all(float(cell) >= 0 for cell in row.split()[2:])
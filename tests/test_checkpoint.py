@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from checkpoint import Checkpointer, load_checkpoint, network_state, read_manifest
+from forwarding import make_forwarder
+from manet import MANET
+from simulator import Simulator
+from traffic import ConstantBitrateTraffic
+
+
+def _state(manet):
+    # Everything a checkpoint restores, in comparable form
+    arrays, meta = network_state(manet)
+    size = manet.store.size
+    keys, values = manet.q_router.table.entries()
+    state = {name: np.array(array) for name, array in arrays.items() if name not in ('q_keys', 'q_values', 'links')}
+    state['xy'] = state['xy'][:, :size]
+    state['links'] = sorted(map(tuple, manet.store.ids[manet.store.links].tolist()))
+    state['q'] = dict(zip(keys.tolist(), values.tolist()))
+    state['meta'] = meta
+    return state
+
+
+def _assert_same(a, b):
+    assert a.keys() == b.keys()
+    for name in a:
+        if isinstance(a[name], np.ndarray):
+            np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+        else:
+            assert a[name] == b[name], name
+
+
+def _simulator(manet, kind):
+    return Simulator(manet=manet, traffic=ConstantBitrateTraffic(4), forwarder=make_forwarder(kind, manet))
+
+
+@pytest.mark.parametrize('kind, mmap', [('path', True), ('batch', False), ('opportunistic', True)])
+def test_restored_delta_checkpoint_continues_identically(tmp_path, kind, mmap):
+    manet = MANET(num_nodes=60, seed=11, area_size=140.0, radio=kind == 'batch')
+    simulator = _simulator(manet, kind)
+    checkpoints = Checkpointer(manet, str(tmp_path), full_every=3)
+    simulator.run(15)
+    full = checkpoints.save(simulator.tick)
+    manet.leave([3, 4, 5])
+    manet.join(2)
+    simulator.run(10)
+    delta = checkpoints.save(simulator.tick)
+    assert read_manifest(full)['kind'] == 'full'
+    manifest = read_manifest(delta)
+    assert manifest['kind'] == 'delta' and 'delta' in manifest['arrays'].values()
+
+    restored = load_checkpoint(delta, mmap=mmap)
+    _assert_same(_state(manet), _state(restored))
+
+    # Caches are derived state and start out empty after a restore
+    manet.router.cache.clear()
+    original = _simulator(manet, kind)
+    copy = _simulator(restored, kind)
+    for simulator in (original, copy):
+        simulator.run(20)
+        simulator.manet.join(3)
+        simulator.manet.leave([10, 11])
+        simulator.run(20)
+    _assert_same(_state(manet), _state(restored))
+    assert original.stats.generated == copy.stats.generated > 0
+    assert original.stats.delivered == copy.stats.delivered
+    assert original.packet_routes == copy.packet_routes
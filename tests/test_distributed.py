@@ -0,0 +1,149 @@
+import numpy as np
+
+from distributed import PACKET_FIELDS, DistributedSimulation, Regions, RegionWorker, _records
+from forwarding import PathForwarder
+from manet import MANET
+from mobility import RandomJitter, TraceMobility
+from traffic import DELIVERED, distinct_pairs
+
+
+def _coordinator_rng(seed, grid):
+    # The generator the coordinator draws positions and traffic from
+    return np.random.default_rng(np.random.SeedSequence(seed).spawn(grid[0] * grid[1] + 1)[-1])
+
+
+def _single_process(positions, rng, ticks, packets_per_tick, area_size, mobility, drain_ticks=0):
+    # The same network, traffic and mobility stepped in one process, in the
+    # order a region worker steps; returns (delivered, total hops)
+    manet = MANET(num_nodes=0, transmission_range=30, area_size=area_size)
+    manet.nodes.add_many(range(len(positions)), positions)
+    manet.update_topology()
+    store = manet.store
+    forwarder = PathForwarder(manet, max_paths=0)
+    delivered = hops = 0
+    for tick in range(ticks + drain_ticks):
+        rows = store.active_rows()
+        displacement = mobility.move(store, rows, store.rng, tick)
+        manet.energy.update(tick, rows=rows)
+        manet.update_topology(displacement)
+        count = packets_per_tick if tick < ticks else 0
+        sources, dests = distinct_pairs(np.arange(len(positions)), count, rng)
+        if len(sources):
+            batch = forwarder.forward(sources, dests)
+            manet.energy.charge(batch.senders, batch.receivers)
+            manet.reputation.observe(batch.observed, batch.forwarded)
+            reached = batch.status == DELIVERED
+            delivered += int(reached.sum())
+            hops += int(batch.hops[reached].sum())
+        manet.reputation.update()
+    return delivered, hops
+
+
+def _distributed(num_nodes, grid, seed, ticks, packets_per_tick, area_size, mobility, drain_ticks=0):
+    from traffic import ConstantBitrateTraffic
+
+    traffic = ConstantBitrateTraffic(packets_per_tick)
+    handoffs = []
+    with DistributedSimulation(num_nodes=num_nodes, grid=grid, area_size=area_size, malicious_ratio=0.0,
+                               seed=seed, energy_drain=0.0, traffic=traffic, mobility=mobility) as simulation:
+        simulation.start_workers()
+        for tick in range(ticks + drain_ticks):
+            traffic.packets_per_tick = packets_per_tick if tick < ticks else 0
+            handoffs.append(simulation.step()['handoffs'])
+        assert simulation.last['in_flight'] == 0
+        return simulation.summary(), handoffs
+
+
+def test_one_region_matches_a_single_process_run():
+    grid, seed, area = (1, 1), 3, 150.0
+    rng = _coordinator_rng(seed, grid)
+    positions = rng.uniform(0, area, size=(120, 2))
+    expected = _single_process(positions, rng, 10, 20, area, RandomJitter(0.0))
+    summary, handoffs = _distributed(120, grid, seed, 10, 20, area, RandomJitter(0.0))
+    assert summary['generated'] == 200 and summary['dropped'] == 200 - expected[0]
+    hops = summary['hops']
+    assert summary['delivered'] == hops['count'] == expected[0]
+    assert np.isclose(hops['mean'] * hops['count'], expected[1])
+    assert handoffs == [0] * 10
+
+
+def test_regions_deliver_what_a_single_process_delivers():
+    # A dense static network: every packet gets through, over the borders
+    # one region per tick, and no route is shorter than the direct one
+    grid, seed, area = (2, 2), 5, 120.0
+    rng = _coordinator_rng(seed, grid)
+    positions = rng.uniform(0, area, size=(300, 2))
+    expected = _single_process(positions, rng, 8, 15, area, RandomJitter(0.0), drain_ticks=4)
+    summary, _ = _distributed(300, grid, seed, 8, 15, area, RandomJitter(0.0), drain_ticks=4)
+    assert expected[0] == summary['generated'] == 120
+    assert summary['delivered'] == expected[0] and summary['dropped'] == 0
+    assert summary['hops']['mean'] * summary['hops']['count'] >= expected[1] - 1e-6
+
+
+def test_handoffs_match_region_changes_on_a_shared_trace():
+    grid, seed, area, count, ticks = (3, 2), 7, 150.0, 200, 12
+    positions = _coordinator_rng(seed, grid).uniform(0, area, size=(count, 2))
+    # Every node heads in a straight line to a random point
+    targets = np.random.default_rng(1).uniform(0, area, size=(count, 2))
+    ids = np.arange(count)
+    trace = np.concatenate([np.column_stack([np.zeros(count), ids, positions]),
+                            np.column_stack([np.full(count, ticks), ids, targets])])
+    regions = Regions(area, *grid, 30)
+    mobility = TraceMobility(trace)
+    path = [np.clip(mobility.positions_at(ids, tick), 0, area) for tick in range(ticks)]
+    homes = np.array([regions.locate(x, y) for x, y in path])
+    expected = [0] + (homes[1:ticks] != homes[:ticks - 1]).sum(axis=1).tolist()
+
+    _, handoffs = _distributed(count, grid, seed, ticks, 0, area, mobility)
+    assert handoffs == expected and sum(expected) > 0
+
+
+def _worker(region, nodes):
+    config = {'area_size': 100.0, 'cols': 2, 'rows': 1, 'transmission_range': 30, 'mobility': RandomJitter(0.0),
+              'energy_drain': 0.0, 'max_regions': 6, 'seeds': np.random.SeedSequence(0).spawn(2)}
+    worker = RegionWorker(config, region, nodes)
+    worker.exchange()
+    return worker
+
+
+def _nodes(ids, xs, region):
+    records = {'id': np.array(ids), 'x': np.array(xs, dtype=float), 'y': np.full(len(ids), 50.0),
+               'energy': np.full(len(ids), 100.0), 'reputation': np.ones(len(ids)),
+               'malicious': np.zeros(len(ids), dtype=bool), 'alpha': np.zeros(len(ids)),
+               'beta': np.zeros(len(ids)), 'region': np.full(len(ids), region)}
+    return records
+
+
+def _message(tick, halo, feedback=None):
+    empty = _nodes([], [], 0)
+    if feedback is None:
+        feedback = {'id': np.zeros(0, dtype=np.int64), 'forwarded': np.zeros(0), 'dropped': np.zeros(0),
+                    'energy': np.zeros(0)}
+    return {'tick': tick, 'halo': halo, 'arrivals': empty, 'feedback': feedback, 'packets': _records(PACKET_FIELDS)}
+
+
+def test_evidence_about_a_ghost_goes_to_its_owner():
+    left = _worker(0, _nodes([0], [40.0], 0))
+    right = _worker(1, _nodes([1], [60.0], 1))
+    halo = right.exchange()['halo'][0]
+    left.step(_message(0, halo))
+    manet = left.manet
+    ghost, own = manet.nodes[1].row, manet.nodes[0].row
+    # Node 0 saw the ghost drop a packet it handed over
+    manet.reputation.observe([ghost], [False])
+    cost = manet.energy.charge([own], [ghost])
+    manet.reputation.update(left.owned_rows())
+    assert manet.reputation.evidence([ghost])[1][0] == 0 and manet.store.reputation[ghost] == 1.0
+
+    feedback = left.exchange()['feedback']
+    assert feedback['id'].tolist() == [1] and feedback['dropped'].tolist() == [1.0]
+    assert np.isclose(feedback['energy'][0], manet.energy.receive_cost())
+    # Nothing is settled for the ghost where it is only a copy
+    left.step(_message(1, halo))
+    assert manet.store.energy[ghost] == 100.0 and manet.store.energy[own] == 100.0 - cost[0]
+
+    right.step(_message(1, left.exchange()['halo'][1], feedback))
+    owner = right.manet
+    row = owner.nodes[1].row
+    assert owner.reputation.evidence([row])[1][0] == 1.0 and owner.store.reputation[row] < 1.0
+    assert np.isclose(owner.store.energy[row], 100.0 - owner.energy.receive_cost())
@@ -0,0 +1,73 @@
+import numpy as np
+
+from manet import MANET
+
+
+def _line(energies, spacing=20.0):
+    manet = MANET(num_nodes=0, seed=0)
+    count = len(energies)
+    manet.nodes.add_many(range(count), np.column_stack([10 + spacing * np.arange(count), np.full(count, 50.0)]),
+                         energy=np.asarray(energies, dtype=float))
+    manet.update_topology()
+    return manet
+
+
+def test_transmissions_cost_by_distance_and_size():
+    manet = _line([100.0, 100.0, 100.0])
+    energy = manet.energy
+    # 0 -> 1 heard over 20 m, 1 -> 2 twice at size 2, and one from 2 nobody heard
+    costs = energy.charge([0, 1, 1, 2], [1, 2, 2, -1], sizes=[1.0, 2.0, 2.0, 1.0])
+    expected = np.array([0.05 + 1e-4 * 400, 2 * (0.05 + 1e-4 * 400), 2 * (0.05 + 1e-4 * 400), 0.05 + 1e-4 * 900])
+    assert np.allclose(costs, expected)
+    assert np.allclose(energy.pending[:3], [expected[0], expected[1] + expected[2] + 0.05, 0.2 + expected[3]])
+    assert np.isclose(energy.spent['transmit'], expected.sum()) and np.isclose(energy.spent['receive'], 0.25)
+
+    pending = energy.pending[:3].copy()
+    energy.update(0, idle=0.5)
+    assert np.allclose(manet.store.energy[:3], 99.5 - pending)
+    assert (energy.pending == 0).all() and energy.deaths == 0
+
+
+def test_rows_settle_only_their_own_charges():
+    manet = _line([100.0, 100.0, 1.0])
+    energy = manet.energy
+    energy.charge([0, 1], [1, 2])
+    pending = energy.pending[:3].copy()
+    # Node 2 owes more than it has left; it ends at 0, not below
+    energy.add_pending([2], [5.0])
+    dead = energy.update(3, idle=0.1, rows=[1, 2])
+    assert dead.tolist() == [2] and manet.store.energy[2] == 0.0
+    assert np.isclose(manet.store.energy[1], 99.9 - pending[1])
+    assert manet.store.energy[0] == 100.0 and energy.pending[0] == pending[0]
+    assert (energy.pending[1:3] == 0).all()
+
+    energy.update(4)
+    assert np.isclose(manet.store.energy[0], 100.0 - pending[0]) and energy.pending[0] == 0
+
+
+def test_dead_nodes_leave_the_topology_but_keep_their_id():
+    manet = _line([100.0, 0.3, 100.0, 0.2])
+    dead = manet.energy.update(4, idle=0.25)
+    assert dead.tolist() == [3]
+    manet.update_topology()
+    assert 3 in manet.nodes and not manet.nodes[3].alive and manet.nodes[3].energy == 0.0
+    assert manet.nodes[2].neighbors == {1}
+    assert manet.energy.lifetime()['first_death'] == 4 and manet.energy.lifetime()['half_dead'] is None
+
+    manet.energy.update(9, idle=0.25)
+    lifetime = manet.energy.lifetime()
+    assert lifetime['dead'] == 2 and lifetime['alive'] == 2
+    assert (lifetime['first_death'], lifetime['half_dead']) == (4, 9)
+    manet.update_topology()
+    assert manet.router.find_row_path(0, 2) is None
+
+
+def test_routes_move_off_drained_relays():
+    # Two relays equally far between 0 and 3
+    manet = MANET(num_nodes=0, seed=0)
+    manet.nodes.add_many(range(4), np.array([[10.0, 50.0], [30.0, 60.0], [30.0, 40.0], [50.0, 50.0]]),
+                         energy=np.array([100.0, 90.0, 100.0, 100.0]))
+    manet.update_topology()
+    assert manet.router.find_row_path(0, 3) == [0, 2, 3]
+    manet.store.energy[2] = 40.0
+    assert manet.router.find_row_path(0, 3) == [0, 1, 3]
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from events import EventScheduler
+from simulator import EventSimulator
+
+
+class ListScheduler:
+    # Reference kernel: a plain list scanned for the earliest event, ties
+    # going to the one scheduled first
+    def __init__(self):
+        self.now = 0.0
+        self.events = []
+        self.seq = 0
+
+    def schedule(self, delay, kind, callback, *args):
+        event = [self.now + delay, self.seq, kind, callback, args, True]
+        self.seq += 1
+        self.events.append(event)
+        return event
+
+    def cancel(self, event):
+        event[5] = False
+
+    def run(self, until):
+        while True:
+            pending = [event for event in self.events if event[5] and event[0] < until]
+            if not pending:
+                break
+            event = min(pending, key=lambda event: (event[0], event[1]))
+            self.events.remove(event)
+            self.now = event[0]
+            event[3](*event[4])
+        self.now = max(self.now, until)
+
+
+def _script(scheduler, log):
+    # Each event logs itself, then schedules children, some at the same
+    # time, and cancels one of its pending siblings, all drawn from a
+    # generator seeded by its own label
+    handles = {}
+
+    def fire(label):
+        log.append((label, scheduler.now))
+        rng = np.random.default_rng(label)
+        for child in range(int(rng.integers(0, 3)) if len(log) < 300 else 0):
+            delay = float(rng.choice([0.0, 0.5, rng.uniform(0, 3)]))
+            handles[label * 4 + child + 1] = scheduler.schedule(delay, 'fire', fire, label * 4 + child + 1)
+        if rng.random() < 0.3 and handles:
+            scheduler.cancel(handles.pop(sorted(handles)[int(rng.integers(0, len(handles)))]))
+
+    for label in range(1, 6):
+        handles[label] = scheduler.schedule(float(label % 3), 'fire', fire, label)
+
+
+def test_events_run_in_the_same_order_as_a_reference_kernel():
+    logs = []
+    for scheduler in (EventScheduler(), ListScheduler()):
+        log = []
+        _script(scheduler, log)
+        for until in (0.5, 2.0, 2.0, 7.5, 40.0):
+            scheduler.run(until=until)
+            assert scheduler.now == until
+        logs.append(log)
+    assert logs[0] == logs[1]
+    assert len(logs[0]) > 50
+
+
+def test_cancelled_events_do_not_run_and_run_stops_at_max_events():
+    scheduler = EventScheduler()
+    ran = []
+    events = [scheduler.schedule(t, 'tick', ran.append, t) for t in (3.0, 1.0, 2.0, 1.0)]
+    scheduler.cancel(events[2])
+    scheduler.cancel(None)
+    assert scheduler.next_time() == 1.0
+    assert scheduler.run(max_events=2) == 2
+    assert ran == [1.0, 1.0] and scheduler.now == 1.0
+    assert scheduler.run() == 1
+    assert ran == [1.0, 1.0, 3.0]
+    assert scheduler.processed == {'tick': 3}
+    assert scheduler.next_time() is None
+    with pytest.raises(ValueError):
+        scheduler.schedule_at(2.0, 'late', ran.append)
+
+
+def test_event_simulator_runs_are_reproducible():
+    runs = []
+    for _ in range(2):
+        simulator = EventSimulator(num_nodes=40, seed=8)
+        simulator.run(30)
+        runs.append((simulator.stats.generated, simulator.stats.delivered, simulator.packet_routes,
+                     simulator.manet.store.xy.tolist(), dict(simulator.scheduler.processed)))
+    assert runs[0] == runs[1]
+    assert runs[0][0] > 0
@@ -0,0 +1,67 @@
+import math
+import time
+
+import numpy as np
+
+from experiments import METRICS, Aggregator, build_tasks, sweep, t_quantile
+
+
+def test_t_quantile_rounds_down_to_the_table():
+    assert t_quantile(10) == 2.228
+    # Between entries the wider interval of the lower df is used
+    assert t_quantile(11) == 2.228 and t_quantile(13) == 2.179 and t_quantile(14) == 2.179
+    assert t_quantile(59) == 2.042 and t_quantile(10 ** 6) == 1.980
+    assert math.isnan(t_quantile(0))
+
+
+def _result(scenario, values):
+    return dict({metric: values for metric in METRICS}, scenario=scenario)
+
+
+def test_summary_matches_the_t_interval():
+    scenario = {'num_nodes': 15, 'malicious_ratio': 0.1, 'transmission_range': 30, 'mobility_step': 2.0}
+    samples = np.random.default_rng(0).normal(50.0, 4.0, 14)
+    aggregator = Aggregator()
+    for value in samples.tolist():
+        aggregator.add(_result(scenario, value))
+    aggregator.add(_result(dict(scenario, num_nodes=30), 1.0))
+
+    single, row = sorted(aggregator.summary(), key=lambda row: row['num_nodes'], reverse=True)
+    stats = row['success_rate']
+    half_width = 2.179 * samples.std(ddof=1) / math.sqrt(14)
+    assert stats['n'] == 14 and np.isclose(stats['mean'], samples.mean())
+    assert np.isclose(stats['std'], samples.std(ddof=1))
+    assert np.allclose(stats['ci95'], (samples.mean() - half_width, samples.mean() + half_width))
+    # One replicate has no spread to speak of
+    assert single['success_rate']['mean'] == 1.0 and math.isnan(single['success_rate']['std'])
+
+
+def test_seeds_follow_task_order():
+    grid = {'num_nodes': [10, 20], 'malicious_ratio': [0.0, 0.2]}
+    tasks = build_tasks(grid, 3, 5, base_seed=4)
+    assert len(tasks) == 12
+    assert [task['seed'].spawn_key for task in tasks] == [(i,) for i in range(12)]
+    assert [task['replicate'] for task in tasks[:4]] == [0, 1, 2, 0]
+
+
+def _key(result):
+    return result['scenario']['num_nodes'], result['replicate']
+
+
+def test_workers_reproduce_a_serial_sweep():
+    grid = {'num_nodes': [10, 20]}
+    serial = sorted(sweep(grid, replicates=2, n_ticks=20, base_seed=1, workers=1), key=_key)
+    parallel = sorted(sweep(grid, replicates=2, n_ticks=20, base_seed=1, workers=2), key=_key)
+    assert [_key(result) for result in serial] == [(10, 0), (10, 1), (20, 0), (20, 1)]
+    for a, b in zip(serial, parallel):
+        assert all(a[metric] == b[metric] for metric in METRICS)
+
+
+def test_closing_a_sweep_early_cancels_queued_tasks():
+    # 400 runs of 200 ticks take tens of seconds; closing after the first
+    # must not wait for them
+    results = sweep({'num_nodes': [15]}, replicates=400, n_ticks=200, workers=2)
+    start = time.perf_counter()
+    next(results)
+    results.close()
+    assert time.perf_counter() - start < 10
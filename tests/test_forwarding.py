@@ -0,0 +1,52 @@
+import numpy as np
+
+from forwarding import CandidateCache, OpportunisticForwarder
+from manet import MANET
+
+
+def _refers_to(key, candidates, row):
+    return row in key or row in candidates.tolist()
+
+
+def test_clear_evicts_only_sets_that_refer_to_the_rows():
+    cache = CandidateCache()
+    cache.put(0, 9, np.array([1, 2, -1]))
+    cache.put(1, 9, np.array([3, 4, 5]))
+    cache.put(3, 8, np.array([6, 7, -1]))
+    cache.put(6, 1, np.array([8, -1, -1]))
+    cache.put(7, 8, np.array([5, -1, -1]))
+    cache.clear(np.array([1, 6]))
+    assert set(cache.sets) == {(7, 8)}
+    cache.clear([5])
+    assert cache.sets == {} and cache.by_node == {} and cache.by_member == {}
+
+
+def test_replaced_and_invalidated_sets_leave_no_index_behind():
+    cache = CandidateCache()
+    cache.put(0, 9, np.array([1, 2, -1]))
+    cache.put(0, 9, np.array([3, -1, -1]))
+    cache.put(0, 8, np.array([1, -1, -1]))
+    cache.clear([2])
+    assert set(cache.sets) == {(0, 9), (0, 8)}
+    cache.invalidate_node(0)
+    assert cache.sets == {} and cache.by_node == {} and cache.by_member == {}
+
+
+def test_released_rows_keep_unrelated_candidate_sets():
+    manet = MANET(num_nodes=80, seed=2, area_size=200.0)
+    forwarder = OpportunisticForwarder(manet)
+    rng = np.random.default_rng(0)
+    rows = manet.store.active_rows()
+    forwarder.candidate_sets(rng.choice(rows, 200), rng.choice(rows, 200))
+    cached = dict(forwarder.cache.sets)
+    leaving = [int(node_id) for node_id in rng.choice(80, 5, replace=False)]
+    released = [manet.nodes[node_id].row for node_id in leaving]
+    events = []
+    manet.link_listeners.append(lambda up, down: events.extend(up + down))
+    manet.leave(leaving)
+    # Nodes that lost a link to a leaving node also rank again
+    relinked = {manet.nodes[node_id].row for link in events for node_id in link if node_id in manet.nodes}
+    expected = {key for key, (candidates, _) in cached.items()
+                if key[0] not in relinked and not any(_refers_to(key, candidates, row) for row in released)}
+    assert set(forwarder.cache.sets) == expected
+    assert 0 < len(expected) < len(cached)
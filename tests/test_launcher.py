@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import app
+from manet import MANET, Node
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEADLESS = ('app', 'manet', 'node_store', 'topology', 'routing', 'energy', 'reputation', 'mobility', 'traffic',
+            'forwarding', 'radio', 'qlearning', 'events', 'simulator', 'metrics', 'recording', 'checkpoint',
+            'renderer', 'pipeline', 'profiling', 'experiments', 'benchmark', 'distributed')
+
+
+def test_model_modules_import_without_a_gui_toolkit():
+    code = (f"import importlib, sys; [importlib.import_module(name) for name in {HEADLESS!r}]; "
+            "import app; app.MANET(num_nodes=10, seed=0).update_topology(); "
+            "print(sorted(name for name in ('tkinter', 'customtkinter', 'visualizer') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_launcher_reexports_the_model():
+    assert app.MANET is MANET and app.Node is Node
+    with pytest.raises(AttributeError, match='Visualiser'):
+        app.Visualiser
+
+
+def test_gui_is_imported_when_asked_for(monkeypatch):
+    # A stand-in visualizer module records what the launcher reaches for
+    launched = []
+    gui = types.ModuleType('visualizer')
+    gui.EnhancedMANETVisualizer = type('EnhancedMANETVisualizer', (), {})
+    gui.main = lambda: launched.append(True)
+    monkeypatch.setitem(sys.modules, 'visualizer', gui)
+    assert app.EnhancedMANETVisualizer is gui.EnhancedMANETVisualizer
+    app.main()
+    assert launched == [True]
@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pytest
+
+from metrics import QuantileSketch
+
+QUANTILES = np.linspace(0, 1, 41)
+
+
+def _reference(values, q):
+    # The sketch reports the value at rank floor(q * (n - 1))
+    return float(np.quantile(values, q, method='lower'))
+
+
+def _within(estimate, exact, accuracy):
+    return abs(estimate - exact) <= accuracy * abs(exact) + 1e-12
+
+
+def _check(sketch, values):
+    # Every quantile above the values merged into the lowest bucket is
+    # within the accuracy
+    floor = sketch.gamma ** (sketch.offset - 1)
+    checked = 0
+    for q in QUANTILES:
+        exact = _reference(values, q)
+        if exact > floor:
+            assert _within(sketch.quantile(q), exact, sketch.accuracy), q
+            checked += 1
+    return checked
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+@pytest.mark.parametrize('distribution', ['lognormal', 'exponential', 'uniform', 'integers'])
+def test_quantiles_are_within_the_relative_accuracy(distribution, accuracy):
+    rng = np.random.default_rng(5)
+    draw = {
+        'lognormal': lambda n: rng.lognormal(0.0, 2.0, n),
+        'exponential': lambda n: rng.exponential(30.0, n),
+        'uniform': lambda n: rng.uniform(1.0, 2.0, n),
+        'integers': lambda n: rng.integers(1, 40, n).astype(float),
+    }[distribution]
+    sketch = QuantileSketch(accuracy=accuracy)
+    batches = [draw(int(n)) for n in rng.integers(0, 500, 30)]
+    for batch in batches:
+        sketch.add(batch)
+    values = np.concatenate(batches)
+    assert sketch.count == len(values)
+    assert sketch.mean == pytest.approx(values.mean())
+    # At 1% the lognormal and exponential values need more than max_bins buckets
+    assert _check(sketch, values) >= (35 if distribution in ('lognormal', 'exponential') else len(QUANTILES))
+
+
+def test_zero_and_negative_values_fill_the_lowest_ranks():
+    values = np.concatenate([np.zeros(30), -np.arange(1.0, 11.0), np.arange(1.0, 61.0)])
+    sketch = QuantileSketch()
+    sketch.add(values)
+    assert sketch.zeros == 40
+    assert sketch.quantile(0.0) == -10.0
+    assert sketch.quantile(0.3) == -10.0
+    assert _within(sketch.quantile(0.75), _reference(values, 0.75), sketch.accuracy)
+    assert _within(sketch.quantile(1.0), 60.0, sketch.accuracy)
+
+
+def test_merged_sketches_equal_one_sketch_of_all_values():
+    rng = np.random.default_rng(6)
+    parts = [rng.lognormal(i, 1.0, 400) for i in range(4)]
+    whole = QuantileSketch()
+    merged = QuantileSketch()
+    for part in parts:
+        whole.add(part)
+        sketch = QuantileSketch()
+        sketch.add(part)
+        merged.merge(sketch)
+    merged.merge(QuantileSketch())
+    assert merged.count == whole.count and merged.sum == pytest.approx(whole.sum)
+    assert [merged.quantile(q) for q in QUANTILES] == [whole.quantile(q) for q in QUANTILES]
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(accuracy=0.05))
+
+
+def test_values_spanning_more_than_max_bins_keep_upper_quantiles():
+    # Twelve decades need about 1400 buckets at 1%; the lowest are merged
+    rng = np.random.default_rng(7)
+    sketch = QuantileSketch(max_bins=512)
+    batches = [10.0 ** rng.uniform(-6, 6, 300) for _ in range(20)]
+    for batch in batches[::2] + batches[1::2][::-1]:
+        sketch.add(batch)
+    values = np.concatenate(batches)
+    assert _check(sketch, values) >= 15
+    assert values.min() <= sketch.quantile(0.0) <= sketch.gamma ** sketch.offset
+    assert math.isnan(QuantileSketch().quantile(0.5))
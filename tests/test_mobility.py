@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from mobility import GaussMarkov, RandomJitter, RandomWaypoint, ReferencePointGroup, TraceMobility, make_mobility
+from node_store import NodeStore
+
+
+def _store(count, area_size=100.0, seed=0):
+    store = NodeStore(capacity=count, rng=np.random.default_rng(seed), area_size=area_size)
+    store.allocate_many(range(count), np.random.default_rng(seed + 1).uniform(0, area_size, (count, 2)))
+    return store
+
+
+@pytest.mark.parametrize('model', [
+    RandomJitter(3.0),
+    RandomWaypoint(min_speed=1.0, max_speed=4.0, pause=2),
+    GaussMarkov(mean_speed=2.0, speed_std=1.0),
+    ReferencePointGroup(groups=3, radius=15.0, max_speed=3.0, member_step=1.0),
+], ids=['jitter', 'waypoint', 'gauss_markov', 'group'])
+def test_nodes_stay_in_the_area_and_within_the_bound(model):
+    store = _store(200)
+    rng = np.random.default_rng(2)
+    model.move(store, store.active_rows(), rng, 0)
+    for tick in range(1, 60):
+        if tick == 30:
+            # Newcomers may be placed anywhere; everyone else keeps the bound
+            store.release_many(np.arange(0, 200, 10))
+            store.allocate_many(range(1000, 1010), np.full((10, 2), 50.0))
+        before = store.xy.copy()
+        old = store.ids.copy()
+        rows = store.active_rows()
+        bound = model.move(store, rows, rng, tick)
+        stayed = rows[old[rows] == store.ids[rows]]
+        moved = np.sqrt(((store.xy[:, stayed] - before[:, stayed]) ** 2).sum(axis=0))
+        assert (moved <= bound + 1e-9).all()
+        assert (store.xy[:, rows] >= 0).all() and (store.xy[:, rows] <= store.area_size).all()
+
+
+def test_group_members_join_with_no_bound():
+    store = _store(20)
+    model = ReferencePointGroup(groups=2)
+    rng = np.random.default_rng(0)
+    assert model.move(store, store.active_rows(), rng) == np.inf
+    assert np.isfinite(model.move(store, store.active_rows(), rng))
+    store.allocate_many([50], np.array([[1.0, 1.0]]))
+    assert model.move(store, store.active_rows(), rng) == np.inf
+
+
+def test_waypoint_nodes_reach_their_waypoints_and_pause():
+    store = _store(1)
+    model = RandomWaypoint(min_speed=5.0, max_speed=5.0, pause=3)
+    rng = np.random.default_rng(0)
+    rows = store.active_rows()
+    model.move(store, rows, rng)
+    waypoint = model.waypoints[:, 0].copy()
+    for tick in range(1, 200):
+        model.move(store, rows, rng, tick)
+        if np.allclose(store.xy[:, 0], waypoint):
+            break
+    else:
+        pytest.fail("never arrived")
+    at = store.xy[:, 0].copy()
+    for tick in range(3):
+        model.move(store, rows, rng)
+        assert (store.xy[:, 0] == at).all()
+    model.move(store, rows, rng)
+    assert not (store.xy[:, 0] == at).all()
+
+
+def test_trace_is_interpolated_between_samples(tmp_path):
+    trace = tmp_path / 'trace.txt'
+    trace.write_text("# time node x y\n"
+                     "0 1 10 10\n"
+                     "10 1 30 50\n"
+                     "4 2 80 80\n"
+                     "0 2 60 80\n")
+    model = TraceMobility(str(trace), seconds_per_tick=2.0)
+    assert model.max_speed == pytest.approx(5.0)
+    store = NodeStore(capacity=3, rng=np.random.default_rng(0), area_size=100.0)
+    store.allocate_many([1, 2, 7], np.array([[0.0, 0.0], [0.0, 0.0], [42.0, 24.0]]))
+    rows = store.active_rows()
+
+    # Nodes jump onto the trace when first seen
+    assert model.move(store, rows, None, tick=0) == np.inf
+    assert np.allclose(store.xy.T, [[10, 10], [60, 80], [42, 24]])
+    assert model.move(store, rows, None, tick=1) == pytest.approx(10.0)
+    assert np.allclose(store.xy.T, [[14, 18], [70, 80], [42, 24]])
+    # Past its last sample a node holds its final position
+    model.move(store, rows, None, tick=8)
+    assert np.allclose(store.xy.T, [[30, 50], [80, 80], [42, 24]])
+
+
+def test_trace_from_an_array_matches_positions_at():
+    samples = np.array([[0, 3, 0, 0], [5, 3, 50, 0], [5, 4, 20, 20]], dtype=float)
+    model = TraceMobility(samples)
+    assert np.allclose(model.positions_at(np.array([0, 0, 1]), np.array([1.0, 2.5, 3.0])).T,
+                       [[10, 0], [25, 0], [20, 20]])
+
+
+def test_unknown_model_is_rejected():
+    assert isinstance(make_mobility('gauss_markov', mean_speed=2.0), GaussMarkov)
+    with pytest.raises(ValueError, match='bogus'):
+        make_mobility('bogus')
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from manet import MANET
+from node_store import Node, NodeMap, NodeStore
+
+
+def _node_map(count):
+    nodes = NodeMap(NodeStore(capacity=4, rng=np.random.default_rng(0)))
+    nodes.add_many(range(count))
+    return nodes
+
+
+def test_reassigning_a_node_keeps_its_row():
+    nodes = _node_map(5)
+    store = nodes.store
+    node = nodes[2]
+    node.reputation = 0.25
+    nodes[2] = node
+    nodes[3] = Node(3, store=store, row=nodes[3].row)
+    assert nodes[2] is node and node.row == 2 and node.reputation == 0.25
+    assert store.free_rows == []
+    assert store.alive[[2, 3]].all() and store.ids[[2, 3]].tolist() == [2, 3]
+    # The row is still in use, so a new node must not be given it
+    assert nodes.add(7).row == 5
+
+
+def test_replacing_a_node_releases_its_row():
+    nodes = _node_map(3)
+    released = []
+    nodes.store.release_hooks.append(lambda rows: released.extend(rows.tolist()))
+    nodes[1] = Node(1, is_malicious=True)
+    assert released == [1]
+    assert nodes[1].row == 1 and nodes[1].is_malicious
+    assert nodes.store.ids[:3].tolist() == [0, 1, 2]
+
+
+def test_a_node_cannot_be_stored_under_a_second_id():
+    nodes = _node_map(4)
+    store = nodes.store
+    with pytest.raises(ValueError):
+        nodes[5] = nodes[3]
+    assert 5 not in nodes and nodes.next_id == 4
+    del nodes[3]
+    # The row of the removed node is free again and goes to the next node
+    added = nodes.add(6)
+    assert added.row == 3 and store.ids[3] == 6 and store.alive[3]
+
+
+def test_a_node_from_another_network_is_copied():
+    first = _node_map(3)
+    second = _node_map(5)
+    node = first[1]
+    node.energy, node.reputation, node.position = 40.0, 0.5, (12.0, 34.0)
+    second[3] = node
+    copy = second[3]
+    # The caller's node still views the first network
+    assert copy is not node and node.row == 1 and node.node_id == 1
+    assert node.alive and first[1] is node
+    assert (copy.energy, copy.reputation, copy.position) == (40.0, 0.5, (12.0, 34.0))
+    copy.energy = 10.0
+    assert node.energy == 40.0 and first.store.energy[1] == 40.0
+    node.reputation = 0.9
+    assert copy.reputation == 0.5
+    assert second.store.ids[copy.row] == 3 and len(second) == 5
+
+
+def test_neighbors_are_read_only():
+    manet = MANET(num_nodes=0, seed=0)
+    manet.nodes.add_many([0, 1, 2], np.array([[10.0, 10.0], [20.0, 10.0], [90.0, 90.0]]))
+    manet.update_topology()
+    neighbors = manet.nodes[0].neighbors
+    assert neighbors == {1} and manet.nodes[2].neighbors == frozenset()
+    with pytest.raises(AttributeError):
+        neighbors.add(2)
+    with pytest.raises(AttributeError):
+        manet.nodes[1].neighbors.clear()
+
+
+def test_ids_are_never_reused_but_rows_are():
+    nodes = _node_map(6)
+    store = nodes.store
+    nodes.remove_many([1, 4])
+    del nodes[5]
+    assert store.free_rows == [1, 4, 5]
+    assert not store.alive[[1, 4, 5]].any() and (store.ids[[1, 4, 5]] == -1).all()
+    new_ids = nodes.new_ids(4)
+    assert new_ids == [6, 7, 8, 9]
+    added = nodes.add_many(new_ids, energy=50.0)
+    # Most recently released rows first, then a fresh row
+    assert [node.row for node in added] == [5, 4, 1, 6]
+    assert store.ids[[5, 4, 1, 6]].tolist() == new_ids
+    assert (store.energy[[5, 4, 1, 6]] == 50.0).all() and (store.reputation[[5, 4, 1, 6]] == 1.0).all()
+    assert sorted(store.active_rows().tolist()) == [0, 1, 2, 3, 4, 5, 6]
+    assert sorted(nodes) == [0, 2, 3, 6, 7, 8, 9]
+    assert all(store.ids[nodes[node_id].row] == node_id for node_id in nodes)
+
+
+def test_add_many_rejects_taken_and_duplicate_ids():
+    nodes = _node_map(3)
+    with pytest.raises(ValueError):
+        nodes.add_many([2, 3])
+    with pytest.raises(ValueError):
+        nodes.add_many([4, 4])
+    assert len(nodes) == 3 and nodes.store.free_rows == []
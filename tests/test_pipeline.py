@@ -0,0 +1,101 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pipeline import CommandQueue, FrameQueue, SimulationThread, take_snapshot
+from simulator import Simulator
+
+
+def _thread(num_nodes=30):
+    simulator = Simulator(num_nodes=num_nodes, seed=2)
+    frames = FrameQueue(maxsize=4)
+    thread = SimulationThread(simulator, frames, CommandQueue())
+    thread.ticks_per_second = 500.0
+    return simulator, frames, thread
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_stop_waits_for_the_loop_and_restarts_run_one_loop():
+    simulator, _, thread = _thread()
+    loops = []
+    for _ in range(20):
+        thread.start()
+        loops.append(thread._thread)
+        thread.stop()
+        assert not loops[-1].is_alive()
+        assert thread.ident is None
+    tick = simulator.tick
+    time.sleep(0.05)
+    assert simulator.tick == tick
+
+    thread.start()
+    thread.start()
+    _wait_for(lambda: simulator.tick > tick + 5)
+    assert [t for t in threading.enumerate() if t in loops] == []
+    assert thread.ident == thread._thread.ident
+    thread.stop()
+
+
+def test_commands_run_on_the_simulation_thread():
+    simulator, _, thread = _thread()
+    seen = []
+    thread.start()
+    try:
+        for _ in range(5):
+            thread.commands.submit(lambda: seen.append((threading.get_ident(), simulator.tick)))
+        _wait_for(lambda: len(seen) == 5)
+        assert {ident for ident, _ in seen} == {thread.ident}
+        assert threading.get_ident() not in {ident for ident, _ in seen}
+    finally:
+        thread.stop()
+
+
+def test_paused_commands_apply_and_publish_a_frame():
+    simulator, frames, thread = _thread()
+    thread.commands.submit(simulator.manet.join, 3)
+    thread.apply_now()
+    snapshot, skipped = frames.latest()
+    assert len(snapshot.ids) == 33 and skipped == []
+    assert snapshot.tick == simulator.tick == 0
+
+
+def test_frames_carry_the_net_link_changes_since_the_last_one():
+    simulator, frames, thread = _thread(num_nodes=60)
+    links = set(map(tuple, take_snapshot(simulator).links.tolist()))
+    for _ in range(3):
+        for _ in range(3):
+            simulator.step()
+        thread.publish()
+        snapshot, _ = frames.latest()
+        assert not set(snapshot.link_up) & set(snapshot.link_down)
+        links = (links - set(snapshot.link_down)) | set(snapshot.link_up)
+        assert links == {(min(a, b), max(a, b)) for a, b in snapshot.links.tolist()}
+
+
+def test_frame_queue_keeps_the_newest_frames():
+    frames = FrameQueue(maxsize=2)
+    for frame in range(5):
+        frames.publish(frame)
+    assert frames.dropped == 3
+    assert frames.latest() == (4, [3])
+    assert frames.latest() == (None, [])
+
+
+def test_snapshots_are_read_only():
+    simulator, _, _ = _thread()
+    snapshot = take_snapshot(simulator)
+    assert snapshot.link_up is None
+    with pytest.raises(ValueError):
+        snapshot.x[0] = 1.0
+    x = snapshot.x.copy()
+    simulator.step()
+    assert np.array_equal(snapshot.x, x)
+    assert not np.array_equal(take_snapshot(simulator).x, x)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from simulator import EventSimulator, Simulator
+
+
+def _tally(simulator, ticks):
+    forwarded = transmissions = 0
+    for _ in range(ticks):
+        simulator.step()
+        batch = simulator.last_batch
+        forwarded += int(np.count_nonzero(batch.forwarded))
+        transmissions += len(batch.senders)
+    return forwarded, transmissions
+
+
+def test_counters_follow_the_packets_of_every_tick():
+    for simulator in (Simulator(num_nodes=40, seed=1), EventSimulator(num_nodes=40, seed=1)):
+        simulator.run(3)
+        assert simulator.metrics()['counters'].get('packets_forwarded') is None
+        simulator.instrumentation.enabled = True
+        forwarded, transmissions = _tally(simulator, 20)
+        counters = simulator.metrics()['counters']
+        assert counters['packets_forwarded'] == forwarded
+        assert counters['transmissions'] == transmissions > 0
+        assert counters['route_cache_hits'] == simulator.manet.router.cache.hits
+        assert 'stats' in simulator.metrics()['phases']
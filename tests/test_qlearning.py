@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from manet import MANET
+from qlearning import MAX_ROWS, TOMBSTONE, SparseQTable, decode, encode
+
+
+def _check(table, reference):
+    # The table holds exactly the reference's entries, each in one slot
+    keys, values = table.entries()
+    assert len(table) == len(keys) == len(reference)
+    assert dict(zip(keys.tolist(), values.tolist())) == pytest.approx(reference)
+    assert len(table.keys) & (len(table.keys) - 1) == 0
+    assert len(table) <= table.max_load * len(table.keys)
+
+
+def _add(table, reference, keys, deltas):
+    table.add(keys, deltas)
+    for key, delta in zip(keys.tolist(), deltas.astype(np.float32).tolist()):
+        reference[key] = np.float32(reference.get(key, 0.0) + delta)
+
+
+def test_encode_decode_round_trip():
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, MAX_ROWS, size=(3, 1000))
+    for column, decoded in zip(rows, decode(encode(*rows))):
+        assert (decoded == column).all()
+
+
+@pytest.mark.parametrize('rows', [[MAX_ROWS], [0, -1], [3, MAX_ROWS + 5]])
+def test_encode_rejects_rows_that_do_not_fit(rows):
+    with pytest.raises(ValueError):
+        encode(np.zeros(len(rows), dtype=np.int64), rows, np.zeros(len(rows), dtype=np.int64))
+    with pytest.raises(ValueError):
+        encode(rows, np.zeros(len(rows), dtype=np.int64), np.zeros(len(rows), dtype=np.int64))
+
+
+@pytest.mark.parametrize('capacity', [16, 1024])
+def test_batched_adds_and_gets_match_a_dict(capacity):
+    # Keys drawn from a small range repeat within and across batches; a
+    # small table grows several times and probes long chains
+    table = SparseQTable(capacity=capacity)
+    reference = {}
+    rng = np.random.default_rng(1)
+    for _ in range(40):
+        keys = encode(*rng.integers(0, 12, size=(3, 200)))
+        _add(table, reference, keys, rng.normal(size=200).astype(np.float32))
+        _check(table, reference)
+        probe = encode(*rng.integers(0, 14, size=(3, 300)))
+        expected = [reference.get(key, 0.0) for key in probe.tolist()]
+        assert table.get(probe).tolist() == pytest.approx(expected)
+    assert len(table.keys) > capacity
+
+
+def test_colliding_keys_probe_past_each_other():
+    table = SparseQTable(capacity=16)
+    # Keys that hash to the same home slot of a 16-slot table
+    candidates = encode(np.zeros(5000, dtype=np.int64), np.zeros(5000, dtype=np.int64), np.arange(5000))
+    home = table._hash(candidates)
+    keys = candidates[home == home[0]][:6]
+    assert len(keys) == 6
+    reference = {}
+    _add(table, reference, keys, np.arange(1, 7, dtype=np.float32))
+    _check(table, reference)
+    assert len(table.keys) == 16
+    assert table.get(keys).tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_forget_drops_every_entry_that_mentions_a_row():
+    table = SparseQTable(capacity=64)
+    reference = {}
+    rng = np.random.default_rng(2)
+    rows = rng.integers(0, 30, size=(3, 2000))
+    _add(table, reference, encode(*rows), rng.normal(size=2000).astype(np.float32))
+    slots = table.keys
+    table.forget(np.array([3, 17]))
+    # Forgetting leaves tombstones in place instead of rebuilding the table
+    assert table.keys is slots and table.tombstones == (table.keys == TOMBSTONE).sum() > 0
+    reference = {key: value for key, value in reference.items()
+                 if not {3, 17} & set(int(part) for part in decode(key))}
+    _check(table, reference)
+    assert (table.keys[table.values != 0] >= 0).all()
+    # Forgotten keys read as 0 and can be learned again
+    again = encode([3], [0], [17])
+    assert table.get(again).tolist() == [0.0]
+    _add(table, reference, again, np.array([2.5], dtype=np.float32))
+    _check(table, reference)
+
+
+def test_forgotten_slots_are_reclaimed_by_a_rebuild():
+    table = SparseQTable(capacity=64)
+    reference = {}
+    rng = np.random.default_rng(3)
+    peak = 0
+    for row in range(40):
+        keys = encode(*rng.integers(0, 40, size=(3, 20)))
+        _add(table, reference, keys, rng.normal(size=20).astype(np.float32))
+        peak = max(peak, len(reference))
+        table.forget([row])
+        reference = {key: value for key, value in reference.items() if row not in decode(key)}
+        _check(table, reference)
+        assert len(table) + table.tombstones <= table.max_load * len(table.keys)
+    # Tombstones alone never make the table grow
+    assert len(table.keys) <= 4 * peak / table.max_load
+
+
+def _pair(edge_margin):
+    # Two nodes at the edge of each other's range
+    manet = MANET(num_nodes=0, seed=0, radio={'edge_margin': edge_margin})
+    manet.nodes.add_many([0, 1], np.array([[10.0, 10.0], [39.0, 10.0]]))
+    manet.update_topology()
+    return manet
+
+
+def test_a_lost_hop_leaves_the_packet_in_place():
+    manet = _pair(-30.0)
+    hops, status = manet.q_router.forward([0], [1])
+    assert hops.tolist() == [-1] and status.tolist() == [-1]
+    status, hop_count = manet.q_router.route_batch([0], [1])
+    assert status.tolist() == [-1] and hop_count.tolist() == [0]
+
+    manet = _pair(30.0)
+    status, hop_count = manet.q_router.route_batch([0], [1])
+    assert status.tolist() == [1] and hop_count.tolist() == [1]
@@ -0,0 +1,64 @@
+import numpy as np
+
+from node_store import NodeStore
+from radio import RadioModel
+
+
+def _store(count, area_size=200.0, seed=0):
+    store = NodeStore(capacity=count, rng=np.random.default_rng(seed), area_size=area_size)
+    store.allocate_many(range(count), np.random.default_rng(seed + 1).uniform(0, area_size, (count, 2)))
+    return store
+
+
+def _brute_force(radio, receivers, senders, transmitters, activity):
+    # Interference of each transmission summed over every transmitter in
+    # reach other than its sender and its receiver
+    xy = radio.store.xy
+    reach = radio.interference_range(activity)
+    total = np.zeros(len(receivers))
+    for i, (receiver, sender) in enumerate(zip(receivers.tolist(), senders.tolist())):
+        for transmitter in transmitters.tolist():
+            distance = np.hypot(*(xy[:, transmitter] - xy[:, receiver]))
+            if transmitter not in (sender, receiver) and distance <= reach:
+                total[i] += radio.received_power(distance)
+    return activity * total
+
+
+def test_interference_and_sinr_match_brute_force():
+    store = _store(300)
+    radio = RadioModel(store)
+    rng = np.random.default_rng(5)
+    senders = rng.choice(300, 400)
+    # Several transmissions share a receiver, some sent by one of its
+    # other interferers
+    receivers = rng.choice(np.arange(0, 300, 7), 400)
+    distinct = senders != receivers
+    senders, receivers = senders[distinct], receivers[distinct]
+    transmitters = np.unique(senders)
+    for activity in (0.02, 1.0):
+        expected = _brute_force(radio, receivers, senders, transmitters, activity)
+        assert np.allclose(radio.interference_at(receivers, senders, transmitters, activity), expected,
+                           rtol=1e-12, atol=0)
+
+    signal = radio.received_power(np.sqrt(store.squared_distances(senders, receivers)))
+    expected = radio.delivery_probability(10 * np.log10(signal / (radio.noise_mw + _brute_force(
+        radio, receivers, senders, transmitters, radio.activity))))
+    assert np.allclose(radio.link_probability(senders, receivers), expected, rtol=1e-12, atol=0)
+
+
+def test_a_sender_never_interferes_with_its_own_transmission():
+    # Node 0 sends right next to node 1 while node 2 is on air far away;
+    # node 0 only interferes where it is not the sender
+    store = NodeStore(capacity=3, rng=np.random.default_rng(0), area_size=300.0)
+    store.allocate_many([0, 1, 2], np.array([[10.0, 10.0], [10.5, 10.0], [100.0, 10.0]]))
+    radio = RadioModel(store)
+    senders, receivers = np.array([0, 2]), np.array([1, 0])
+    interference = radio.interference_at(receivers, senders, np.array([0, 2]), activity=1.0)
+    assert np.isclose(interference[0], radio.received_power(89.5), rtol=1e-12)
+    assert interference[1] == 0.0
+
+
+def test_no_activity_means_no_interference():
+    store = _store(20)
+    radio = RadioModel(store)
+    assert (radio.interference_at(np.arange(10), np.arange(10, 20), np.arange(10, 20), activity=0) == 0).all()
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from pipeline import take_snapshot
+from simulator import Simulator
+
+pytest.importorskip('pyarrow')
+
+from recording import TraceReader, TraceRecorder  # noqa: E402
+
+
+def _link_set(links):
+    return {(min(a, b), max(a, b)) for a, b in np.asarray(links).reshape(-1, 2).tolist()}
+
+
+@pytest.mark.parametrize('format', ['arrow', 'parquet'])
+def test_replay_matches_live_snapshots(tmp_path, format):
+    simulator = Simulator(num_nodes=40, seed=3)
+    simulator.traffic.packets_per_tick = 3
+    recorder = TraceRecorder(simulator, str(tmp_path), format=format, chunk_ticks=16, keyframe_ticks=7)
+    live = []
+    simulator.add_observer(lambda sim: live.append(take_snapshot(sim)))
+    simulator.run(80)
+    recorder.close()
+
+    reader = TraceReader(str(tmp_path))
+    assert len(reader) == len(live)
+    for snapshot in live:
+        frame = reader.frame(snapshot.tick)
+        assert frame.tick == snapshot.tick
+        np.testing.assert_array_equal(frame.ids, snapshot.ids)
+        # Positions and node state are recorded as float32
+        np.testing.assert_allclose(frame.x, snapshot.x, rtol=1e-6)
+        np.testing.assert_allclose(frame.y, snapshot.y, rtol=1e-6)
+        np.testing.assert_allclose(frame.energy, snapshot.energy, rtol=1e-6)
+        np.testing.assert_allclose(frame.reputation, snapshot.reputation, rtol=1e-6)
+        np.testing.assert_array_equal(frame.malicious, snapshot.malicious)
+        assert _link_set(frame.links) == _link_set(snapshot.links)
+        assert frame.routes == snapshot.routes
+        for key in ('nodes', 'malicious', 'active_routes', 'dead'):
+            assert frame.stats[key] == snapshot.stats[key], key
+        for key in ('success_rate', 'recent_success_rate', 'throughput'):
+            assert frame.stats[key] == pytest.approx(snapshot.stats[key]), key
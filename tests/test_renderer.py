@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from benchmark import RENDER_COLORS, HeadlessCanvas
+from pipeline import CommandQueue, FrameQueue, SimulationThread
+from renderer import NetworkRenderer
+from simulator import Simulator
+
+
+def _renderer():
+    return NetworkRenderer(HeadlessCanvas(), RENDER_COLORS, node_radius=4, detail_limit=1000)
+
+
+def _rescanned(renderer, snapshot):
+    # What a renderer that scans every link each frame would draw
+    reference = _renderer()
+    reference.zoom, reference.center = renderer.zoom, renderer.center
+    reference.render_snapshot(snapshot._replace(link_up=None, link_down=None))
+    return reference
+
+
+def _expected_links(renderer, snapshot):
+    # Links with at least one end inside the view, padded by a node's size
+    sx, sy = renderer.to_screen(snapshot.x, snapshot.y)
+    pad = renderer.node_radius + 8
+    visible = ((sx >= -pad) & (sx <= renderer.width + pad)
+               & (sy >= -pad) & (sy <= renderer.height + pad))
+    shown = set(snapshot.ids[visible].tolist())
+    return {(min(a, b), max(a, b)) for a, b in snapshot.links.tolist() if a in shown or b in shown}
+
+
+@pytest.mark.parametrize('every', [1, 3])
+def test_link_events_draw_the_same_edges_as_a_rescan(every):
+    simulator = Simulator(num_nodes=120, seed=4)
+    simulator.packets_per_tick = 2
+    frames = FrameQueue(maxsize=8)
+    publisher = SimulationThread(simulator, frames, CommandQueue())
+    renderer = _renderer()
+    publisher.publish()
+    renderer.render_snapshot(frames.latest()[0])
+    rng = np.random.default_rng(1)
+    for tick in range(60):
+        simulator.step()
+        publisher.publish()
+        if tick % every:
+            continue
+        if tick == 20:
+            renderer.zoom_at(300, 300, 3.0)
+        elif tick == 40:
+            renderer.pan(*rng.uniform(-150, 150, size=2))
+        snapshot, skipped = frames.latest()
+        renderer.render_snapshot(snapshot, skipped=skipped)
+        reference = _rescanned(renderer, snapshot)
+        assert set(renderer.edge_items) == set(reference.edge_items)
+        for link, xy in reference.edge_coords.items():
+            assert renderer.edge_coords[link] == xy
+        if renderer.lod != 'heatmap':
+            assert set(renderer.edge_items) == _expected_links(renderer, snapshot)
+        # Redrawing the same frame, as a selection change does, applies nothing twice
+        renderer.render_snapshot(snapshot)
+        assert set(renderer.edge_items) == set(reference.edge_items)
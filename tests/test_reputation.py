@@ -0,0 +1,80 @@
+import numpy as np
+
+from manet import MANET
+from node_store import NodeStore
+from reputation import ReputationEngine
+from simulator import Simulator
+from traffic import PoissonTraffic
+
+
+def _engine(count=4):
+    store = NodeStore(capacity=count, rng=np.random.default_rng(0))
+    store.allocate_many(range(count))
+    return ReputationEngine(store, decay=0.9)
+
+
+def test_updates_follow_the_decayed_beta_model():
+    engine = _engine()
+    rng = np.random.default_rng(1)
+    alpha, beta = np.zeros(4), np.zeros(4)
+    for _ in range(20):
+        relays = rng.integers(0, 4, size=30)
+        forwarded = rng.random(30) < np.array([0.9, 0.5, 0.1, 1.0])[relays]
+        engine.observe(relays, forwarded)
+        alpha = 0.9 * alpha + np.bincount(relays[forwarded], minlength=4)
+        beta = 0.9 * beta + np.bincount(relays[~forwarded], minlength=4)
+        engine.update()
+    assert np.allclose(engine.alpha, alpha) and np.allclose(engine.beta, beta)
+    assert np.allclose(engine.store.reputation[:4], (alpha + 4.0) / (alpha + beta + 4.0))
+    assert engine.trusted()[:4].tolist() == [True, True, False, True]
+
+
+def test_only_the_given_rows_take_in_their_evidence():
+    engine = _engine()
+    engine.observe([0, 1, 1], [False, False, True])
+    engine.update(np.array([1]))
+    assert engine.beta[:2].tolist() == [0.0, 1.0] and engine.alpha[1] == 1.0
+    assert engine.pending_dropped[0] == 1 and engine.store.reputation[0] == 1.0
+    engine.update()
+    assert engine.beta[0] == 1.0 and engine.store.reputation[0] == 0.8
+
+
+def test_a_dropping_relay_is_avoided_until_it_redeems_itself():
+    # A chain 0 - 1 - 3 with a longer detour 0 - 2 - 4 - 3
+    manet = MANET(num_nodes=0, seed=0)
+    manet.nodes.add_many(range(5), np.array([[10.0, 50.0], [35.0, 50.0], [30.0, 70.0], [60.0, 50.0], [50.0, 72.0]]))
+    manet.update_topology()
+    router = manet.router
+    assert router.find_row_path(0, 3) == [0, 1, 3]
+    for _ in range(3):
+        manet.reputation.observe([1, 1], [False, False])
+        manet.reputation.update()
+    assert not manet.reputation.trusted()[1]
+    assert router.find_row_path(0, 3) == [0, 2, 4, 3]
+    for _ in range(40):
+        manet.reputation.observe([1], [True])
+        manet.reputation.update()
+    assert manet.reputation.trusted()[1] and router.find_row_path(0, 3) == [0, 1, 3]
+
+
+def test_a_reused_row_starts_with_no_evidence():
+    manet = MANET(num_nodes=3, seed=0)
+    manet.reputation.observe([1, 1, 1], [False, False, False])
+    manet.reputation.update()
+    manet.nodes.remove_many([1])
+    row = manet.nodes.add(7).row
+    manet.reputation.update()
+    assert row == 1 and manet.reputation.beta[row] == 0 and manet.nodes[7].reputation == 1.0
+
+
+def test_only_malicious_nodes_lose_trust_in_a_run():
+    simulator = Simulator(num_nodes=150, malicious_ratio=0.2, seed=4, traffic=PoissonTraffic(30.0)).run(100)
+    store = simulator.manet.store
+    engine = simulator.manet.reputation
+    rows = store.active_rows()
+    malicious, honest = rows[store.malicious[rows]], rows[~store.malicious[rows]]
+    # Black holes never forward, and honest relays never drop
+    assert (engine.alpha[malicious] == 0).all() and (engine.beta[honest] == 0).all()
+    assert (store.reputation[honest] == 1.0).all()
+    seen = malicious[engine.beta[malicious] > 0]
+    assert len(seen) > len(malicious) / 2 and (store.reputation[seen] < 1.0).all()
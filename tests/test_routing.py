@@ -0,0 +1,92 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from manet import MANET
+from mobility import RandomJitter
+from routing import RouteCache
+
+
+def _reachable(manet, source, dest):
+    # Breadth-first search over the store's links with the router's trust
+    # rule: relays must be trusted, endpoints need not be
+    store = manet.store
+    threshold = manet.reputation.trust_threshold
+    adjacency = {}
+    for a, b in store.links.tolist():
+        adjacency.setdefault(a, []).append(b)
+        adjacency.setdefault(b, []).append(a)
+    seen = {source}
+    queue = deque([source])
+    while queue:
+        current = queue.popleft()
+        for nxt in adjacency.get(current, ()):
+            if nxt == dest:
+                return True
+            if nxt not in seen and store.reputation[nxt] >= threshold:
+                seen.add(nxt)
+                queue.append(nxt)
+    return source == dest
+
+
+def _valid(manet, path):
+    store = manet.store
+    links = {tuple(link) for link in store.links.tolist()}
+    rows = [manet.nodes[node_id].row for node_id in path]
+    return all((min(a, b), max(a, b)) in links for a, b in zip(rows, rows[1:]))
+
+
+@pytest.mark.parametrize('num_nodes', [15, 200, 800])
+def test_cached_answers_match_brute_force_under_mobility(num_nodes):
+    side = 100 * (num_nodes / 15) ** 0.5
+    manet = MANET(num_nodes=num_nodes, seed=5, area_size=side)
+    rng = np.random.default_rng(0)
+    pairs = [tuple(rng.choice(num_nodes, 2, replace=False).tolist()) for _ in range(15)]
+    mobility = RandomJitter(2.0)
+    for tick in range(25):
+        displacement = mobility.move(manet.store, manet.store.active_rows(), manet.store.rng, tick)
+        manet.update_topology(displacement)
+        for source, dest in pairs:
+            path = manet.router.find_path(source, dest)
+            reachable = _reachable(manet, manet.nodes[source].row, manet.nodes[dest].row)
+            assert (path is not None) == reachable
+            if path is not None:
+                assert path[0] == source and path[-1] == dest
+                assert _valid(manet, path)
+    assert manet.router.cache.hits > 0
+
+
+def test_link_up_keeps_routes_and_link_down_evicts_them():
+    cache = RouteCache(max_age=100)
+    cache.put(1, 4, [1, 2, 3, 4])
+    cache.put(5, 6, [5, 6])
+    cache.on_link_events([(1, 3), (2, 7)], [])
+    assert cache.get(1, 4) == [1, 2, 3, 4]
+    cache.on_link_events([], [(2, 3)])
+    assert cache.get(1, 4) is None
+    assert cache.get(5, 6) == [5, 6]
+    assert not cache.by_link.get((2, 3)) and 1 not in cache.by_node
+
+
+def test_unreachable_pairs_are_retried_only_when_a_link_leaves_their_reach():
+    cache = RouteCache(max_age=100)
+    cache.put(1, 9, None, reached=[1, 2, 3])
+    # A link inside the reached part cannot connect the pair
+    cache.on_link_events([(2, 3)], [])
+    assert (1, 9) in cache.routes
+    # Nor can one elsewhere in the network
+    cache.on_link_events([(7, 8)], [])
+    assert (1, 9) in cache.routes
+    cache.on_link_events([(3, 7)], [])
+    assert (1, 9) not in cache.routes
+    assert not any(cache.by_node.values())
+
+
+def test_entries_expire_after_max_age():
+    cache = RouteCache(max_age=2)
+    cache.put(1, 2, [1, 2])
+    for _ in range(3):
+        cache.on_link_events([], [])
+    assert cache.get(1, 2) is None
+    assert cache.routes == {}
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from simulator import Simulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_runs_without_a_gui_toolkit():
+    code = ("import sys; from simulator import Simulator; Simulator(num_nodes=40, seed=0).run(20); "
+            "print(sorted(name for name in ('tkinter', 'customtkinter') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_observers_see_every_tick_until_removed():
+    simulator = Simulator(num_nodes=30, seed=1)
+    seen = []
+
+    def observer(sim):
+        seen.append(sim.tick)
+
+    simulator.add_observer(observer)
+    assert simulator.run(5) is simulator
+    simulator.remove_observer(observer)
+    simulator.run(3)
+    assert seen == [1, 2, 3, 4, 5] and simulator.tick == 8
+
+
+def test_counters_add_up():
+    simulator = Simulator(num_nodes=60, seed=2).run(200)
+    assert simulator.total_routes == 200
+    assert simulator.success_count + simulator.stats.dropped == simulator.total_routes
+    assert simulator.success_rate == simulator.success_count / simulator.total_routes * 100
+    assert len(simulator.packet_routes) <= simulator.max_routes
+    if simulator.success_count:
+        assert simulator.average_path_length == simulator.total_hops / simulator.success_count
+
+
+def test_runs_with_the_same_seed_are_identical():
+    first = Simulator(num_nodes=50, seed=3).run(100)
+    second = Simulator(num_nodes=50, seed=3).run(100)
+    assert (first.success_count, first.total_hops) == (second.success_count, second.total_hops)
+    assert np.array_equal(first.manet.store.xy, second.manet.store.xy)
+    assert np.array_equal(first.manet.store.energy, second.manet.store.energy)
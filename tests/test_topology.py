@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from topology import GridNeighborIndex, make_neighbor_index
+
+
+def _brute_pairs(positions, r):
+    # Every pair within range, from the full distance matrix
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    d = positions[:, None, :] - positions[None, :, :]
+    i, j = np.nonzero(np.triu(np.einsum('ijk,ijk->ij', d, d) <= r * r, k=1))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+def _as_set(pairs):
+    # Canonical (low, high) pairs, each reported once
+    pairs = np.asarray(pairs).reshape(-1, 2)
+    assert (pairs[:, 0] < pairs[:, 1]).all()
+    found = set(map(tuple, pairs.tolist()))
+    assert len(found) == len(pairs)
+    return found
+
+
+@pytest.mark.parametrize('n, side, r', [(0, 100, 30), (1, 100, 30), (2, 10, 30), (300, 100, 10),
+                                        (300, 1000, 30), (400, 50, 30), (250, 100, 0.5)])
+def test_grid_pairs_match_brute_force(n, side, r):
+    rng = np.random.default_rng(n)
+    positions = rng.uniform(-side / 2, side / 2, size=(n, 2))
+    expected = _brute_pairs(positions, r)
+    assert _as_set(GridNeighborIndex().pairs(positions, r)) == expected
+    # Small chunks split the candidate expansion without changing the answer
+    assert _as_set(GridNeighborIndex(chunk_size=7).pairs(positions, r)) == expected
+
+
+def test_grid_pairs_include_nodes_exactly_at_range():
+    positions = np.array([[0.0, 0.0], [30.0, 0.0], [30.0, 30.0], [60.0, 30.0001]])
+    assert _as_set(GridNeighborIndex().pairs(positions, 30)) == {(0, 1), (1, 2)}
+
+
+@pytest.mark.parametrize('n', [40, 500])
+def test_grid_candidates_cover_every_neighbor(n):
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(0, 200, size=(n, 2))
+    rows = rng.choice(n, n // 4, replace=False)
+    ii, jj = GridNeighborIndex().candidates(positions, rows, 20)
+    candidates = set(zip(ii.tolist(), jj.tolist()))
+    assert all(i != j for i, j in candidates)
+    for i, j in _brute_pairs(positions, 20):
+        if i in rows:
+            assert (i, j) in candidates
+        if j in rows:
+            assert (j, i) in candidates
+
+
+def test_kdtree_pairs_match_brute_force():
+    pytest.importorskip('scipy')
+    positions = np.random.default_rng(2).uniform(0, 100, size=(300, 2))
+    assert _as_set(make_neighbor_index('kdtree').pairs(positions, 12)) == _brute_pairs(positions, 12)
+
+
+def _brute_links(manet):
+    # Links between live nodes as id pairs, from an all-pairs scan
+    store = manet.store
+    rows = store.active_rows()
+    pairs = _brute_pairs(store.xy[:, rows].T, manet.transmission_range)
+    ids = store.ids[rows].tolist()
+    return {(min(ids[i], ids[j]), max(ids[i], ids[j])) for i, j in pairs}
+
+
+def _store_links(manet):
+    store = manet.store
+    links = {tuple(pair) for pair in store.ids[store.links].tolist()}
+    assert len(links) == len(store.links)
+    # The CSR view lists every link from both ends
+    assert sum(len(store.neighbor_rows(row)) for row in range(store.size)) == 2 * len(links)
+    return {(min(a, b), max(a, b)) for a, b in links}
+
+
+@pytest.mark.parametrize('mobility', ['jitter', 'waypoint', 'gauss_markov'])
+def test_incremental_topology_matches_brute_force(mobility):
+    from manet import MANET
+    from mobility import GaussMarkov, RandomJitter, RandomWaypoint
+
+    model = {'jitter': RandomJitter(3.0), 'waypoint': RandomWaypoint(max_speed=4.0),
+             'gauss_markov': GaussMarkov(mean_speed=2.0)}[mobility]
+    manet = MANET(num_nodes=150, seed=7, area_size=180.0)
+    store = manet.store
+    rng = np.random.default_rng(3)
+    # The link set rebuilt from events alone; join and leave update too
+    links = _brute_links(manet)
+    assert manet.topology.links() == links
+
+    def apply(link_up, link_down):
+        assert not set(link_up) & set(link_down)
+        assert set(link_down) <= links and not set(link_up) & links
+        links.difference_update(link_down)
+        links.update(link_up)
+
+    manet.link_listeners.append(apply)
+    for tick in range(60):
+        displacement = model.move(store, store.active_rows(), store.rng, tick)
+        if tick % 10 == 3:
+            manet.join(int(rng.integers(1, 6)))
+        if tick % 10 == 7:
+            manet.leave(rng.choice(list(manet.nodes), 4, replace=False).tolist())
+        if tick % 15 == 11:
+            store.kill(rng.choice(store.active_rows(), 2, replace=False))
+        manet.update_topology(displacement)
+        expected = _brute_links(manet)
+        assert links == expected
+        assert manet.topology.links() == expected
+        assert _store_links(manet) == expected
+    assert manet.topology.checks > 0
@@ -0,0 +1,85 @@
+from collections import deque
+
+import numpy as np
+
+from forwarding import BatchForwarder
+from manet import MANET
+from traffic import DELIVERED, ConstantBitrateTraffic, HotspotTraffic, PoissonTraffic, TrafficStats, distinct_pairs
+
+
+def _hop_counts(manet, source):
+    # Breadth-first hop counts from `source` over the store's links
+    store = manet.store
+    counts = {source: 0}
+    queue = deque([source])
+    while queue:
+        row = queue.popleft()
+        for nxt in store.neighbor_rows(row).tolist():
+            if nxt not in counts:
+                counts[nxt] = counts[row] + 1
+                queue.append(nxt)
+    return counts
+
+
+def test_pairs_are_distinct_active_rows():
+    rng = np.random.default_rng(0)
+    rows = np.array([2, 3, 5, 8, 13])
+    sources, dests = distinct_pairs(rows, 5000, rng)
+    assert len(sources) == len(dests) == 5000
+    assert np.isin(sources, rows).all() and np.isin(dests, rows).all() and (sources != dests).all()
+    # Every ordered pair turns up about equally often
+    pairs = np.unique(sources * 100 + dests, return_counts=True)[1]
+    assert len(pairs) == 20 and pairs.min() > 150
+    assert all(len(part) == 0 for part in distinct_pairs(rows[:1], 10, rng))
+
+
+def test_arrival_processes():
+    rng = np.random.default_rng(1)
+    rows = np.arange(50)
+    assert len(ConstantBitrateTraffic(7).generate(rows, rng)[0]) == 7
+    counts = [len(PoissonTraffic(40.0).generate(rows, rng, tick)[0]) for tick in range(500)]
+    assert abs(np.mean(counts) - 40.0) < 1.0
+
+    hotspot = HotspotTraffic(rate=200.0, hotspots=2, fraction=0.8)
+    sources, dests = hotspot.generate(rows, rng)
+    sinks = hotspot.hotspot_rows(rows, rng)
+    assert len(sinks) == 2 and (sources != dests).all()
+    assert 0.75 < np.isin(dests, sinks).mean() < 0.9
+    # The same sinks are kept while they are alive
+    assert np.array_equal(hotspot.hotspot_rows(rows, rng), sinks)
+
+
+def test_batched_forwarding_takes_shortest_paths():
+    manet = MANET(num_nodes=300, malicious_ratio=0.0, seed=4, area_size=200.0)
+    rng = np.random.default_rng(2)
+    sources, dests = distinct_pairs(manet.store.active_rows(), 500, rng)
+    batch = BatchForwarder(manet, group_size=16, max_paths=500).forward(sources, dests)
+    stats = TrafficStats()
+    stats.record(batch)
+
+    hops = {}
+    for source, dest in zip(sources.tolist(), dests.tolist()):
+        hops.setdefault(source, _hop_counts(manet, source))
+    expected = np.array([hops[s].get(d, -1) for s, d in zip(sources.tolist(), dests.tolist())])
+    delivered = batch.status == DELIVERED
+    assert delivered.any() and np.array_equal(delivered, expected > 0)
+    assert np.array_equal(batch.hops[delivered], expected[delivered])
+    assert stats.delivered == delivered.sum() and stats.dropped == len(sources) - delivered.sum()
+    assert stats.total_hops == expected[delivered].sum()
+    # One transmission per hop, each over a link
+    assert len(batch.senders) == batch.hops.sum() and (batch.receivers >= 0).all()
+    links = set(map(tuple, manet.store.links.tolist()))
+    assert all((min(a, b), max(a, b)) in links for a, b in zip(batch.senders.tolist(), batch.receivers.tolist()))
+
+
+def test_malicious_relays_drop_what_they_are_handed():
+    manet = MANET(num_nodes=300, malicious_ratio=0.2, seed=5, area_size=200.0)
+    rng = np.random.default_rng(3)
+    sources, dests = distinct_pairs(manet.store.active_rows(), 400, rng)
+    batch = BatchForwarder(manet, max_paths=400).forward(sources, dests)
+    store = manet.store
+    assert (~batch.forwarded).any() and (batch.status == DELIVERED).any()
+    assert not store.malicious[batch.observed[batch.forwarded]].any()
+    assert store.malicious[batch.observed[~batch.forwarded]].all()
+    for path in batch.paths:
+        assert not any(manet.nodes[node].is_malicious for node in path[1:-1])
@@ -0,0 +1,375 @@
+import numpy as np
+
+# Half of the 3x3 cell neighbourhood; the mirrored offsets are covered when the
+# other cell of the pair is visited, so every candidate pair is produced once.
+HALF_STENCIL = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _empty_pairs():
+    return np.empty((0, 2), dtype=np.int64)
+
+
+def _canonical(i, j):
+    return np.stack([np.minimum(i, j), np.maximum(i, j)], axis=1)
+
+
+def _cell_keys(positions, r):
+    # Cells are anchored at the origin so a node keeps its cell between calls.
+    cells = np.floor(positions / r).astype(np.int64)
+    cells -= cells.min(axis=0)
+    cols = int(cells[:, 1].max()) + 3
+    return (cells[:, 0] + 1) * cols + (cells[:, 1] + 1), cols
+
+
+class GridNeighborIndex:
+    # Cells are as wide as the transmission range, so a node can only link to
+    # nodes in its own cell or one of the eight cells around it.
+    def __init__(self, chunk_size=1 << 20, small_network=64):
+        self.chunk_size = chunk_size
+        self.small_network = small_network
+
+    def pairs(self, positions, transmission_range):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        n = len(positions)
+        if n < 2:
+            return _empty_pairs()
+
+        r = float(transmission_range)
+        keys, cols = _cell_keys(positions, r)
+
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        sorted_pos = positions[order]
+
+        found = []
+        rows = np.arange(n)
+        for dx, dy in HALF_STENCIL:
+            target = sorted_keys + dx * cols + dy
+            hi = np.searchsorted(sorted_keys, target, side='right')
+            if dx == 0 and dy == 0:
+                lo = rows + 1
+            else:
+                lo = np.searchsorted(sorted_keys, target, side='left')
+            counts = np.maximum(hi - lo, 0)
+            self._scan(rows, lo, counts, sorted_pos, r * r, found)
+
+        if not found:
+            return _empty_pairs()
+        found = np.concatenate(found)
+        return _canonical(order[found[:, 0]], order[found[:, 1]])
+
+    def candidates(self, positions, rows, transmission_range):
+        # Every (row, other) pair where other sits in the 3x3 cell block around
+        # row; any node within range of row is guaranteed to be among them.
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(positions) < 2 or not len(rows):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        if len(positions) <= self.small_network:
+            # Cell bookkeeping costs more than checking everything
+            ii = np.repeat(rows, len(positions))
+            jj = np.tile(np.arange(len(positions)), len(rows))
+            keep = ii != jj
+            return ii[keep], jj[keep]
+
+        keys, cols = _cell_keys(positions, float(transmission_range))
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        ii = []
+        jj = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                target = keys[rows] + dx * cols + dy
+                lo = np.searchsorted(sorted_keys, target, side='left')
+                counts = np.searchsorted(sorted_keys, target, side='right') - lo
+                total = int(counts.sum())
+                if total:
+                    ii.append(np.repeat(rows, counts))
+                    jj.append(order[np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)])
+
+        if not ii:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        ii = np.concatenate(ii)
+        jj = np.concatenate(jj)
+        keep = ii != jj
+        return ii[keep], jj[keep]
+
+    def _scan(self, rows, lo, counts, sorted_pos, r2, found):
+        # Expand (row, candidate range) into explicit pairs a chunk at a time so
+        # dense layouts never materialise every candidate at once.
+        csum = np.cumsum(counts)
+        start = 0
+        while start < len(rows):
+            limit = csum[start] - counts[start] + self.chunk_size
+            stop = max(int(np.searchsorted(csum, limit, side='right')), start + 1)
+            c = counts[start:stop]
+            total = int(c.sum())
+            if total:
+                ii = np.repeat(rows[start:stop], c)
+                jj = np.repeat(lo[start:stop] - (np.cumsum(c) - c), c) + np.arange(total)
+                d = sorted_pos[ii] - sorted_pos[jj]
+                keep = np.einsum('ij,ij->i', d, d) <= r2
+                if keep.any():
+                    found.append(np.stack([ii[keep], jj[keep]], axis=1))
+            start = stop
+
+
+class KDTreeNeighborIndex:
+    def __init__(self):
+        # scipy is imported only when the index is used, it costs more to
+        # import than the rest of the simulator
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            raise ImportError("the 'kdtree' neighbor index requires scipy") from None
+        self.tree = cKDTree
+
+    def pairs(self, positions, transmission_range):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if len(positions) < 2:
+            return _empty_pairs()
+        found = self.tree(positions).query_pairs(float(transmission_range), output_type='ndarray')
+        if not len(found):
+            return _empty_pairs()
+        return _canonical(found[:, 0].astype(np.int64), found[:, 1].astype(np.int64))
+
+
+class IncrementalTopology:
+    # Keeps the link set between ticks and only re-evaluates nodes whose links
+    # could have changed. Nodes are identified by slot, their position in the
+    # arrays passed to update(), and slots with key -1 are empty, so a slot
+    # keeps its index while other nodes come and go. A node is re-evaluated
+    # when it joins, changes grid cell or drifts more than `skin` from where
+    # it was last evaluated; a node that leaves only drops its own links.
+    # Pairs that were within 3 * skin of the range edge at evaluation time
+    # are kept in a band and re-checked every tick; every other pair provably
+    # cannot flip before one of its endpoints is re-evaluated. When the
+    # caller passes the mobility model's bound on per-tick displacement,
+    # whole ticks are skipped while no band pair can have crossed the edge
+    # and no node can have drifted past the skin.
+    def __init__(self, index=None, incremental=True, skin=None):
+        self.index = index if index is not None else GridNeighborIndex()
+        self.grid = self.index if isinstance(self.index, GridNeighborIndex) else GridNeighborIndex()
+        self.incremental = incremental
+        self.skin = skin
+        self.keys = np.empty(0, dtype=np.int64)
+        self.active = np.empty(0, dtype=bool)
+        self.adjacency = []
+        self.anchors = np.empty((0, 2))
+        self.cells = np.empty((0, 2), dtype=np.int64)
+        self.band = _empty_pairs()
+        self.transmission_range = None
+        self.dirty_count = 0
+        self.rebuilt = False
+        self.row_events = (_empty_pairs(), _empty_pairs())
+        self.travel = 0.0
+        self.drift = 0.0
+        self.gap = 0.0
+        self.skipped = 0
+        # Pairwise distance checks made by incremental updates
+        self.checks = 0
+        self.joined = 0
+        self.left = 0
+
+    def reset(self):
+        # Forget the link set, e.g. after the store was replaced wholesale;
+        # the next update rebuilds from scratch
+        self.transmission_range = None
+
+    def links(self):
+        return set(self._to_keys(self._link_pairs()))
+
+    def _link_pairs(self):
+        return [(a, b) for a, nbrs in enumerate(self.adjacency) for b in nbrs if a < b]
+
+    def link_rows(self):
+        # Current links as canonical pairs of slots
+        return np.array(self._link_pairs(), dtype=np.int64).reshape(-1, 2)
+
+    def update(self, keys, positions, transmission_range, max_displacement=None):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        keys = np.asarray(keys, dtype=np.int64)
+
+        if (transmission_range != self.transmission_range or not self.incremental
+                or len(keys) < len(self.keys)):
+            return self._rebuild(keys, positions, transmission_range)
+        self.rebuilt = False
+
+        r = float(transmission_range)
+        link_up = set()
+        link_down = set()
+        changed, joined, departed = self._patch(keys, positions, r)
+
+        if max_displacement is not None:
+            self.travel += max_displacement
+            if not len(changed) and 2 * self.travel < self.gap and self.drift + self.travel < self._skin(r):
+                self.dirty_count = 0
+                self.skipped += 1
+                self.row_events = (_empty_pairs(), _empty_pairs())
+                return [], []
+        drift = np.sqrt(((positions - self.anchors) ** 2).sum(axis=1))
+        cells = np.floor(positions / r).astype(np.int64)
+        dirty_mask = (drift >= self._skin(r)) | (cells != self.cells).any(axis=1)
+        dirty_mask[joined] = True
+        dirty_mask &= self.active
+        dirty = np.flatnonzero(dirty_mask)
+        self.dirty_count = len(dirty)
+
+        # Band pairs between two clean nodes only need a distance check
+        if len(self.band):
+            band = self.band[~(dirty_mask[self.band[:, 0]] | dirty_mask[self.band[:, 1]])]
+            d = positions[band[:, 0]] - positions[band[:, 1]]
+            within = np.einsum('ij,ij->i', d, d) <= r * r
+            self.checks += len(band)
+            for a, b, linked in zip(band[:, 0].tolist(), band[:, 1].tolist(), within.tolist()):
+                if linked and b not in self.adjacency[a]:
+                    link_up.add((a, b))
+                elif not linked and b in self.adjacency[a]:
+                    link_down.add((a, b))
+            self.band = band
+
+        if len(dirty):
+            new_links = self._evaluate(positions, dirty, r)
+            for row in dirty.tolist():
+                old = self.adjacency[row]
+                new = new_links[row]
+                for other in new - old:
+                    link_up.add((min(row, other), max(row, other)))
+                for other in old - new:
+                    link_down.add((min(row, other), max(row, other)))
+
+        for a, b in link_up:
+            self.adjacency[a].add(b)
+            self.adjacency[b].add(a)
+        for a, b in link_down:
+            self.adjacency[a].discard(b)
+            self.adjacency[b].discard(a)
+
+        # A reused slot can lose a link and gain it again with its new node,
+        # so departures are listed apart; the store applies downs first
+        self.row_events = (
+            np.array(sorted(link_up), dtype=np.int64).reshape(-1, 2),
+            np.array(sorted(link_down | set(departed)), dtype=np.int64).reshape(-1, 2)
+        )
+        self._settle(positions, r)
+        # Links of nodes that left are reported under the keys they had
+        return self._to_keys(link_up), sorted(self._to_keys(link_down) + list(departed.values()))
+
+    def _patch(self, keys, positions, r):
+        # Apply joins and leaves since the last update: slots that emptied
+        # or changed key drop their links, slots that gained a key are
+        # returned to be evaluated. Costs one comparison of the key arrays
+        # plus work proportional to the slots that changed. Returns the
+        # changed slots, the joined slots and {slot pair: key pair} of the
+        # links that went away with departing nodes.
+        grown = len(keys) - len(self.keys)
+        if grown:
+            self.keys = np.concatenate([self.keys, np.full(grown, -1, dtype=np.int64)])
+            self.active = np.concatenate([self.active, np.zeros(grown, dtype=bool)])
+            self.adjacency.extend(set() for _ in range(grown))
+            self.anchors = np.concatenate([self.anchors, positions[-grown:]])
+            self.cells = np.concatenate([self.cells, np.floor(positions[-grown:] / r).astype(np.int64)])
+
+        changed = np.flatnonzero(keys != self.keys)
+        departed = {}
+        if not len(changed):
+            return changed, changed, departed
+        for slot in changed[self.keys[changed] >= 0].tolist():
+            for other in self.adjacency[slot]:
+                link = (min(slot, other), max(slot, other))
+                departed[link] = self._to_keys([link])[0]
+                self.adjacency[other].discard(slot)
+            self.adjacency[slot] = set()
+        self.left += int((self.keys[changed] >= 0).sum())
+        self.keys = keys.copy()
+        self.active = keys >= 0
+        joined = changed[self.active[changed]]
+        self.joined += len(joined)
+        if len(self.band):
+            self.band = self.band[~np.isin(self.band, changed).any(axis=1)]
+        return changed, joined, departed
+
+    def _settle(self, positions, r):
+        # Slack left after a full check: the largest drift from the anchors
+        # and the smallest distance of a band pair from the range edge
+        self.travel = 0.0
+        drift = positions[self.active] - self.anchors[self.active]
+        self.drift = float(np.sqrt(np.einsum('ij,ij->i', drift, drift).max(initial=0.0)))
+        if len(self.band):
+            d = positions[self.band[:, 0]] - positions[self.band[:, 1]]
+            self.gap = float(np.abs(np.sqrt(np.einsum('ij,ij->i', d, d)) - r).min())
+        else:
+            self.gap = np.inf
+
+    def _skin(self, r):
+        return self.skin if self.skin is not None else r / 10.0
+
+    def _rebuild(self, keys, positions, transmission_range):
+        before = self.links()
+
+        self.keys = keys.copy()
+        self.active = keys >= 0
+        self.transmission_range = transmission_range
+        self.adjacency = [set() for _ in range(len(keys))]
+        self.anchors = positions.copy()
+        self.cells = np.floor(positions / float(transmission_range)).astype(np.int64)
+        self.band = _empty_pairs()
+        self.rebuilt = True
+        self.row_events = (_empty_pairs(), _empty_pairs())
+        active = np.flatnonzero(self.active)
+        self.dirty_count = len(active)
+
+        if self.incremental:
+            for row, nbrs in self._evaluate(positions, active, float(transmission_range)).items():
+                self.adjacency[row] = nbrs
+        else:
+            for a, b in active[self.index.pairs(positions[active], transmission_range)].tolist():
+                self.adjacency[a].add(b)
+                self.adjacency[b].add(a)
+
+        if self.incremental:
+            self._settle(positions, float(transmission_range))
+        after = self.links()
+        return sorted(after - before), sorted(before - after)
+
+    def _evaluate(self, positions, rows, r):
+        ii, jj = self.grid.candidates(positions, rows, r)
+        keep = self.active[jj]
+        ii, jj = ii[keep], jj[keep]
+        self.checks += len(ii)
+        d = positions[ii] - positions[jj]
+        dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+
+        self.anchors[rows] = positions[rows]
+        self.cells[rows] = np.floor(positions[rows] / r).astype(np.int64)
+
+        near_edge = np.abs(dist - r) < 3 * self._skin(r)
+        if near_edge.any():
+            band = np.concatenate([self.band, _canonical(ii[near_edge], jj[near_edge])])
+            keys = np.unique((band[:, 0] << 32) | band[:, 1])
+            self.band = np.stack([keys >> 32, keys & 0xFFFFFFFF], axis=1)
+
+        new_links = {row: set() for row in rows.tolist()}
+        within = dist <= r
+        for a, b in zip(ii[within].tolist(), jj[within].tolist()):
+            new_links[a].add(b)
+        return new_links
+
+    def _to_keys(self, pairs):
+        # Key pairs are canonical (low, high) like slot pairs
+        keys = self.keys.tolist() if len(pairs) > 64 else self.keys
+        return sorted((int(min(keys[a], keys[b])), int(max(keys[a], keys[b]))) for a, b in pairs)
+
+
+NEIGHBOR_INDEXES = {
+    'grid': GridNeighborIndex,
+    'kdtree': KDTreeNeighborIndex,
+}
+
+
+def make_neighbor_index(kind='grid'):
+    if kind not in NEIGHBOR_INDEXES:
+        raise ValueError(f"Unknown neighbor index '{kind}', expected one of {sorted(NEIGHBOR_INDEXES)}")
+    return NEIGHBOR_INDEXES[kind]()
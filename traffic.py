@@ -0,0 +1,146 @@
+import numpy as np
+
+
+def distinct_pairs(rows, count, rng, sources=None):
+    # Random (source, dest) row pairs with source != dest, drawn straight
+    # from the store's cached array of active rows
+    n = len(rows)
+    if n < 2 or count <= 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    if sources is None:
+        source_index = rng.integers(0, n, size=count)
+    else:
+        source_index = np.searchsorted(rows, sources)
+    dest_index = (source_index + rng.integers(1, n, size=count)) % n
+    return rows[source_index], rows[dest_index]
+
+
+class TrafficGenerator:
+    def packet_count(self, tick, rng):
+        raise NotImplementedError
+
+    def generate(self, rows, rng, tick=0):
+        return distinct_pairs(rows, self.packet_count(tick, rng), rng)
+
+
+class ConstantBitrateTraffic(TrafficGenerator):
+    def __init__(self, packets_per_tick=1):
+        self.packets_per_tick = packets_per_tick
+
+    def packet_count(self, tick, rng):
+        return self.packets_per_tick
+
+
+class PoissonTraffic(TrafficGenerator):
+    def __init__(self, rate=100.0):
+        self.rate = rate
+
+    def packet_count(self, tick, rng):
+        return int(rng.poisson(self.rate))
+
+
+class HotspotTraffic(PoissonTraffic):
+    # A fraction of the packets is addressed to a few hotspot nodes (sinks);
+    # the rest is uniform. Hotspots are store rows.
+    def __init__(self, rate=100.0, hotspots=1, fraction=0.8):
+        super().__init__(rate)
+        self.hotspots = hotspots
+        self.fraction = fraction
+        self._hotspot_rows = None
+
+    def hotspot_rows(self, rows, rng):
+        if isinstance(self.hotspots, int):
+            current = self._hotspot_rows
+            if current is None or not np.isin(current, rows).all():
+                self._hotspot_rows = rng.choice(rows, size=min(self.hotspots, len(rows)), replace=False)
+            return self._hotspot_rows
+        return np.intersect1d(np.asarray(self.hotspots, dtype=np.int64), rows)
+
+    def generate(self, rows, rng, tick=0):
+        sources, dests = distinct_pairs(rows, self.packet_count(tick, rng), rng)
+        hotspots = self.hotspot_rows(rows, rng)
+        if not len(sources) or not len(hotspots):
+            return sources, dests
+        to_hotspot = rng.random(len(sources)) < self.fraction
+        dests = dests.copy()
+        dests[to_hotspot] = hotspots[rng.integers(0, len(hotspots), size=int(to_hotspot.sum()))]
+        # Hotspots do not send to themselves; fall back to the uniform pick
+        clash = sources == dests
+        if clash.any():
+            _, dests[clash] = distinct_pairs(rows, int(clash.sum()), rng, sources=sources[clash])
+        return sources, dests
+
+
+TRAFFIC_MODELS = {
+    'cbr': ConstantBitrateTraffic,
+    'poisson': PoissonTraffic,
+    'hotspot': HotspotTraffic,
+}
+
+
+def make_traffic(kind='cbr', **params):
+    if kind not in TRAFFIC_MODELS:
+        raise ValueError(f"Unknown traffic model '{kind}', expected one of {sorted(TRAFFIC_MODELS)}")
+    return TRAFFIC_MODELS[kind](**params)
+
+
+# Packet status codes
+IN_FLIGHT = 0
+DELIVERED = 1
+DROPPED = -1
+
+
+class PacketBatch:
+    # Outcome of one tick's packets; rows are store rows, paths are node ids.
+    # observed/forwarded are the watchdog's view: every relay that was handed
+    # a packet and whether it was overheard passing it on. senders/receivers
+    # list every transmission for energy accounting, receiver -1 if unheard.
+    # latencies, in simulated time, are only known to the event simulator.
+    def __init__(self, sources, dests, status, hops, paths=None, observed=None, forwarded=None,
+                 senders=None, receivers=None, latencies=None):
+        self.sources = sources
+        self.dests = dests
+        self.status = status
+        self.hops = hops
+        self.paths = paths if paths is not None else []
+        self.observed = observed if observed is not None else np.zeros(0, dtype=np.int64)
+        self.forwarded = forwarded if forwarded is not None else np.zeros(0, dtype=bool)
+        self.senders = senders if senders is not None else np.zeros(0, dtype=np.int64)
+        self.receivers = receivers if receivers is not None else np.zeros(0, dtype=np.int64)
+        self.latencies = latencies
+
+    def __len__(self):
+        return len(self.sources)
+
+    @property
+    def delivered(self):
+        return int((self.status == DELIVERED).sum())
+
+    @property
+    def dropped(self):
+        return int((self.status == DROPPED).sum())
+
+
+class TrafficStats:
+    def __init__(self):
+        self.generated = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.total_hops = 0
+        self.last_batch = None
+
+    def record(self, batch):
+        self.generated += len(batch)
+        self.delivered += batch.delivered
+        self.dropped += batch.dropped
+        self.total_hops += int(batch.hops[batch.status == DELIVERED].sum())
+        self.last_batch = batch
+
+    @property
+    def delivery_ratio(self):
+        return self.delivered / self.generated if self.generated else 0.0
+
+    @property
+    def average_hops(self):
+        return self.total_hops / self.delivered if self.delivered else 0.0
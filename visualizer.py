@@ -0,0 +1,600 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import customtkinter as ctk
+import numpy as np
+from pipeline import CommandQueue, FrameQueue, SimulationThread
+from profiling import Instrumentation, Sampler
+from recording import TraceReader, TraceRecorder
+from renderer import NetworkRenderer, PickIndex
+from simulator import Simulator
+
+class EnhancedMANETVisualizer(ctk.CTk):
+    def __init__(self):
+        super().__init__()
+        
+        # Window setup
+        self.title("Enhanced MANET Routing Visualization")
+        self.geometry("1400x900")
+        ctk.set_appearance_mode("dark")
+        ctk.set_default_color_theme("blue")
+        
+        # Initialize MANET
+        self.simulator = Simulator(num_nodes=15)
+        self.manet = self.simulator.manet
+        self.selected_node = None
+        self.animation_speed = 1.0
+        self.is_simulating = False
+        
+        # The simulation runs on its own thread and hands immutable snapshots
+        # to the Tk thread; node edits travel the other way as commands
+        self.frames = FrameQueue(maxsize=2)
+        self.commands = CommandQueue()
+        self.sim_thread = SimulationThread(self.simulator, self.frames, self.commands)
+        self.frame_interval = 33
+        self.snapshot = None
+        self.skipped = []
+        self.frames_dropped = 0
+        self.recorder = None
+        self.is_recording = False
+        self.replay = None
+        self.sampler = None
+        self.pick_index = None
+        self.pick_source = None
+        self.drag_from = None
+        self.dragged = False
+        
+        self.setup_styles()
+        self.create_gui()
+        self.renderer = NetworkRenderer(self.canvas, self.colors, self.node_radius)
+        # The Tk thread times itself; the simulation's instrumentation is
+        # only written by the simulation thread
+        self.ui_instrumentation = Instrumentation()
+        self.ui_instrumentation.watch('canvas_items', lambda: self.renderer.items_created)
+        
+        self.sim_thread.apply_now()
+        self.after(self.frame_interval, self.poll_frames)
+        
+    def create_gui(self):
+        # Main container with gradient background
+        self.main_frame = ctk.CTkFrame(self)
+        self.main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Left panel (70% width) for visualization
+        self.viz_frame = ctk.CTkFrame(self.main_frame)
+        self.viz_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # Network canvas with dark theme
+        self.canvas = tk.Canvas(
+            self.viz_frame,
+            background='#1a1a1a',
+            highlightthickness=0
+        )
+        self.canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.canvas.bind('<ButtonPress-1>', self.on_canvas_press)
+        self.canvas.bind('<B1-Motion>', self.on_canvas_drag)
+        self.canvas.bind('<ButtonRelease-1>', self.on_canvas_release)
+        self.canvas.bind('<MouseWheel>', self.on_canvas_wheel)
+        self.canvas.bind('<Button-4>', self.on_canvas_wheel)
+        self.canvas.bind('<Button-5>', self.on_canvas_wheel)
+        
+        # Right panel (30% width) for controls
+        self.control_panel = ctk.CTkFrame(self.main_frame, width=400)
+        self.control_panel.pack(side=tk.RIGHT, fill=tk.BOTH, padx=5, pady=5)
+        
+        self.create_control_panel()
+        
+    def create_control_panel(self):
+        # Title
+        title = ctk.CTkLabel(
+            self.control_panel,
+            text="MANET Control Center",
+            font=("Helvetica", 24, "bold")
+        )
+        title.pack(pady=20)
+        
+        # Simulation Controls
+        sim_frame = ctk.CTkFrame(self.control_panel)
+        sim_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ctk.CTkLabel(sim_frame, text="Simulation Controls", font=("Helvetica", 16, "bold")).pack(pady=10)
+        
+        # Start/Stop button with gradient effect
+        self.start_button = ctk.CTkButton(
+            sim_frame,
+            text="Start Simulation",
+            command=self.toggle_simulation,
+            fg_color=("#28a745", "#218838"),
+            hover_color=("#218838", "#1e7e34"),
+            height=40
+        )
+        self.start_button.pack(fill=tk.X, padx=20, pady=10)
+        
+        # Speed control with modern slider
+        speed_frame = ctk.CTkFrame(sim_frame)
+        speed_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ctk.CTkLabel(speed_frame, text="Animation Speed").pack(side=tk.LEFT, padx=5)
+        
+        self.speed_slider = ctk.CTkSlider(
+            speed_frame,
+            from_=0.1,
+            to=3.0,
+            number_of_steps=29,
+            command=self.update_speed
+        )
+        self.speed_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+        self.speed_slider.set(1.0)
+        
+        # Zoom and pan of the network view
+        view_frame = ctk.CTkFrame(sim_frame)
+        view_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        self.view_label = ctk.CTkLabel(view_frame, text="Zoom 1.0x")
+        self.view_label.pack(side=tk.LEFT, padx=5)
+        
+        ctk.CTkButton(
+            view_frame,
+            text="Reset View",
+            command=self.reset_view,
+            width=120
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        # Recording and replay of runs
+        trace_frame = ctk.CTkFrame(sim_frame)
+        trace_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        self.record_button = ctk.CTkButton(
+            trace_frame,
+            text="Start Recording",
+            command=self.toggle_recording,
+            width=120
+        )
+        self.record_button.pack(side=tk.LEFT, padx=5)
+        
+        self.replay_button = ctk.CTkButton(
+            trace_frame,
+            text="Open Replay",
+            command=self.toggle_replay,
+            width=120
+        )
+        self.replay_button.pack(side=tk.RIGHT, padx=5)
+        
+        scrub_frame = ctk.CTkFrame(sim_frame)
+        scrub_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        self.tick_label = ctk.CTkLabel(scrub_frame, text="Tick -")
+        self.tick_label.pack(side=tk.LEFT, padx=5)
+        
+        self.scrub_slider = ctk.CTkSlider(
+            scrub_frame,
+            from_=0,
+            to=1,
+            command=self.scrub,
+            state='disabled'
+        )
+        self.scrub_slider.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+        
+        # Network Statistics
+        stats_frame = ctk.CTkFrame(self.control_panel)
+        stats_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ctk.CTkLabel(stats_frame, text="Network Statistics", font=("Helvetica", 16, "bold")).pack(pady=10)
+        
+        self.stats_labels = {}
+        stats = [
+            ("nodes", "Total Nodes"),
+            ("malicious", "Malicious Nodes"),
+            ("success_rate", "Success Rate"),
+            ("recent_success_rate", "Recent Success Rate"),
+            ("throughput", "Delivered / Tick"),
+            ("hops_p90", "Hops (p90)"),
+            ("latency_p90", "Latency (p90)"),
+            ("active_routes", "Active Routes"),
+            ("avg_energy", "Average Energy"),
+            ("dead", "Dead Nodes")
+        ]
+        
+        for key, text in stats:
+            frame = ctk.CTkFrame(stats_frame)
+            frame.pack(fill=tk.X, padx=10, pady=5)
+            ctk.CTkLabel(frame, text=text).pack(side=tk.LEFT, padx=5)
+            self.stats_labels[key] = ctk.CTkLabel(frame, text="0")
+            self.stats_labels[key].pack(side=tk.RIGHT, padx=5)
+        
+        # Profiling
+        profile_frame = ctk.CTkFrame(self.control_panel)
+        profile_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ctk.CTkLabel(profile_frame, text="Profiling", font=("Helvetica", 16, "bold")).pack(pady=10)
+        
+        profile_buttons = ctk.CTkFrame(profile_frame)
+        profile_buttons.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.instrument_switch = ctk.CTkSwitch(
+            profile_buttons,
+            text="Timers",
+            command=self.toggle_instrumentation
+        )
+        self.instrument_switch.pack(side=tk.LEFT, padx=5)
+        
+        self.sample_button = ctk.CTkButton(
+            profile_buttons,
+            text="Start Sampling",
+            command=self.toggle_sampling,
+            width=120
+        )
+        self.sample_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.profile_labels = {}
+        profile_rows = [
+            ("mobility", "Mobility"),
+            ("topology", "Topology"),
+            ("routing", "Routing"),
+            ("learning", "Learning"),
+            ("stats", "Stats"),
+            ("render", "Rendering"),
+            ("neighbor_checks", "Neighbor Checks"),
+            ("node_expansions", "Node Expansions"),
+            ("packets_forwarded", "Packets Forwarded"),
+            ("route_cache_hits", "Route Cache Hits"),
+            ("canvas_items", "Canvas Items")
+        ]
+        
+        for key, text in profile_rows:
+            frame = ctk.CTkFrame(profile_frame)
+            frame.pack(fill=tk.X, padx=10, pady=2)
+            ctk.CTkLabel(frame, text=text).pack(side=tk.LEFT, padx=5)
+            self.profile_labels[key] = ctk.CTkLabel(frame, text="-")
+            self.profile_labels[key].pack(side=tk.RIGHT, padx=5)
+        
+        # Node Controls
+        node_frame = ctk.CTkFrame(self.control_panel)
+        node_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ctk.CTkLabel(node_frame, text="Node Controls", font=("Helvetica", 16, "bold")).pack(pady=10)
+        
+        btn_frame = ctk.CTkFrame(node_frame)
+        btn_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ctk.CTkButton(
+            btn_frame,
+            text="Add Node",
+            command=self.add_node,
+            width=120
+        ).pack(side=tk.LEFT, padx=5)
+        
+        ctk.CTkButton(
+            btn_frame,
+            text="Remove Node",
+            command=self.remove_node,
+            width=120
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        # Selected Node Info
+        self.node_info_frame = ctk.CTkFrame(self.control_panel)
+        self.node_info_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        ctk.CTkLabel(
+            self.node_info_frame,
+            text="Selected Node Information",
+            font=("Helvetica", 16, "bold")
+        ).pack(pady=10)
+        
+        self.node_info_labels = {}
+        info_fields = ["ID", "Position", "Energy", "Reputation", "Neighbors", "Sent", "Relayed"]
+        
+        for field in info_fields:
+            frame = ctk.CTkFrame(self.node_info_frame)
+            frame.pack(fill=tk.X, padx=10, pady=2)
+            ctk.CTkLabel(frame, text=field).pack(side=tk.LEFT, padx=5)
+            self.node_info_labels[field] = ctk.CTkLabel(frame, text="-")
+            self.node_info_labels[field].pack(side=tk.RIGHT, padx=5)
+    
+    def setup_styles(self):
+        self.colors = {
+            'normal_node': '#00ff00',
+            'malicious_node': '#ff4444',
+            'selected_node': '#ffff00',
+            'connection': '#404040',
+            'active_route': '#00ffff',
+            'text': '#ffffff'
+        }
+        self.node_radius = 12
+        
+    def toggle_simulation(self):
+        if self.replay is not None:
+            self.toggle_replay()
+        self.is_simulating = not self.is_simulating
+        if self.is_simulating:
+            self.start_button.configure(
+                text="Stop Simulation",
+                fg_color=("#dc3545", "#c82333")
+            )
+            self.sim_thread.start()
+        else:
+            self.start_button.configure(
+                text="Start Simulation",
+                fg_color=("#28a745", "#218838")
+            )
+            self.sim_thread.stop()
+    
+    def toggle_recording(self):
+        # The recorder observes the simulator, so it is attached and closed
+        # on the simulation thread
+        if self.is_recording:
+            self.is_recording = False
+            self.edit_network(self._stop_recording)
+            self.record_button.configure(text="Start Recording")
+            return
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            messagebox.showwarning("Error", "Recording runs requires pyarrow.")
+            return
+        directory = filedialog.askdirectory(title="Record run into")
+        if not directory:
+            return
+        self.is_recording = True
+        self.edit_network(self._start_recording, directory)
+        self.record_button.configure(text="Stop Recording")
+    
+    def _start_recording(self, directory):
+        self.recorder = TraceRecorder(self.simulator, directory)
+    
+    def _stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+    
+    def toggle_replay(self):
+        if self.replay is not None:
+            # Back to the live simulation
+            self.replay = None
+            self.scrub_slider.configure(state='disabled')
+            self.replay_button.configure(text="Open Replay")
+            self.renderer.invalidate()
+            self.sim_thread.apply_now()
+            return
+        directory = filedialog.askdirectory(title="Open recorded run")
+        if not directory:
+            return
+        try:
+            replay = TraceReader(directory)
+        except (ImportError, OSError, ValueError) as error:
+            messagebox.showwarning("Error", str(error))
+            return
+        if not len(replay):
+            messagebox.showwarning("Error", "The recording has no ticks.")
+            return
+        if self.is_simulating:
+            self.toggle_simulation()
+        self.replay = replay
+        self.replay_button.configure(text="Exit Replay")
+        self.scrub_slider.configure(
+            state='normal',
+            from_=replay.first_tick,
+            to=max(replay.last_tick, replay.first_tick + 1),
+            number_of_steps=max(replay.last_tick - replay.first_tick, 1)
+        )
+        self.scrub_slider.set(replay.first_tick)
+        self.scrub(replay.first_tick)
+    
+    def scrub(self, value):
+        if self.replay is None:
+            return
+        tick = min(int(round(value)), self.replay.last_tick)
+        self.snapshot = self.replay.frame(tick)
+        self.show_snapshot()
+    
+    def toggle_instrumentation(self):
+        # The simulation's timers are switched and reset on its own thread
+        enabled = bool(self.instrument_switch.get())
+        self.ui_instrumentation.enabled = enabled
+        if enabled:
+            self.ui_instrumentation.reset()
+        self.edit_network(self._set_instrumentation, enabled)
+        if not enabled:
+            for label in self.profile_labels.values():
+                label.configure(text="-")
+
+    def _set_instrumentation(self, enabled):
+        instrumentation = self.simulator.instrumentation
+        instrumentation.enabled = enabled
+        if enabled:
+            instrumentation.reset()
+    
+    def toggle_sampling(self):
+        if self.sampler is None:
+            ident = self.sim_thread.ident
+            if ident is None:
+                messagebox.showwarning("Error", "Start the simulation to sample it.")
+                return
+            self.sampler = Sampler(ident).start()
+            self.sample_button.configure(text="Stop Sampling")
+            return
+        sampler, self.sampler = self.sampler.stop(), None
+        self.sample_button.configure(text="Start Sampling")
+        path = filedialog.asksaveasfilename(
+            title="Save collapsed stacks",
+            defaultextension=".folded",
+            filetypes=[("Collapsed stacks", "*.folded"), ("All files", "*.*")]
+        )
+        if path:
+            sampler.write(path)
+    
+    def show_snapshot(self):
+        self.tick_label.configure(text=f"Tick {self.snapshot.tick}")
+        with self.ui_instrumentation.phase('render'):
+            self.update_visualization()
+        self.update_statistics()
+        self.update_node_info()
+    
+    def poll_frames(self):
+        # Runs on the Tk thread at a capped frame rate; only the newest
+        # snapshot is drawn
+        snapshot, skipped = self.frames.latest()
+        if self.frames.dropped != self.frames_dropped:
+            # Frames lost in the queue took their link changes with them
+            self.frames_dropped = self.frames.dropped
+            self.renderer.invalidate()
+        if snapshot is not None and self.replay is None:
+            self.snapshot = snapshot
+            self.skipped = skipped
+            self.show_snapshot()
+        self.after(self.frame_interval, self.poll_frames)
+    
+    def update_visualization(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return
+        # Frames skipped since the last draw still carry link changes
+        self.renderer.render_snapshot(snapshot, selected=self.selected_node, skipped=self.skipped)
+        self.skipped = []
+        self.view_label.configure(text=f"Zoom {self.renderer.zoom:.1f}x, {self.renderer.lod} "
+                                       f"({self.renderer.visible} visible)")
+    
+    def update_speed(self, value):
+        self.animation_speed = value
+        self.sim_thread.ticks_per_second = value
+    
+    def edit_network(self, command, *args):
+        self.commands.submit(command, *args)
+        if not self.is_simulating:
+            self.sim_thread.apply_now()
+    
+    def add_node(self):
+        self.edit_network(self._add_node)
+    
+    def _add_node(self):
+        self.manet.join()
+    
+    def remove_node(self):
+        if self.snapshot is not None and not len(self.snapshot.ids):
+            messagebox.showwarning("Error", "No nodes to remove.")
+            return
+        self.edit_network(self._remove_node, self.selected_node)
+        self.selected_node = None
+    
+    def _remove_node(self, node_id):
+        # Remove the selected node, or the newest one when none is selected
+        if node_id not in self.manet.nodes:
+            if not len(self.manet.nodes):
+                return
+            node_id = max(self.manet.nodes)
+        self.manet.leave([node_id])
+
+    def update_statistics(self):
+        if self.snapshot is None:
+            return
+        stats = self.snapshot.stats
+        
+        self.stats_labels['nodes'].configure(text=str(stats['nodes']))
+        self.stats_labels['malicious'].configure(text=str(stats['malicious']))
+        self.stats_labels['success_rate'].configure(text=f"{stats['success_rate']:.2f}%")
+        self.stats_labels['recent_success_rate'].configure(text=f"{stats['recent_success_rate']:.2f}%")
+        self.stats_labels['throughput'].configure(text=f"{stats['throughput']:.2f}")
+        # NaN until a packet has been delivered
+        for key in ('hops_p90', 'latency_p90'):
+            value = stats[key]
+            self.stats_labels[key].configure(text="-" if np.isnan(value) else f"{value:.2f}")
+        self.stats_labels['active_routes'].configure(text=str(stats['active_routes']))
+        self.stats_labels['avg_energy'].configure(text=f"{stats['avg_energy']:.2f}")
+        self.stats_labels['dead'].configure(text=str(stats['dead']))
+        
+        metrics = stats.get('metrics')
+        if metrics is not None:
+            ui = self.ui_instrumentation.metrics()
+            phases = {**metrics['phases'], **ui['phases']}
+            counters = {**metrics['counters'], **ui['counters']}
+            for key, label in self.profile_labels.items():
+                if key in phases:
+                    label.configure(text=f"{phases[key]['mean_ms']:.2f} ms")
+                elif key in counters:
+                    label.configure(text=f"{counters[key]:,}")
+    
+    def on_canvas_press(self, event):
+        self.drag_from = (event.x, event.y)
+        self.dragged = False
+    
+    def on_canvas_drag(self, event):
+        # Dragging pans the view; a press that barely moves is a click
+        if self.drag_from is None:
+            return
+        dx, dy = event.x - self.drag_from[0], event.y - self.drag_from[1]
+        if not self.dragged and abs(dx) + abs(dy) < 4:
+            return
+        self.dragged = True
+        self.drag_from = (event.x, event.y)
+        self.renderer.pan(dx, dy)
+        self.update_visualization()
+    
+    def on_canvas_release(self, event):
+        if not self.dragged:
+            self.on_canvas_click(event)
+        self.drag_from = None
+    
+    def on_canvas_wheel(self, event):
+        # Windows and macOS report a wheel delta, X11 buttons 4 and 5
+        zoom_in = event.delta > 0 if event.num not in (4, 5) else event.num == 4
+        self.renderer.zoom_at(event.x, event.y, 1.25 if zoom_in else 0.8)
+        self.update_visualization()
+    
+    def reset_view(self):
+        self.renderer.reset_view()
+        self.update_visualization()
+    
+    def on_canvas_click(self, event):
+        snapshot = self.snapshot
+        if snapshot is None or not len(snapshot.ids):
+            return
+        
+        # Convert canvas coordinates to the network position
+        pos_x, pos_y = self.renderer.to_world(event.x, event.y)
+        
+        # The pick index is built once per frame, on the first click
+        if self.pick_source is not snapshot.x:
+            cell = 2 * snapshot.area_size / np.sqrt(len(snapshot.ids))
+            self.pick_index = PickIndex(snapshot.x, snapshot.y, cell)
+            self.pick_source = snapshot.x
+        closest = self.pick_index.nearest(pos_x, pos_y, self.renderer.pick_radius())
+        if closest is None:
+            return
+        self.selected_node = int(snapshot.ids[closest])
+        self.update_node_info()
+        self.update_visualization()
+
+    def update_node_info(self):
+        snapshot = self.snapshot
+        if self.selected_node is None or snapshot is None:
+            return
+        
+        index = np.flatnonzero(snapshot.ids == self.selected_node)
+        if not len(index):
+            return
+        i = int(index[0])
+        links = snapshot.links
+        neighbors = np.concatenate([links[links[:, 0] == self.selected_node, 1], links[links[:, 1] == self.selected_node, 0]])
+        
+        self.node_info_labels["ID"].configure(text=str(self.selected_node))
+        self.node_info_labels["Position"].configure(text=f"({snapshot.x[i]:.2f}, {snapshot.y[i]:.2f})")
+        self.node_info_labels["Energy"].configure(text=f"{snapshot.energy[i]:.2f}")
+        self.node_info_labels["Reputation"].configure(text=f"{snapshot.reputation[i]:.2f}")
+        self.node_info_labels["Neighbors"].configure(text=", ".join(map(str, sorted(neighbors.tolist()))))
+        
+        # Traffic counters are only kept by live runs
+        counters = snapshot.counters
+        if counters is None:
+            self.node_info_labels["Sent"].configure(text="-")
+            self.node_info_labels["Relayed"].configure(text="-")
+        else:
+            self.node_info_labels["Sent"].configure(
+                text=f"{counters['sent'][i]} ({counters['delivered'][i]} delivered)")
+            self.node_info_labels["Relayed"].configure(
+                text=f"{counters['forwarded'][i]} ({counters['dropped'][i]} dropped)")
+
+def main():
+    app = EnhancedMANETVisualizer()
+    app.mainloop()
+
+if __name__ == "__main__":
+    main()